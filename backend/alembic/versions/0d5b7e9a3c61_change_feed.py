@@ -0,0 +1,96 @@
+"""change feed
+
+Revision ID: 0d5b7e9a3c61
+Revises: f4c8a2d6e1b3
+Create Date: 2026-10-17 20:41:08.557302
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0d5b7e9a3c61"
+down_revision = "f4c8a2d6e1b3"
+branch_labels = None
+depends_on = None
+
+
+feed_tables = ("sport", "event", "selection")
+
+# The change notification triggers sent whole rows, and skipped the event
+# updates that only moved the counter by comparing whole rows. changed_xid
+# moves with every write, so they now list the columns a client sees.
+visible_columns = {
+    "event": ("id", "name", "slug", "active", "type", "sport_id", "status", "scheduled_start", "actual_start"),
+    "selection": ("id", "name", "event_id", "price", "active", "outcome"),
+}
+notify_ids = {
+    # table: (sport id, event id)
+    "event": ("changed.sport_id", "changed.id"),
+    "selection": ("(SELECT sport_id FROM event WHERE event.id = changed.event_id)", "changed.event_id"),
+}
+
+
+def replace_notify_functions(table, row, updated_rows):
+    sport_id, event_id = notify_ids[table]
+    change = f"json_build_object('entity', '{table}', 'sport_id', {sport_id}, 'event_id', {event_id}, " \
+        f"'row', {row})::text"
+    for action, rows in (("inserted", f"new_{table} AS changed"), ("updated", updated_rows)):
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION {table}_{action}_notify() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                PERFORM notify_row_changes(ARRAY(SELECT {change} FROM {rows} ORDER BY changed.id));
+                RETURN NULL;
+            END $$
+        """)
+
+
+def upgrade():
+    # Versions are drawn when a row is written, not when its transaction
+    # commits, so a reader can see version 11 before version 10 commits. Each
+    # row also records the transaction that wrote it: the feed is read in
+    # (changed_xid, version) order and only up to the oldest transaction still
+    # running, so no row can later commit behind a cursor.
+    # Rows written before the feed existed share transaction 0 and come first.
+    for table in feed_tables:
+        op.execute(f"ALTER TABLE {table} ADD COLUMN changed_xid xid8 NOT NULL DEFAULT '0'")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN changed_xid SET DEFAULT pg_current_xact_id()")
+        op.create_index(f"ix_{table}_changed_xid_version", table, ["changed_xid", "version"])
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_row_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.version = nextval('row_version_seq');
+            NEW.changed_xid = pg_current_xact_id();
+            RETURN NEW;
+        END $$
+    """)
+    for table, columns in visible_columns.items():
+        row = "json_build_object(" + ", ".join(f"'{column}', changed.{column}" for column in columns + ("version",)) + ")"
+        updated_rows = f"new_{table} AS changed"
+        if table == "event":
+            changed = ", ".join(f"changed.{column}" for column in columns[1:])
+            previous = ", ".join(f"previous.{column}" for column in columns[1:])
+            updated_rows += f" JOIN old_{table} AS previous ON previous.id = changed.id " \
+                f"WHERE ({changed}) IS DISTINCT FROM ({previous})"
+        replace_notify_functions(table, row, updated_rows)
+
+
+def downgrade():
+    replace_notify_functions(
+        "event", "to_jsonb(changed) - '{active_selection_count}'::text[]",
+        "new_event AS changed JOIN old_event AS previous ON previous.id = changed.id "
+        "WHERE changed.version <> previous.version "
+        "AND to_jsonb(changed) - '{active_selection_count}'::text[] - 'version' "
+        "IS DISTINCT FROM to_jsonb(previous) - '{active_selection_count}'::text[] - 'version'",
+    )
+    replace_notify_functions("selection", "row_to_json(changed)", "new_selection AS changed")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_row_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.version = nextval('row_version_seq');
+            RETURN NEW;
+        END $$
+    """)
+    for table in reversed(feed_tables):
+        op.drop_index(f"ix_{table}_changed_xid_version", table_name=table)
+        op.execute(f"ALTER TABLE {table} DROP COLUMN changed_xid")
@@ -0,0 +1,36 @@
+"""name trigram indexes
+
+Revision ID: 5b1e0f7a9c42
+Revises: 78d01ec51c5e
+Create Date: 2026-10-17 12:20:54.118203
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "5b1e0f7a9c42"
+down_revision = "78d01ec51c5e"
+branch_labels = None
+depends_on = None
+
+
+searchable_tables = ("sport", "event", "selection")
+
+
+def upgrade():
+    # The name filters are case insensitive regular expressions, which a btree
+    # can not serve. A trigram GIN index can, for any pattern with at least
+    # one literal run of three characters.
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table in searchable_tables:
+        op.create_index(
+            f"ix_{table}_name_trgm", table, ["name"],
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+        )
+
+
+def downgrade():
+    for table in reversed(searchable_tables):
+        op.drop_index(f"ix_{table}_name_trgm", table_name=table)
+    op.execute("DROP EXTENSION IF EXISTS pg_trgm")
@@ -0,0 +1,99 @@
+"""active child counters
+
+Revision ID: 78d01ec51c5e
+Revises: c804ac66f1ca
+Create Date: 2026-10-17 11:03:27.518840
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "78d01ec51c5e"
+down_revision = "c804ac66f1ca"
+branch_labels = None
+depends_on = None
+
+
+# One trigger set per parent/child pair. Inserts and deletes are counted per
+# statement from the transition tables, so a bulk insert touches each parent
+# once. Updates are counted per row, and only fire when the active flag or the
+# parent changes, so price and name updates never touch the parent row.
+counter_triggers = (
+    # (parent, counter column, child, parent id column)
+    ("sport", "active_event_count", "event", "sport_id"),
+    ("event", "active_selection_count", "selection", "event_id"),
+)
+
+
+def create_counter_triggers(parent, counter, child, parent_id):
+    op.execute(f"""
+        CREATE FUNCTION {child}_inserted_count() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE {parent} SET {counter} = {counter} + inserted.count
+            FROM (SELECT {parent_id}, count(*) AS count FROM new_{child} WHERE active = true GROUP BY {parent_id}) AS inserted
+            WHERE {parent}.id = inserted.{parent_id};
+            RETURN NULL;
+        END $$
+    """)
+    op.execute(f"""
+        CREATE FUNCTION {child}_deleted_count() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE {parent} SET {counter} = {counter} - deleted.count
+            FROM (SELECT {parent_id}, count(*) AS count FROM old_{child} WHERE active = true GROUP BY {parent_id}) AS deleted
+            WHERE {parent}.id = deleted.{parent_id};
+            RETURN NULL;
+        END $$
+    """)
+    op.execute(f"""
+        CREATE FUNCTION {child}_updated_count() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF OLD.active THEN
+                UPDATE {parent} SET {counter} = {counter} - 1 WHERE id = OLD.{parent_id};
+            END IF;
+            IF NEW.active THEN
+                UPDATE {parent} SET {counter} = {counter} + 1 WHERE id = NEW.{parent_id};
+            END IF;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute(f"""
+        CREATE TRIGGER {child}_inserted_count AFTER INSERT ON {child}
+        REFERENCING NEW TABLE AS new_{child}
+        FOR EACH STATEMENT EXECUTE FUNCTION {child}_inserted_count()
+    """)
+    op.execute(f"""
+        CREATE TRIGGER {child}_deleted_count AFTER DELETE ON {child}
+        REFERENCING OLD TABLE AS old_{child}
+        FOR EACH STATEMENT EXECUTE FUNCTION {child}_deleted_count()
+    """)
+    op.execute(f"""
+        CREATE TRIGGER {child}_updated_count AFTER UPDATE OF active, {parent_id} ON {child}
+        FOR EACH ROW
+        WHEN (OLD.active IS DISTINCT FROM NEW.active OR OLD.{parent_id} IS DISTINCT FROM NEW.{parent_id})
+        EXECUTE FUNCTION {child}_updated_count()
+    """)
+
+
+def upgrade():
+    op.add_column("sport", sa.Column("active_event_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("event", sa.Column("active_selection_count", sa.Integer(), nullable=False, server_default="0"))
+
+    for parent, counter, child, parent_id in counter_triggers:
+        op.execute(f"""
+            UPDATE {parent} SET {counter} = counted.count
+            FROM (SELECT {parent_id}, count(*) AS count FROM {child} WHERE active = true GROUP BY {parent_id}) AS counted
+            WHERE {parent}.id = counted.{parent_id}
+        """)
+        create_counter_triggers(parent, counter, child, parent_id)
+        op.create_index(f"ix_{parent}_{counter}", parent, [counter])
+
+
+def downgrade():
+    for parent, counter, child, _ in reversed(counter_triggers):
+        op.drop_index(f"ix_{parent}_{counter}", table_name=parent)
+        for action in ("inserted", "deleted", "updated"):
+            op.execute(f"DROP TRIGGER {child}_{action}_count ON {child}")
+            op.execute(f"DROP FUNCTION {child}_{action}_count()")
+        op.drop_column(parent, counter)
@@ -0,0 +1,57 @@
+"""table write counts
+
+Revision ID: 9c2e4f7a1b58
+Revises: 0d5b7e9a3c61
+Create Date: 2026-10-18 09:12:44.381205
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "9c2e4f7a1b58"
+down_revision = "0d5b7e9a3c61"
+branch_labels = None
+depends_on = None
+
+
+counted_tables = ("sport", "event", "selection")
+
+
+def upgrade():
+    # The list ETags used max(version), but versions are drawn when a row is
+    # written: a transaction holding version 10 can commit after one holding
+    # 11 was already served, and leave the maximum where it was. Each write
+    # statement instead adds one to a count of its table, which only becomes
+    # visible when it commits, so the sum of a table's counts moves with every
+    # commit that wrote to it, in whatever order they land. Counts are kept
+    # per backend, so concurrent writers never wait on each other's row.
+    op.execute("""
+        CREATE TABLE table_write_count (
+            table_name text NOT NULL,
+            backend_pid integer NOT NULL,
+            writes bigint NOT NULL,
+            PRIMARY KEY (table_name, backend_pid)
+        )
+    """)
+    op.execute("""
+        CREATE FUNCTION count_table_write() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO table_write_count (table_name, backend_pid, writes)
+            VALUES (TG_TABLE_NAME, pg_backend_pid(), 1)
+            ON CONFLICT (table_name, backend_pid) DO UPDATE SET writes = table_write_count.writes + 1;
+            RETURN NULL;
+        END $$
+    """)
+    for table in counted_tables:
+        op.execute(f"""
+            CREATE TRIGGER {table}_write_count AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION count_table_write()
+        """)
+
+
+def downgrade():
+    for table in reversed(counted_tables):
+        op.execute(f"DROP TRIGGER {table}_write_count ON {table}")
+    op.execute("DROP FUNCTION count_table_write()")
+    op.execute("DROP TABLE table_write_count")
@@ -0,0 +1,35 @@
+"""foreign key indexes
+
+Revision ID: a6e2c93f5d18
+Revises: e3a9d54c1b07
+Create Date: 2026-10-17 16:41:08.530917
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "a6e2c93f5d18"
+down_revision = "e3a9d54c1b07"
+branch_labels = None
+depends_on = None
+
+
+foreign_keys = (
+    # (child, parent id column)
+    ("event", "sport_id"),
+    ("selection", "event_id"),
+)
+
+
+def upgrade():
+    # Postgres indexes the referenced key but not the referencing column, so
+    # deleting a parent, which sets its children's reference to NULL, and
+    # reading a parent's children both scanned the whole child table.
+    for child, parent_id in foreign_keys:
+        op.create_index(f"ix_{child}_{parent_id}", child, [parent_id])
+
+
+def downgrade():
+    for child, parent_id in reversed(foreign_keys):
+        op.drop_index(f"ix_{child}_{parent_id}", table_name=child)
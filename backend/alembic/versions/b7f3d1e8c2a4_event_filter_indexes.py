@@ -0,0 +1,32 @@
+"""event filter indexes
+
+Revision ID: b7f3d1e8c2a4
+Revises: a6e2c93f5d18
+Create Date: 2026-10-17 18:05:37.214690
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "b7f3d1e8c2a4"
+down_revision = "a6e2c93f5d18"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The event list filters on sport, status and a scheduled_start window.
+    # An equality column followed by the window makes each filter one index
+    # range, already in the scheduled_start, id order the list pages on.
+    # The sport index still leads with sport_id, so it replaces the plain
+    # foreign key index.
+    op.create_index("ix_event_sport_id_scheduled_start_id", "event", ["sport_id", "scheduled_start", "id"])
+    op.create_index("ix_event_status_scheduled_start_id", "event", ["status", "scheduled_start", "id"])
+    op.drop_index("ix_event_sport_id", table_name="event")
+
+
+def downgrade():
+    op.create_index("ix_event_sport_id", "event", ["sport_id"])
+    op.drop_index("ix_event_status_scheduled_start_id", table_name="event")
+    op.drop_index("ix_event_sport_id_scheduled_start_id", table_name="event")
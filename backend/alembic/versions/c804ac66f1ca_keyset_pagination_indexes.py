@@ -0,0 +1,27 @@
+"""keyset pagination indexes
+
+Revision ID: c804ac66f1ca
+Revises: d28f489a20e9
+Create Date: 2026-10-17 09:12:41.402318
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "c804ac66f1ca"
+down_revision = "d28f489a20e9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The list endpoints page on (order_by column, id), so each ordering
+    # needs a composite index to serve the row comparison and the sort.
+    op.create_index("ix_event_scheduled_start_id", "event", ["scheduled_start", "id"])
+    op.create_index("ix_selection_price_id", "selection", ["price", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_selection_price_id", table_name="selection")
+    op.drop_index("ix_event_scheduled_start_id", table_name="event")
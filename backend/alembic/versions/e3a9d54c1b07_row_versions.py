@@ -0,0 +1,53 @@
+"""row versions
+
+Revision ID: e3a9d54c1b07
+Revises: 5b1e0f7a9c42
+Create Date: 2026-10-17 14:02:16.730552
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e3a9d54c1b07"
+down_revision = "5b1e0f7a9c42"
+branch_labels = None
+depends_on = None
+
+
+versioned_tables = ("sport", "event", "selection")
+
+
+def upgrade():
+    # Every insert and update draws a new version from one shared sequence, so
+    # max(version) of a table changes whenever any of its rows does. The
+    # counter triggers update the parent row, so a change to a child also
+    # moves the version of its parent.
+    op.execute("CREATE SEQUENCE row_version_seq")
+    op.execute("""
+        CREATE FUNCTION bump_row_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.version = nextval('row_version_seq');
+            RETURN NEW;
+        END $$
+    """)
+    for table in versioned_tables:
+        op.add_column(table, sa.Column(
+            "version", sa.BigInteger(), nullable=False, server_default=sa.text("nextval('row_version_seq')")
+        ))
+        op.execute(f"""
+            CREATE TRIGGER {table}_version BEFORE UPDATE ON {table}
+            FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+            EXECUTE FUNCTION bump_row_version()
+        """)
+        op.create_index(f"ix_{table}_version", table, ["version"])
+
+
+def downgrade():
+    for table in reversed(versioned_tables):
+        op.drop_index(f"ix_{table}_version", table_name=table)
+        op.execute(f"DROP TRIGGER {table}_version ON {table}")
+        op.drop_column(table, "version")
+    op.execute("DROP FUNCTION bump_row_version()")
+    op.execute("DROP SEQUENCE row_version_seq")
@@ -0,0 +1,107 @@
+"""change notifications
+
+Revision ID: f4c8a2d6e1b3
+Revises: b7f3d1e8c2a4
+Create Date: 2026-10-17 18:12:40.214977
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "f4c8a2d6e1b3"
+down_revision = "b7f3d1e8c2a4"
+branch_labels = None
+depends_on = None
+
+
+# Every statement that inserts or changes events or selections sends the new
+# rows on the row_changes channel, as JSON arrays of
+# {"entity", "sport_id", "event_id", "row"} objects. NOTIFY is delivered on
+# commit, so listeners never see a rolled back write. A payload is limited to
+# 8000 bytes, so the rows of a bulk statement go out in several notifications.
+notified_tables = (
+    # (table, sport id, event id, columns left out of the row)
+    ("event", "changed.sport_id", "changed.id", ("active_selection_count",)),
+    # A lookup by primary key per row, where a join would hash the whole
+    # event table for every statement
+    ("selection", "(SELECT sport_id FROM event WHERE event.id = changed.event_id)", "changed.event_id", ()),
+)
+
+# Below the 8000 bytes limit by more than the largest row
+max_payload_bytes = 7000
+
+
+def create_notify_triggers(table, sport_id, event_id, hidden_columns):
+    hidden = "'{" + ",".join(hidden_columns) + "}'::text[]"
+    # row_to_json skips the jsonb conversion that removing columns needs
+    row = f"to_jsonb(changed) - {hidden}" if hidden_columns else "row_to_json(changed)"
+    change = f"json_build_object('entity', '{table}', 'sport_id', {sport_id}, 'event_id', {event_id}, " \
+        f"'row', {row})::text"
+    op.execute(f"""
+        CREATE FUNCTION {table}_inserted_notify() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM notify_row_changes(ARRAY(SELECT {change} FROM new_{table} AS changed ORDER BY changed.id));
+            RETURN NULL;
+        END $$
+    """)
+    # The counter triggers update a parent row on every child insert without
+    # changing anything the row shows, so those rows are compared with their
+    # old version. Rows of the other tables are sent as updated, even by an
+    # update that changed nothing, which saves joining the old rows.
+    if hidden_columns:
+        transition_tables = f"OLD TABLE AS old_{table} NEW TABLE AS new_{table}"
+        changed_rows = f"new_{table} AS changed JOIN old_{table} AS previous ON previous.id = changed.id " \
+            f"WHERE changed.version <> previous.version " \
+            f"AND to_jsonb(changed) - {hidden} - 'version' IS DISTINCT FROM to_jsonb(previous) - {hidden} - 'version'"
+    else:
+        transition_tables = f"NEW TABLE AS new_{table}"
+        changed_rows = f"new_{table} AS changed"
+    op.execute(f"""
+        CREATE FUNCTION {table}_updated_notify() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM notify_row_changes(ARRAY(SELECT {change} FROM {changed_rows} ORDER BY changed.id));
+            RETURN NULL;
+        END $$
+    """)
+    op.execute(f"""
+        CREATE TRIGGER {table}_inserted_notify AFTER INSERT ON {table}
+        REFERENCING NEW TABLE AS new_{table}
+        FOR EACH STATEMENT EXECUTE FUNCTION {table}_inserted_notify()
+    """)
+    op.execute(f"""
+        CREATE TRIGGER {table}_updated_notify AFTER UPDATE ON {table}
+        REFERENCING {transition_tables}
+        FOR EACH STATEMENT EXECUTE FUNCTION {table}_updated_notify()
+    """)
+
+
+def upgrade():
+    op.execute(f"""
+        CREATE FUNCTION notify_row_changes(changes text[]) RETURNS void LANGUAGE plpgsql AS $$
+        DECLARE
+            change text;
+            payload text := '';
+        BEGIN
+            FOREACH change IN ARRAY changes LOOP
+                IF payload <> '' AND octet_length(payload) + octet_length(change) > {max_payload_bytes} THEN
+                    PERFORM pg_notify('row_changes', '[' || payload || ']');
+                    payload := '';
+                END IF;
+                payload := CASE WHEN payload = '' THEN change ELSE payload || ',' || change END;
+            END LOOP;
+            IF payload <> '' THEN
+                PERFORM pg_notify('row_changes', '[' || payload || ']');
+            END IF;
+        END $$
+    """)
+    for table, sport_id, event_id, hidden_columns in notified_tables:
+        create_notify_triggers(table, sport_id, event_id, hidden_columns)
+
+
+def downgrade():
+    for table, *_ in reversed(notified_tables):
+        for action in ("inserted", "updated"):
+            op.execute(f"DROP TRIGGER {table}_{action}_notify ON {table}")
+            op.execute(f"DROP FUNCTION {table}_{action}_notify()")
+    op.execute("DROP FUNCTION notify_row_changes(text[])")
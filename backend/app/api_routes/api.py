@@ -1,8 +1,11 @@
 from fastapi import APIRouter
 
-from app.api_routes.routes import sports, events, selections
+from app.api_routes.routes import cache, changes, sports, events, selections, stream
 
 api_router = APIRouter()
 api_router.include_router(sports.router, prefix="/sports", tags=["sports"])
 api_router.include_router(events.router, prefix="/events", tags=["events"])
-api_router.include_router(selections.router, prefix="/selections", tags=["selections"])
\ No newline at end of file
+api_router.include_router(selections.router, prefix="/selections", tags=["selections"])
+api_router.include_router(cache.router, prefix="/cache", tags=["cache"])
+api_router.include_router(changes.router, prefix="/changes", tags=["changes"])
+api_router.include_router(stream.router, prefix="/stream", tags=["stream"])
\ No newline at end of file
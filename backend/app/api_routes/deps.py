@@ -4,8 +4,19 @@ from fastapi import Depends
 from starlette.requests import Request
 from app.db.repository.base import BaseRepository
 
+READ_METHODS = ("GET", "HEAD")
+
 
 def get_db(request: Request) -> Database:
+    # Reads go to the replica while it is healthy and has replayed the
+    # client's last write (X-Primary-LSN); everything else uses the primary.
+    monitor = getattr(request.app.state, "_replica_monitor", None)
+    if (
+        monitor is not None
+        and request.method in READ_METHODS
+        and monitor.can_serve(request.headers.get("X-Primary-LSN"))
+    ):
+        return request.app.state._replica_db
     return request.app.state._db
 
 
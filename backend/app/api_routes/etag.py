@@ -0,0 +1,40 @@
+from hashlib import sha1
+from typing import Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.api_routes.streaming import wants_ndjson
+
+
+def entity_etag(entity: str, id: int, version: Optional[int]) -> str:
+    return f'"{entity}-{id}-{version}"'
+
+
+def list_etag(request: Request, table: str, table_version: Optional[int]) -> str:
+    """Return the ETag of a list response.
+
+    A list only reads its own table, so it is unchanged as long as no write to
+    that table committed since. table_version counts the committed write
+    statements of the table; row versions can not stand in for it, since a
+    write holding an older version may commit after a newer one was served.
+    The query string and the representation pick which list, and which bytes,
+    the tag stands for. Read the count before the list: a write committing in
+    between then gives a tag older than the body, which can only cost an
+    extra 200, never a stale 304.
+    """
+    params = sorted(request.query_params.multi_items())
+    representation = "ndjson" if wants_ndjson(request) else "json"
+    digest = sha1(repr((params, representation)).encode()).hexdigest()[:16]
+    return f'"{table}-{table_version or 0}-{digest}"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Return a bodiless 304 when the request's If-None-Match already holds the ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    tags = {tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")}
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
@@ -0,0 +1,163 @@
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import List, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config.app_config import appConfig
+
+
+def frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    # co_qualname (Python 3.11+) names methods as Class.method
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """Sample one request's stack from a background thread.
+
+    While the request's code runs, the sample is the event loop thread's
+    stack below the profiling middleware. While it waits (on the database,
+    mostly) the sample is the chain of coroutines its task is suspended in,
+    ending in <await>, so a flame graph shows wall time, not just CPU time.
+    Samples of other requests sharing the loop are dropped.
+    """
+
+    def __init__(self, task: "asyncio.Task", anchor: FrameType, interval: float) -> None:
+        self.task = task
+        self.anchor = anchor
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        # The thread ends within one interval; wait for it off the loop
+        await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+
+    def _running_stack(self) -> Optional[List[str]]:
+        frame = sys._current_frames().get(self._thread_id)
+        stack = []
+        while frame is not None:
+            if frame is self.anchor:
+                return stack[::-1]
+            stack.append(frame_name(frame))
+            frame = frame.f_back
+        return None
+
+    def _awaiting_stack(self) -> Optional[List[str]]:
+        # Task.get_stack() stops at the task's own coroutine once it is
+        # suspended, so follow what each coroutine awaits instead.
+        stack: Optional[List[str]] = None
+        awaitable = self.task.get_coro()
+        try:
+            while awaitable is not None:
+                frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "ag_frame", None)
+                if frame is None:
+                    break
+                if stack is not None:
+                    stack.append(frame_name(frame))
+                elif frame is self.anchor:
+                    stack = []
+                awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "ag_await", None)
+        except Exception:  # the loop changed the chain while it was walked
+            return None
+        return None if stack is None else stack + ["<await>"]
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            stack = self._running_stack() or self._awaiting_stack()
+            if stack:
+                self.samples[";".join(stack)] += 1
+
+    def collapsed(self) -> str:
+        """Return the samples in the collapsed stack format that speedscope and flamegraph.pl read."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def write_profile(filename: str, collapsed: str) -> None:
+    with open(filename, "w") as profile:
+        profile.write(collapsed)
+
+
+class ProfilingMiddleware:
+    """Profile the requests carrying PROFILING_TOKEN in X-Profile.
+
+    The token is only read from the header: in the query string it would end
+    up in access logs.
+
+    The profile replaces the response body, with the route's own status in
+    X-Profile-Status. With PROFILING_DIR set the response is left alone and
+    the profile is written to the file named in X-Profile-File instead.
+    Only installed when PROFILING_TOKEN is set.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    @staticmethod
+    def _requested(scope: Scope) -> bool:
+        token = dict(scope["headers"]).get(b"x-profile", b"")
+        return bool(token) and hmac.compare_digest(token, appConfig.PROFILING_TOKEN.encode())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        interval = appConfig.PROFILING_INTERVAL_MS / 1000
+        if appConfig.PROFILING_DIR:
+            await self._profile_to_file(interval, scope, receive, send)
+        else:
+            await self._profile_to_response(interval, scope, receive, send)
+
+    async def _profile_to_file(self, interval: float, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope["path"].strip("/").replace("/", "_") or "root"
+        filename = os.path.join(appConfig.PROFILING_DIR, f"{time.time_ns()}-{scope['method']}-{path}.collapsed")
+
+        async def send_with_file(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", []).append((b"x-profile-file", filename.encode()))
+            await send(message)
+
+        # Stacks are recorded from this frame down
+        sampler = StackSampler(asyncio.current_task(), sys._getframe(), interval)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_file)
+        finally:
+            await sampler.stop()
+            await asyncio.get_running_loop().run_in_executor(None, write_profile, filename, sampler.collapsed())
+
+    async def _profile_to_response(self, interval: float, scope: Scope, receive: Receive, send: Send) -> None:
+        status = 500
+
+        async def discard(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        sampler = StackSampler(asyncio.current_task(), sys._getframe(), interval)
+        sampler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            await sampler.stop()
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"x-profile-status", str(status).encode())],
+        })
+        await send({"type": "http.response.body", "body": sampler.collapsed().encode()})
@@ -0,0 +1,44 @@
+import logging
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api_routes.deps import READ_METHODS
+from app.db.replica import current_lsn_query
+
+logger = logging.getLogger(__name__)
+
+
+class PrimaryLSNMiddleware:
+    """Tell clients the primary's WAL position after each successful write.
+
+    The X-Primary-LSN header is only set while a replica is in use. A client
+    sending the highest value it received back on its reads is served by the
+    replica only once the replica has replayed that far, so it always sees
+    its own writes; clients that do not send it get whatever the replica has.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in READ_METHODS + ("OPTIONS",):
+            await self.app(scope, receive, send)
+            return
+
+        state = scope["app"].state
+
+        async def send_with_lsn(message: Message) -> None:
+            if (
+                message["type"] == "http.response.start"
+                and message["status"] < 400
+                and getattr(state, "_replica_monitor", None) is not None
+            ):
+                # The route has committed by the time the response starts
+                try:
+                    lsn = await state._db.fetch_val(query=current_lsn_query)
+                    message.setdefault("headers", []).append((b"x-primary-lsn", lsn.encode()))
+                except Exception as ex:
+                    logger.warning("Could not read the primary LSN: %s", ex)
+            await send(message)
+
+        await self.app(scope, receive, send_with_lsn)
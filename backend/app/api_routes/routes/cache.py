@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+
+from app.db.cache import record_cache
+from app.schemas.cache import CacheStatsModel
+
+router = APIRouter()
+
+@router.get("/stats", response_model=CacheStatsModel, name="Get cache stats")
+async def get_cache_stats() -> CacheStatsModel:
+    return record_cache.stats()
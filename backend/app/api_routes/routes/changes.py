@@ -0,0 +1,30 @@
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from app.api_routes.deps import get_repository
+from app.config.app_config import appConfig
+from app.db.pagination import InvalidCursorError
+from app.db.repository.changes import ChangeRepository
+from app.schemas.change import ChangeFeedModel
+
+router = APIRouter()
+
+@router.get("/", response_model=ChangeFeedModel, name="Get changes")
+async def get_changes(
+    since: Optional[str] = None,
+    limit: int = Query(appConfig.DEFAULT_PAGE_SIZE, ge=1, le=appConfig.MAX_PAGE_SIZE),
+    changes_repo: ChangeRepository = Depends(get_repository(ChangeRepository)),
+) -> Response:
+    """Return the sports, events and selections written after the since cursor, in write order.
+
+    The rows are built as JSON by the database, like the trees.
+    """
+    try:
+        changes, cursor = await changes_repo.get_changes(since=since, limit=limit)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid change cursor.")
+    body = '{"changes":[' + ",".join(changes) + '],"cursor":' + json.dumps(cursor) + \
+        ',"has_more":' + json.dumps(len(changes) == limit) + "}"
+    return Response(body, media_type="application/json")
@@ -1,29 +1,105 @@
+from datetime import datetime
 from typing import List, Optional
 from asyncpg import ForeignKeyViolationError
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
 from app.api_routes.deps import get_repository
+from app.api_routes.etag import entity_etag, list_etag, not_modified
+from app.api_routes.serialization import fast_json_response
+from app.api_routes.streaming import stream_records, wants_ndjson
+from app.config.app_config import appConfig
+from app.db.pagination import InvalidCursorError, encode_cursor
 from app.db.repository.events import EventRepository
-from app.schemas.event import EventCreateModel, EventPersistModel, EventUpdateModel
+from app.schemas.event import (
+    EventCreateModel, EventOrderByModel, EventPersistModel, EventStatusModel, EventTreeModel, EventTypeModel,
+    EventUpdateModel,
+)
 
 router = APIRouter()
 
 
 @router.get("/{id}/", response_model=EventPersistModel, name="Get Event by id")
 async def get_event_by_id(
+    request: Request,
+    response: Response,
     id: int, events_repo: EventRepository = Depends(get_repository(EventRepository))
 ) -> EventPersistModel:
     event = await events_repo.get_event_by_id(id=id)
     if not event:
         raise HTTPException(status_code=404, detail="Event ID not found.")
+    etag = entity_etag("event", event.id, event._version)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    response.headers["ETag"] = etag
     return event
 
+
+@router.get("/{id}/tree/", response_model=EventTreeModel, name="Get Event tree")
+async def get_event_tree(
+    id: int,
+    active_only: bool = False,
+    depth: int = Query(1, ge=0, le=1),
+    events_repo: EventRepository = Depends(get_repository(EventRepository)),
+) -> Response:
+    """Return the event with its selections; the JSON is built by the database."""
+    tree = await events_repo.get_event_tree(id=id, depth=depth, active_only=active_only)
+    if tree is None:
+        raise HTTPException(status_code=404, detail="Event ID not found.")
+    return Response(tree, media_type="application/json")
+
 @router.get("/", response_model=List[EventPersistModel], name="Get all Events")
-async def get_all_events(name: Optional[str] = None, active_selections_count: Optional[int] = None,
+async def get_all_events(request: Request, response: Response, name: Optional[str] = None, active_selections_count: Optional[int] = None,
+    sport_id: Optional[int] = None,
+    status: Optional[EventStatusModel] = None,
+    type: Optional[EventTypeModel] = None,
+    scheduled_start_from: Optional[datetime] = None,
+    scheduled_start_to: Optional[datetime] = None,
+    limit: Optional[int] = Query(None, ge=1, le=appConfig.MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    order_by: EventOrderByModel = EventOrderByModel.id,
+    include_total: bool = False,
+    stream: bool = False,
     events_repo: EventRepository = Depends(get_repository(EventRepository)),
 ) -> List[EventPersistModel]:
-    search_filters = {"name": name,"active_selections_count": active_selections_count}
-    return await events_repo.get_all_events(search_filters)
+    search_filters = {
+        "name": name,
+        "active_selections_count": active_selections_count,
+        "sport_id": sport_id,
+        "status": status.value if status else None,
+        "type": type.value if type else None,
+        "scheduled_start_from": scheduled_start_from,
+        "scheduled_start_to": scheduled_start_to,
+    }
+
+    etag = list_etag(request, "events", await events_repo.get_events_version())
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    if stream or wants_ndjson(request):
+        try:
+            records = events_repo.iterate_events(search_filters, limit=limit, after=after, order_by=order_by.value)
+        except InvalidCursorError:
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+        streamed = stream_records(request, records, EventPersistModel)
+        streamed.headers["ETag"] = etag
+        return streamed
+
+    limit = limit or appConfig.DEFAULT_PAGE_SIZE
+    try:
+        events = await events_repo.get_all_events(search_filters, limit=limit, after=after, order_by=order_by.value)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+    response.headers["ETag"] = etag
+    if len(events) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(order_by.value, events[-1])
+    if include_total:
+        response.headers["X-Total-Count-Estimate"] = str(await events_repo.estimate_events_count(search_filters))
+    if appConfig.FAST_JSON_RESPONSES:
+        return fast_json_response(events, EventPersistModel, response)
+    return events
 
 
 @router.post("/", response_model=EventPersistModel, name="Create Event")
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", name="Get metrics", include_in_schema=False)
+async def get_metrics(request: Request) -> Response:
+    pools = {
+        "primary": getattr(request.app.state, "_db", None),
+        "replica": getattr(request.app.state, "_replica_db", None),
+    }
+    return Response(metrics.render(pools), media_type="text/plain; version=0.0.4")
@@ -1,30 +1,81 @@
 from typing import List, Optional
 from asyncpg import ForeignKeyViolationError
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
 
 from app.api_routes.deps import get_repository
+from app.api_routes.etag import entity_etag, list_etag, not_modified
+from app.api_routes.serialization import fast_json_response
+from app.api_routes.streaming import stream_records, wants_ndjson
+from app.config.app_config import appConfig
+from app.db.pagination import InvalidCursorError, encode_cursor
 from app.db.repository.selections import SelectionRepository
-from app.schemas.selection import SelectionCreateModel, SelectionPersistModel, SelectionUpdateModel
+from app.schemas.selection import (
+    SelectionBulkResultModel, SelectionCreateModel, SelectionOrderByModel, SelectionPersistModel,
+    SelectionPriceUpdateModel, SelectionUpdateModel,
+)
 
 router = APIRouter()
 
 @router.get("/{id}/", response_model=SelectionPersistModel, name="Get Selection by id")
 async def get_selection_by_id(
+    request: Request,
+    response: Response,
     id: int, selections_repo: SelectionRepository = Depends(get_repository(SelectionRepository)),
 ) -> SelectionPersistModel:
     selection = await selections_repo.get_selection_by_id(id=id)
     if not selection:
         raise HTTPException(status_code=404, detail="Selection ID not found.")
+    etag = entity_etag("selection", selection.id, selection._version)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    response.headers["ETag"] = etag
     return selection
 
 
 @router.get("/", response_model=List[SelectionPersistModel], name="Get all Selections")
 async def get_all_selections(
+    request: Request,
+    response: Response,
     name: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=appConfig.MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    order_by: SelectionOrderByModel = SelectionOrderByModel.id,
+    include_total: bool = False,
+    stream: bool = False,
     selections_repo: SelectionRepository = Depends(get_repository(SelectionRepository)),
 ) -> List[SelectionPersistModel]:
     search_filters = {"name": name}
-    return await selections_repo.get_all_selections(search_filters)
+
+    etag = list_etag(request, "selections", await selections_repo.get_selections_version())
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    if stream or wants_ndjson(request):
+        try:
+            records = selections_repo.iterate_selections(search_filters, limit=limit, after=after, order_by=order_by.value)
+        except InvalidCursorError:
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+        streamed = stream_records(request, records, SelectionPersistModel)
+        streamed.headers["ETag"] = etag
+        return streamed
+
+    limit = limit or appConfig.DEFAULT_PAGE_SIZE
+    try:
+        selections = await selections_repo.get_all_selections(
+            search_filters, limit=limit, after=after, order_by=order_by.value)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+    response.headers["ETag"] = etag
+    if len(selections) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(order_by.value, selections[-1])
+    if include_total:
+        response.headers["X-Total-Count-Estimate"] = str(await selections_repo.estimate_selections_count(search_filters))
+    if appConfig.FAST_JSON_RESPONSES:
+        return fast_json_response(selections, SelectionPersistModel, response)
+    return selections
 
 
 @router.post("/", response_model=SelectionPersistModel, name="Create Selection")
@@ -36,6 +87,27 @@ async def create_selection(
     return created_selection
 
 
+@router.post("/bulk", response_model=List[SelectionBulkResultModel], name="Create Selections in bulk")
+async def create_selections(
+    new_selections: List[SelectionCreateModel] = Body(..., max_items=appConfig.MAX_BULK_SIZE),
+    selection_repo: SelectionRepository = Depends(get_repository(SelectionRepository)),
+) -> List[SelectionBulkResultModel]:
+    created_selections = await selection_repo.create_selections(new_selections=new_selections)
+    return [
+        SelectionBulkResultModel(error=selection) if isinstance(selection, str)
+        else SelectionBulkResultModel(selection=selection)
+        for selection in created_selections
+    ]
+
+
+@router.patch("/prices", response_model=List[SelectionPersistModel], name="Update Selection prices")
+async def update_selection_prices(
+    price_updates: List[SelectionPriceUpdateModel] = Body(..., max_items=appConfig.MAX_PRICE_UPDATE_BATCH_SIZE),
+    selections_repo: SelectionRepository = Depends(get_repository(SelectionRepository)),
+) -> List[SelectionPersistModel]:
+    return await selections_repo.update_prices(price_updates=price_updates)
+
+
 @router.put("/{id}/", response_model=SelectionPersistModel, name="Update Selection")
 async def update_selection(
     id: int, selection_update: SelectionUpdateModel,
@@ -1,15 +1,23 @@
 from databases import Database
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
 from app.api_routes.deps import get_repository
+from app.api_routes.etag import entity_etag, list_etag, not_modified
+from app.api_routes.serialization import fast_json_response
+from app.api_routes.streaming import stream_records, wants_ndjson
+from app.config.app_config import appConfig
+from app.db.pagination import InvalidCursorError, encode_cursor
 from app.db.repository.sports import SportRepository
-from app.schemas.sport import SportCreateModel, SportPersistModel, SportUpdateModel
+from app.db.repository.tree import TreeTooLargeError
+from app.schemas.sport import SportCreateModel, SportOrderByModel, SportPersistModel, SportTreeModel, SportUpdateModel
 
 router = APIRouter()
 
 @router.get("/{id}/", response_model = SportPersistModel,name="Get Sport by id")
 async def get_sport_by_id(
+    request: Request,
+    response: Response,
     id: int,
     sports_repo: SportRepository = Depends(get_repository(SportRepository))
 ) -> SportPersistModel:
@@ -19,19 +27,85 @@ async def get_sport_by_id(
     if not sport:
         raise HTTPException(status_code=404, detail="Sport ID not found.")
 
+    etag = entity_etag("sport", sport.id, sport._version)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    response.headers["ETag"] = etag
     return sport
 
 
+@router.get("/{id}/tree/", response_model=SportTreeModel, name="Get Sport tree")
+async def get_sport_tree(
+    id: int,
+    active_only: bool = False,
+    depth: int = Query(1, ge=0, le=2),
+    limit: int = Query(appConfig.DEFAULT_PAGE_SIZE, ge=1, le=appConfig.MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    sports_repo: SportRepository = Depends(get_repository(SportRepository)),
+) -> Response:
+    """Return the sport with a page of its events and, at depth 2, their selections; the JSON is built by the database."""
+    try:
+        tree, event_ids = await sports_repo.get_sport_tree(
+            id=id, depth=depth, active_only=active_only, limit=limit, after=after
+        )
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+    except TreeTooLargeError as ex:
+        raise HTTPException(status_code=422, detail=f"{ex} Ask for fewer events or for depth 1.")
+    if tree is None:
+        raise HTTPException(status_code=404, detail="Sport ID not found.")
+    response = Response(tree, media_type="application/json")
+    if len(event_ids) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor("id", {"id": event_ids[-1]})
+    return response
+
+
 @router.get("/", response_model=List[SportPersistModel],name="Get all Sports")
 async def get_all_sports(
+    request: Request,
+    response: Response,
     name: Optional[str] = None,
     active_events_count: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=appConfig.MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    order_by: SportOrderByModel = SportOrderByModel.id,
+    include_total: bool = False,
+    stream: bool = False,
     sports_repo: SportRepository = Depends(get_repository(SportRepository)),
 ) -> List[SportPersistModel]:
 
     search_filters = {"name": name, "active_events_count": active_events_count}
 
-    return await sports_repo.get_all_sports(search_filters)
+    etag = list_etag(request, "sports", await sports_repo.get_sports_version())
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    if stream or wants_ndjson(request):
+        try:
+            records = sports_repo.iterate_sports(search_filters, limit=limit, after=after, order_by=order_by.value)
+        except InvalidCursorError:
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+        streamed = stream_records(request, records, SportPersistModel)
+        streamed.headers["ETag"] = etag
+        return streamed
+
+    limit = limit or appConfig.DEFAULT_PAGE_SIZE
+    try:
+        sports = await sports_repo.get_all_sports(search_filters, limit=limit, after=after, order_by=order_by.value)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+    response.headers["ETag"] = etag
+    if len(sports) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(order_by.value, sports[-1])
+    if include_total:
+        response.headers["X-Total-Count-Estimate"] = str(await sports_repo.estimate_sports_count(search_filters))
+
+    if appConfig.FAST_JSON_RESPONSES:
+        return fast_json_response(sports, SportPersistModel, response)
+    return sports
 
 
 @router.post("/", response_model = SportPersistModel,name="Create Sport")
@@ -0,0 +1,27 @@
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.responses import StreamingResponse
+
+from app.api_routes.streaming import stream_changes
+
+router = APIRouter()
+
+@router.get("/", name="Stream changes", response_class=StreamingResponse)
+async def get_changes_stream(
+    request: Request,
+    sport_id: List[int] = Query([]),
+    event_id: List[int] = Query([]),
+    selection_id: List[int] = Query([]),
+) -> StreamingResponse:
+    """Push every event and selection change as a server-sent event.
+
+    Repeat sport_id, event_id or selection_id to only get the changes of those
+    rows, and of the events and selections under them; with none, every change
+    is sent. A reset event means changes were missed and the rows should be
+    read again.
+    """
+    hub = getattr(request.app.state, "_change_hub", None)
+    if hub is None:
+        raise HTTPException(status_code=503, detail="Change stream is not available.")
+    return stream_changes(hub, sport_ids=sport_id, event_ids=event_id, selection_ids=selection_id)
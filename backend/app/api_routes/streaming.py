@@ -0,0 +1,97 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Type
+
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+from app.api_routes.serialization import RecordEncoder, record_encoder
+from app.config.app_config import appConfig
+from app.db.changes import ChangeHub
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows are flushed in small batches so the first bytes go out as soon as the
+# cursor returns its first rows, whatever the size of the full result.
+STREAM_BATCH_SIZE = 100
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def _json_array(records: AsyncIterator[Any], encode: RecordEncoder) -> AsyncIterator[bytes]:
+    batch: List[bytes] = []
+    separator = b""
+    yield b"["
+    async for record in records:
+        batch.append(separator + encode(record))
+        separator = b","
+        if len(batch) == STREAM_BATCH_SIZE:
+            yield b"".join(batch)
+            batch = []
+    batch.append(b"]")
+    yield b"".join(batch)
+
+
+async def _ndjson(records: AsyncIterator[Any], encode: RecordEncoder) -> AsyncIterator[bytes]:
+    batch: List[bytes] = []
+    async for record in records:
+        batch.append(encode(record) + b"\n")
+        if len(batch) == STREAM_BATCH_SIZE:
+            yield b"".join(batch)
+            batch = []
+    if batch:
+        yield b"".join(batch)
+
+
+def stream_records(request: Request, records: AsyncIterator[Any], model: Type[BaseModel]) -> StreamingResponse:
+    """Stream the records as NDJSON when the client asks for it, as a JSON array otherwise."""
+    encode = record_encoder(model, fast=appConfig.FAST_JSON_RESPONSES)
+    if wants_ndjson(request):
+        return StreamingResponse(_ndjson(records, encode), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(_json_array(records, encode), media_type="application/json")
+
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def sse_frame(event: str, data: str, id: Optional[int] = None) -> bytes:
+    frame = f"event: {event}\ndata: {data}\n\n"
+    return (frame if id is None else f"id: {id}\n{frame}").encode()
+
+
+async def _server_sent_events(
+    hub: ChangeHub, filters: Dict[str, List[int]], keepalive: float
+) -> AsyncIterator[bytes]:
+    # The subscription only exists while the body is being sent, so a client
+    # that leaves before it starts never holds one. Every wake up drains the
+    # subscription into one chunk. A reset tells the client it missed changes
+    # and has to read the rows again.
+    subscription = hub.subscribe(**filters)
+    try:
+        yield b": connected\n\n"
+        while True:
+            try:
+                missed, changes = await asyncio.wait_for(subscription.next_batch(), keepalive)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            frames = [sse_frame("reset", "{}")] if missed else []
+            frames.extend(sse_frame(change.entity, change.data, change.version) for change in changes)
+            yield b"".join(frames)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def stream_changes(
+    hub: ChangeHub, *, sport_ids: List[int], event_ids: List[int], selection_ids: List[int]
+) -> StreamingResponse:
+    """Send the changes of the given rows, or of every row, as server-sent events until the client goes away."""
+    filters = {"sport_ids": sport_ids, "event_ids": event_ids, "selection_ids": selection_ids}
+    return StreamingResponse(
+        _server_sent_events(hub, filters, appConfig.CHANGE_STREAM_KEEPALIVE_SECONDS),
+        media_type=SSE_MEDIA_TYPE,
+        # Proxies must pass each event on as soon as it is written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
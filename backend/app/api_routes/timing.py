@@ -0,0 +1,42 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import request_latency
+
+
+class RequestTimingMiddleware:
+    """Observe each request's duration under its route template, e.g. /api/events/{id}/.
+
+    The time runs until the last body chunk is sent, so streamed lists are
+    timed in full. Requests that match no route share one series.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            request_latency.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path_format", "unmatched"),
+                str(status),
+            )
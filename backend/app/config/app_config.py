@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseSettings
 
 class AppConfig(BaseSettings):
@@ -9,8 +11,58 @@ class AppConfig(BaseSettings):
     POSTGRES_SERVER: str = "db"
     POSTGRES_PORT: str = "5432"
     POSTGRES_DB: str = ""
+    # Optional read replica for GET requests; empty server means none. It
+    # shares the primary's credentials and, unless set, its database name.
+    POSTGRES_REPLICA_SERVER: str = ""
+    POSTGRES_REPLICA_PORT: str = "5432"
+    POSTGRES_REPLICA_DB: str = ""
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_CHECK_INTERVAL_SECONDS: float = 1.0
     DB_MIN_CONNECTION_POOL: int = 2
     DB_MAX_CONNECTION_POOL: int = 10
+    # "asyncpg" skips the SQLAlchemy compile step and Record wrapper of the
+    # databases package and talks to an asyncpg pool directly.
+    DB_BACKEND: Literal["databases", "asyncpg"] = "databases"
+    DB_STATEMENT_CACHE_SIZE: int = 256
+    DB_CONNECTION_MAX_QUERIES: int = 50000
+    DB_CONNECTION_MAX_IDLE_SECONDS: float = 300.0
+    # Every process keeps its own get-by-id cache; the TTL bounds how long a
+    # change made through another process can go unseen. 0 disables it.
+    CACHE_MAX_SIZE: int = 10000
+    CACHE_TTL_SECONDS: float = 5.0
+    # Encode list rows straight to JSON, skipping the response_model validation
+    FAST_JSON_RESPONSES: bool = False
+    # Time requests and repository calls for GET /metrics
+    METRICS_ENABLED: bool = True
+    # Share of queries timed for the query hooks and the slow query log, the
+    # log threshold (negative disables it), and whether to log the plan too
+    QUERY_SAMPLE_RATE: float = 1.0
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_EXPLAIN: bool = False
+    # Requests carrying this token in an X-Profile header are profiled;
+    # empty disables profiling. The profile goes to PROFILING_DIR when set,
+    # in the response otherwise.
+    PROFILING_TOKEN: str = ""
+    PROFILING_DIR: str = ""
+    PROFILING_INTERVAL_MS: float = 1.0
+    # GET /stream: each process LISTENs for row changes on one connection of
+    # its own. A subscriber holding more than CHANGE_STREAM_MAX_PENDING unread
+    # rows loses them and is told to read again.
+    CHANGE_STREAM_ENABLED: bool = True
+    CHANGE_STREAM_MAX_PENDING: int = 1000
+    CHANGE_STREAM_KEEPALIVE_SECONDS: float = 15.0
+    CHANGE_STREAM_RETRY_SECONDS: float = 1.0
+    DEFAULT_PAGE_SIZE: int = 100
+    MAX_PAGE_SIZE: int = 1000
+    # A depth 2 sport tree is refused when its page of events holds more
+    # selections than this; a smaller limit or depth 1 gets through.
+    MAX_TREE_SELECTIONS: int = 10000
+    MAX_BULK_SIZE: int = 1000
+    MAX_PRICE_UPDATE_BATCH_SIZE: int = 10000
+    # PUT /selections/{id}/: above 0, updates that can not deactivate an event
+    # are buffered for this many milliseconds per process and written in one
+    # statement per window, the last update of a selection winning.
+    SELECTION_UPDATE_COALESCE_MS: float = 0.0
     
     class Config:
         """Configs for the settings."""
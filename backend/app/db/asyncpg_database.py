@@ -0,0 +1,123 @@
+import re
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+import asyncpg
+
+# Same rule as SQLAlchemy's text(): a :name bind, but not a ::type cast and
+# not an escaped \:name.
+bind_param_regex = re.compile(r"(?<![:\w\\]):(\w+)(?!:)")
+
+
+class Record(asyncpg.Record):
+    """asyncpg Record that also reads columns as attributes, like the databases Record."""
+
+    def __getattr__(self, name: str) -> Any:
+        return self.get(name)
+
+
+@lru_cache(maxsize=1024)
+def compile_query(query: str) -> Tuple[str, Tuple[str, ...]]:
+    """Turn the :name binds of the query into $n placeholders.
+
+    Returns the asyncpg query and the bind names in placeholder order. Queries
+    are compiled once; asyncpg then keeps one prepared statement per query text
+    on every connection.
+    """
+    names: List[str] = []
+
+    def placeholder(match: "re.Match") -> str:
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    compiled = bind_param_regex.sub(placeholder, query).replace("\\:", ":")
+    return compiled, tuple(names)
+
+
+class AsyncpgDatabase:
+    """Drop-in replacement for databases.Database running on an asyncpg pool.
+
+    Only the calls the repositories use are implemented, with the same
+    signatures. A transaction pins its connection to the current task, and
+    every query of that task joins it until the transaction ends.
+    """
+
+    def __init__(self, url: str, **options: Any) -> None:
+        self.url = url
+        self.options = options
+        self.is_connected = False
+        self._pool: Optional[asyncpg.Pool] = None
+        self._connection_context: ContextVar[Optional[asyncpg.Connection]] = ContextVar(
+            "asyncpg_connection", default=None
+        )
+
+    async def connect(self) -> None:
+        self._pool = await asyncpg.create_pool(self.url, record_class=Record, **self.options)
+        self.is_connected = True
+
+    async def disconnect(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+        self.is_connected = False
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[asyncpg.Connection]:
+        connection = self._connection_context.get()
+        if connection is not None:
+            yield connection
+            return
+        assert self._pool is not None, "AsyncpgDatabase is not connected"
+        async with self._pool.acquire() as connection:
+            yield connection
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """Run the block in a transaction; a nested block becomes a savepoint."""
+        async with self.connection() as connection:
+            token = self._connection_context.set(connection)
+            try:
+                async with connection.transaction():
+                    yield
+            finally:
+                self._connection_context.reset(token)
+
+    async def fetch_all(self, query: str, values: Optional[dict] = None) -> List[Record]:
+        query, args = self._bind(query, values)
+        async with self.connection() as connection:
+            return await connection.fetch(query, *args)
+
+    async def fetch_one(self, query: str, values: Optional[dict] = None) -> Optional[Record]:
+        query, args = self._bind(query, values)
+        async with self.connection() as connection:
+            return await connection.fetchrow(query, *args)
+
+    async def fetch_val(self, query: str, values: Optional[dict] = None, column: Any = 0) -> Any:
+        row = await self.fetch_one(query, values)
+        return None if row is None else row[column]
+
+    async def execute(self, query: str, values: Optional[dict] = None) -> Any:
+        query, args = self._bind(query, values)
+        async with self.connection() as connection:
+            return await connection.fetchval(query, *args)
+
+    async def iterate(self, query: str, values: Optional[dict] = None) -> AsyncIterator[Record]:
+        """Yield the rows from a server-side cursor, which needs a transaction."""
+        query, args = self._bind(query, values)
+        async with self.connection() as connection:
+            async with connection.transaction():
+                async for row in connection.cursor(query, *args):
+                    yield row
+
+    @staticmethod
+    def _bind(query: str, values: Optional[dict]) -> Tuple[str, list]:
+        query, names = compile_query(query)
+        values = values or {}
+        missing = [name for name in names if name not in values]
+        if missing:
+            raise KeyError(f"No value for the bind parameters: {', '.join(missing)}")
+        return query, [values[name] for name in names]
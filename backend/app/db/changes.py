@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Collection, Dict, Hashable, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# The channel the event and selection triggers notify on, with JSON arrays of
+# {"entity", "sport_id", "event_id", "row"} objects
+CHANNEL = "row_changes"
+
+
+class Change(NamedTuple):
+    entity: str
+    id: int
+    sport_id: int
+    event_id: int
+    version: int
+    # The row as JSON, encoded once however many subscribers receive it
+    data: str
+
+
+class Subscription:
+    """The changes one client has not read yet, bounded and coalesced by row.
+
+    A row that changes again before the client read it is only sent in its
+    latest state. When more than max_pending rows are waiting, the pending
+    changes are dropped and the client is told it missed some, so it reads
+    the rows again instead of slowing down the listener.
+    """
+
+    def __init__(
+        self, *, sport_ids: Collection[int] = (), event_ids: Collection[int] = (),
+        selection_ids: Collection[int] = (), max_pending: int,
+    ) -> None:
+        self.sport_ids = frozenset(sport_ids)
+        self.event_ids = frozenset(event_ids)
+        self.selection_ids = frozenset(selection_ids)
+        self.max_pending = max_pending
+        self.missed = False
+        self.coalesced = 0
+        self.dropped = 0
+        self._pending: "OrderedDict[Hashable, Change]" = OrderedDict()
+        self._ready = asyncio.Event()
+
+    @property
+    def filtered(self) -> bool:
+        return bool(self.sport_ids or self.event_ids or self.selection_ids)
+
+    def offer(self, change: Change) -> None:
+        key = (change.entity, change.id)
+        if key in self._pending:
+            self.coalesced += 1
+        self._pending[key] = change
+        self._pending.move_to_end(key)
+        if len(self._pending) > self.max_pending:
+            self.dropped += len(self._pending)
+            self._pending.clear()
+            self.missed = True
+        self._ready.set()
+
+    def mark_missed(self) -> None:
+        self.missed = True
+        self._ready.set()
+
+    async def next_batch(self) -> Tuple[bool, List[Change]]:
+        """Wait for changes, then return whether some were missed and the pending ones, oldest first."""
+        await self._ready.wait()
+        self._ready.clear()
+        missed, self.missed = self.missed, False
+        changes = list(self._pending.values())
+        self._pending.clear()
+        return missed, changes
+
+
+class ChangeHub:
+    """Listen for row changes on one connection and hand them to every matching subscription.
+
+    Subscriptions are indexed by the ids they filter on, so a change only
+    visits the subscriptions that want it. Notifications sent while the
+    connection was lost are gone, so every subscription is told it missed
+    changes once the hub listens again.
+    """
+
+    def __init__(self, uri: str, *, max_pending: int, retry_interval: float) -> None:
+        self.uri = uri
+        self.max_pending = max_pending
+        self.retry_interval = retry_interval
+        self.connection: Optional[asyncpg.Connection] = None
+        self._unfiltered: Set[Subscription] = set()
+        self._by_id: Dict[Tuple[str, int], Set[Subscription]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _keys(self, subscription: Subscription) -> Iterable[Tuple[str, int]]:
+        yield from (("sport", id) for id in subscription.sport_ids)
+        yield from (("event", id) for id in subscription.event_ids)
+        yield from (("selection", id) for id in subscription.selection_ids)
+
+    def subscribe(
+        self, *, sport_ids: Collection[int] = (), event_ids: Collection[int] = (), selection_ids: Collection[int] = ()
+    ) -> Subscription:
+        """Subscribe to the changes of the given sports, events and selections, or to every change."""
+        subscription = Subscription(
+            sport_ids=sport_ids, event_ids=event_ids, selection_ids=selection_ids, max_pending=self.max_pending
+        )
+        if not subscription.filtered:
+            self._unfiltered.add(subscription)
+        for key in self._keys(subscription):
+            self._by_id.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._unfiltered.discard(subscription)
+        for key in self._keys(subscription):
+            subscribers = self._by_id.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_id[key]
+
+    def subscriptions(self) -> Set[Subscription]:
+        return self._unfiltered.union(*self._by_id.values())
+
+    def publish(self, payload: str) -> None:
+        """Hand every change of a notification payload to the subscriptions it matches."""
+        for item in json.loads(payload):
+            row = item["row"]
+            change = Change(
+                item["entity"], row["id"], item["sport_id"], item["event_id"], row["version"],
+                json.dumps(row, separators=(",", ":")),
+            )
+            subscribers = self._unfiltered.union(
+                self._by_id.get(("sport", change.sport_id), ()),
+                self._by_id.get(("event", change.event_id), ()),
+                self._by_id.get((change.entity, change.id), ()) if change.entity == "selection" else (),
+            )
+            for subscription in subscribers:
+                subscription.offer(change)
+
+    def _on_notification(self, connection: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            self.publish(payload)
+        except (ValueError, KeyError, TypeError) as ex:
+            logger.warning("Unreadable change notification: %s", ex)
+
+    async def _listen(self) -> asyncio.Event:
+        """Connect and LISTEN; return an event set once the connection is lost."""
+        lost = asyncio.Event()
+        connection = await asyncpg.connect(self.uri)
+        connection.add_termination_listener(lambda _: lost.set())
+        await connection.add_listener(CHANNEL, self._on_notification)
+        self.connection = connection
+        return lost
+
+    async def _run(self, lost: asyncio.Event) -> None:
+        while True:
+            await lost.wait()
+            self.connection = None
+            logger.warning("Change listener connection lost, reconnecting")
+            while True:
+                try:
+                    lost = await self._listen()
+                    break
+                except (OSError, asyncpg.PostgresError) as ex:
+                    logger.warning("Change listener reconnect failed: %s", ex)
+                    await asyncio.sleep(self.retry_interval)
+            for subscription in self.subscriptions():
+                subscription.mark_missed()
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run(await self._listen()))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
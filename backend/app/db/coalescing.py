@@ -0,0 +1,143 @@
+import asyncio
+import contextvars
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+from app.metrics import coalesced_writes
+
+Update = TypeVar("Update")
+Result = TypeVar("Result")
+Apply = Callable[[Dict[Hashable, Update]], Awaitable[Dict[Hashable, Result]]]
+
+# A flush runs in a task of its own, which would inherit the context of the
+# request that opened the window, and with it the connection the databases
+# package tied to that request. The empty context takes one from the pool.
+flush_context = contextvars.Context()
+
+
+class _Batch:
+    def __init__(self, apply: Apply) -> None:
+        self.apply = apply
+        self.updates: Dict[Hashable, Update] = {}
+        # The updates of each key as submitted, before they were merged
+        self.parts: Dict[Hashable, List[Update]] = {}
+        self.submitted = 0
+        # By key and index in its parts, for the callers whose update failed
+        self.errors: Dict[Tuple[Hashable, int], Exception] = {}
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class WriteCoalescer(Generic[Update, Result]):
+    """Buffer updates per key for a few milliseconds and apply each window's updates as one batch.
+
+    The first update of a window starts its timer, and every update submitted
+    before it fires joins the batch. An update of a key already in the batch
+    is merged over the earlier one, so the batch holds one update per key.
+    Batches are applied one after the other in the order their windows
+    opened, which makes the last update submitted for a key the one that
+    sticks: last writer wins, in arrival order.
+
+    Every caller waits for its batch and gets the result of its key, the row
+    as the batch left it. A caller whose update a later one overwrote in the
+    same window gets that later state. When a batch fails, its keys are
+    applied again one by one, and a key whose merged update fails has the
+    update of each of its callers applied alone, in order, so that a bad
+    update only fails its own caller.
+    """
+
+    def __init__(self, entity: str, *, window: float, max_batch: int, merge: Callable[[Update, Update], Update]) -> None:
+        self.entity = entity
+        self.window = window
+        self.max_batch = max_batch
+        self.merge = merge
+        self.submitted = 0
+        self.applied = 0
+        self.batches = 0
+        self._pending: Optional[_Batch] = None
+        self._last_flush: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def submit(self, key: Hashable, update: Update, apply: Apply) -> Optional[Result]:
+        """Buffer the update of key and return its result once the batch is applied.
+
+        apply is called with the batch's updates by key and returns the results
+        by key; a key missing from its results gets None. The batch is applied
+        with the apply function of the update that opened its window.
+        """
+        batch = self._pending
+        if batch is None:
+            batch = self._pending = _Batch(apply)
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        parts = batch.parts.setdefault(key, [])
+        part = len(parts)
+        parts.append(update)
+        if key in batch.updates:
+            update = self.merge(batch.updates[key], update)
+        batch.updates[key] = update
+        batch.submitted += 1
+        self.submitted += 1
+        if len(batch.updates) >= self.max_batch:
+            batch.timer.cancel()
+            self._flush()
+        # One caller giving up must not cancel the batch of the others
+        results = await asyncio.shield(batch.done)
+        if (key, part) in batch.errors:
+            raise batch.errors[key, part]
+        return results.get(key)
+
+    async def wait_for(self, key: Hashable) -> None:
+        """Wait until the buffered updates of key are applied, for writes that can not join a batch."""
+        batch = self._pending
+        if batch is not None and key in batch.updates:
+            await asyncio.wait([batch.done])
+        elif self._last_flush is not None and not self._last_flush.done():
+            await asyncio.wait([self._last_flush])
+
+    def stats(self) -> Dict[str, int]:
+        return {"submitted": self.submitted, "applied": self.applied, "batches": self.batches}
+
+    def _flush(self) -> None:
+        batch, self._pending = self._pending, None
+        previous = self._last_flush
+        self._last_flush = flush_context.run(asyncio.ensure_future, self._apply(batch, previous))
+
+    async def _apply(self, batch: _Batch, previous: Optional[asyncio.Task]) -> None:
+        if previous is not None and not previous.done():
+            await asyncio.wait([previous])
+        try:
+            batch.done.set_result(await self._results(batch))
+        finally:
+            if not batch.done.done():
+                batch.done.cancel()
+            self.batches += 1
+            self.applied += len(batch.updates)
+            coalesced_writes.observe(batch.submitted, self.entity)
+
+    async def _results(self, batch: _Batch) -> Dict[Hashable, Result]:
+        try:
+            return await batch.apply(batch.updates)
+        except Exception as ex:
+            failure = ex
+        # Whether one update broke the statement or every one of them would
+        # fail, only applying them alone tells each caller its own outcome
+        results: Dict[Hashable, Result] = {}
+        for key, update in batch.updates.items():
+            if len(batch.updates) > 1:
+                try:
+                    results.update(await batch.apply({key: update}))
+                    continue
+                except Exception as ex:
+                    failure = ex
+            parts = batch.parts[key]
+            if len(parts) == 1:
+                batch.errors[key, 0] = failure
+                continue
+            for index, part in enumerate(parts):
+                try:
+                    results.update(await batch.apply({key: part}))
+                except Exception as ex:
+                    batch.errors[key, index] = ex
+        return results
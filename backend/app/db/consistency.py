@@ -0,0 +1,62 @@
+"""Check, and optionally repair, the active child counters kept by triggers.
+
+    python -m app.db.consistency [--fix]
+"""
+import argparse
+import asyncio
+import sys
+from typing import List, Mapping
+
+from databases import Database
+
+from app.db.session import get_database_uri
+
+# (parent, counter column, child, parent id column)
+active_counters = (
+    ("sport", "active_event_count", "event", "sport_id"),
+    ("event", "active_selection_count", "selection", "event_id"),
+)
+
+counter_mismatch_query = "SELECT '{parent}' AS entity, {parent}.id, {parent}.{counter} AS stored, " \
+    "count({child}.id) AS actual " \
+    "FROM {parent} LEFT JOIN {child} ON {child}.{parent_id} = {parent}.id AND {child}.active = true " \
+    "GROUP BY {parent}.id " \
+    "HAVING {parent}.{counter} <> count({child}.id)"
+
+counter_repair_query = "UPDATE {parent} SET {counter} = mismatch.actual " \
+    "FROM (" + counter_mismatch_query + ") AS mismatch " \
+    "WHERE {parent}.id = mismatch.id"
+
+
+async def check_active_counters(db: Database, *, fix: bool = False) -> List[Mapping]:
+    """Return the parents whose stored counter differs from their active children.
+
+    With fix, the stored counters are also set to the recounted values.
+    """
+    mismatches = []
+    for parent, counter, child, parent_id in active_counters:
+        names = {"parent": parent, "counter": counter, "child": child, "parent_id": parent_id}
+        mismatches.extend(await db.fetch_all(query=counter_mismatch_query.format(**names)))
+        if fix:
+            await db.execute(query=counter_repair_query.format(**names))
+    return mismatches
+
+
+async def main(fix: bool) -> int:
+    db = Database(get_database_uri())
+    await db.connect()
+    try:
+        mismatches = await check_active_counters(db, fix=fix)
+    finally:
+        await db.disconnect()
+
+    for mismatch in mismatches:
+        print(f"{mismatch['entity']} {mismatch['id']}: stored {mismatch['stored']}, actual {mismatch['actual']}")
+    print(f"{len(mismatches)} mismatched counters" + (", repaired" if fix and mismatches else ""))
+    return 1 if mismatches and not fix else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the active child counters against the child tables.")
+    parser.add_argument("--fix", action="store_true", help="rewrite the mismatched counters")
+    sys.exit(asyncio.run(main(parser.parse_args().fix)))
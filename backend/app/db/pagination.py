@@ -0,0 +1,86 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Parsers for the keyset columns that are not plain integers. The cursor keeps
+# these values as strings so they survive the JSON round trip.
+cursor_value_parsers: Dict[str, Callable[[str], Any]] = {
+    "scheduled_start": datetime.fromisoformat,
+    "price": Decimal,
+}
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(order_by: str, record: Any) -> str:
+    """Return an opaque cursor pointing right after the given record."""
+    row = dict(record)
+    payload = {"o": order_by, "id": row["id"]}
+    if order_by != "id":
+        value = row[order_by]
+        payload["v"] = value.isoformat() if isinstance(value, datetime) else str(value)
+    return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(order_by: str, cursor: str) -> Tuple[Any, int]:
+    """Return the (order_by value, id) pair stored in the cursor."""
+    try:
+        payload = json.loads(urlsafe_b64decode(cursor.encode()))
+        if payload["o"] != order_by:
+            raise InvalidCursorError("Cursor was created for a different ordering.")
+        value = cursor_value_parsers[order_by](payload["v"]) if order_by != "id" else None
+        return value, int(payload["id"])
+    except InvalidCursorError:
+        raise
+    except Exception as ex:
+        raise InvalidCursorError("Malformed cursor.") from ex
+
+
+def encode_change_cursor(xid: int, version: int) -> str:
+    """Return an opaque change feed cursor pointing right after the change (xid, version)."""
+    return urlsafe_b64encode(json.dumps({"x": xid, "v": version}).encode()).decode()
+
+
+def decode_change_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        payload = json.loads(urlsafe_b64decode(cursor.encode()))
+        return int(payload["x"]), int(payload["v"])
+    except Exception as ex:
+        raise InvalidCursorError("Malformed cursor.") from ex
+
+
+def keyset_condition(order_by: str, after: Optional[str]) -> Tuple[Optional[str], dict]:
+    """Return the WHERE condition and values that skip every row up to the cursor."""
+    if not after:
+        return None, {}
+
+    value, after_id = decode_cursor(order_by, after)
+    if order_by == "id":
+        return "id > :after_id", {"after_id": after_id}
+    return f"({order_by}, id) > (:after_value, :after_id)", {"after_value": value, "after_id": after_id}
+
+
+def order_by_clause(order_by: str) -> str:
+    return " ORDER BY id" if order_by == "id" else f" ORDER BY {order_by}, id"
+
+
+def page_query(query: str, filter_conditions: List[str], filter_values: Optional[dict] = None, *,
+    order_by: str = "id", after: Optional[str] = None, limit: Optional[int] = None) -> Tuple[str, dict]:
+    """Return the query and values for one keyset page of the filtered query."""
+    conditions = list(filter_conditions)
+    after_condition, query_values = keyset_condition(order_by, after)
+    query_values.update(filter_values or {})
+    if after_condition:
+        conditions.append(after_condition)
+
+    if conditions:
+        query += " where " + " and ".join(conditions)
+    query += order_by_clause(order_by)
+    if limit is not None:
+        query += " LIMIT :limit"
+        query_values["limit"] = limit
+    return query, query_values
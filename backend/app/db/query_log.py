@@ -0,0 +1,110 @@
+import logging
+import random
+import re
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config.app_config import appConfig
+
+logger = logging.getLogger(__name__)
+
+# Called as hook(repository, query, values, seconds) for every sampled query
+QueryHook = Callable[[str, str, Optional[dict], float], None]
+query_hooks: List[QueryHook] = []
+
+literal_regex = re.compile(r"'(?:[^']|'')*'|(?<![\w:$])\d+(?:\.\d+)?\b")
+whitespace_regex = re.compile(r"\s+")
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace and replace inline literals with ?, so equal statements log alike."""
+    return literal_regex.sub("?", whitespace_regex.sub(" ", query).strip())
+
+
+def _shape(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        element = type(value[0]).__name__ if value else "?"
+        return f"{element}[{len(value)}]"
+    return type(value).__name__
+
+
+def param_shapes(values: Optional[dict]) -> Dict[str, str]:
+    """Describe each bound value by its type, and lists by their length, never by the value itself."""
+    return {name: _shape(value) for name, value in (values or {}).items()}
+
+
+class InstrumentedDatabase:
+    """Wrap a repository's database so that every query it runs is timed.
+
+    fetch_one, fetch_all, fetch_val and execute go through the hooks and the
+    slow query log; everything else (transactions, cursors) is passed through.
+    QUERY_SAMPLE_RATE picks the share of queries that are timed at all.
+    """
+
+    def __init__(self, db: Any, repository: Any) -> None:
+        self._db = db
+        self._repository = repository
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._db, name)
+
+    async def fetch_one(self, query: str, values: Optional[dict] = None) -> Any:
+        return await self._timed(self._db.fetch_one, query, values)
+
+    async def fetch_all(self, query: str, values: Optional[dict] = None) -> Any:
+        return await self._timed(self._db.fetch_all, query, values)
+
+    async def fetch_val(self, query: str, values: Optional[dict] = None, column: Any = 0) -> Any:
+        return await self._timed(self._db.fetch_val, query, values, column=column)
+
+    async def execute(self, query: str, values: Optional[dict] = None) -> Any:
+        return await self._timed(self._db.execute, query, values)
+
+    async def _timed(self, call: Callable, query: str, values: Optional[dict], **kwargs: Any) -> Any:
+        rate = appConfig.QUERY_SAMPLE_RATE
+        if rate < 1 and random.random() >= rate:
+            return await call(query=query, values=values, **kwargs)
+
+        start = time.perf_counter()
+        result = await call(query=query, values=values, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        for hook in query_hooks:
+            hook(type(self._repository).__name__, query, values, elapsed)
+        threshold = appConfig.SLOW_QUERY_THRESHOLD_MS
+        if threshold >= 0 and elapsed * 1000 >= threshold:
+            await self._log_slow_query(query, values, elapsed)
+        return result
+
+    def _calling_method(self) -> str:
+        """Return Class.method of the innermost repository method on the stack that is not a BaseRepository helper."""
+        from app.db.repository.base import BaseRepository
+
+        frame = sys._getframe(1)
+        while frame is not None:
+            if frame.f_locals.get("self") is self._repository and not hasattr(BaseRepository, frame.f_code.co_name):
+                return f"{type(self._repository).__name__}.{frame.f_code.co_name}"
+            frame = frame.f_back
+        return type(self._repository).__name__
+
+    async def _log_slow_query(self, query: str, values: Optional[dict], elapsed: float) -> None:
+        plan = ""
+        if appConfig.SLOW_QUERY_EXPLAIN:
+            # Without ANALYZE, so explaining a write does not run it again. In
+            # the caller's transaction the EXPLAIN is a savepoint, which a
+            # failure rolls back without aborting the rest.
+            try:
+                async with self._db.transaction():
+                    rows = await self._db.fetch_all(query="EXPLAIN " + query, values=values)
+                plan = "\n" + "\n".join(row[0] for row in rows)
+            except Exception as ex:
+                plan = f"\nEXPLAIN failed: {ex}"
+        logger.warning(
+            "Slow query (%.1f ms) in %s: %s params=%s%s",
+            elapsed * 1000,
+            self._calling_method(),
+            normalize_sql(query),
+            param_shapes(values),
+            plan,
+        )
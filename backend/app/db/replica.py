@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# The position the replica has replayed up to, and how far behind the primary
+# it is. A replica that replayed everything it received is up to date, however
+# old its last replayed transaction. A server that is not in recovery (a plain
+# second database, as in local setups) is treated as up to date.
+replica_status_query = "SELECT " \
+    "CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn() ELSE pg_current_wal_lsn() END::text AS lsn, " \
+    "CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 " \
+    "ELSE COALESCE(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END AS lag_seconds"
+
+current_lsn_query = "SELECT pg_current_wal_lsn()::text"
+
+
+def parse_lsn(lsn: Optional[str]) -> Optional[int]:
+    """Turn a 'X/Y' WAL position into a comparable integer, None when it is not one."""
+    try:
+        high, low = lsn.split("/")
+        return (int(high, 16) << 32) + int(low, 16)
+    except (AttributeError, ValueError):
+        return None
+
+
+class ReplicaMonitor:
+    """Poll a read replica and tell whether it may serve a read.
+
+    The replica is only used while its last check succeeded and its lag was
+    within bounds; a read that must see a given write also needs the replica
+    to have replayed past that write's LSN.
+    """
+
+    def __init__(self, db: Any, *, max_lag: float, interval: float) -> None:
+        self.db = db
+        self.max_lag = max_lag
+        self.interval = interval
+        self.healthy = False
+        self.lsn: Optional[int] = None
+        self.lag: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def check(self) -> None:
+        try:
+            status = await self.db.fetch_one(query=replica_status_query)
+        except Exception as ex:
+            if self.healthy:
+                logger.warning("Replica check failed, reading from the primary: %s", ex)
+            self.healthy = False
+            return
+        self.lsn = parse_lsn(status["lsn"])
+        self.lag = float(status["lag_seconds"])
+        healthy = self.lsn is not None and self.lag <= self.max_lag
+        if healthy != self.healthy:
+            logger.warning("Replica %s (lag %.1fs)", "healthy" if healthy else "lagging, reading from the primary", self.lag)
+        self.healthy = healthy
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    async def start(self) -> None:
+        await self.check()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def can_serve(self, min_lsn: Optional[str] = None) -> bool:
+        """Return whether the replica may serve a read that must see the write at min_lsn."""
+        if not self.healthy:
+            return False
+        if min_lsn is None:
+            return True
+        required = parse_lsn(min_lsn)
+        return required is not None and self.lsn is not None and self.lsn >= required
@@ -1,5 +1,111 @@
+import functools
+import inspect
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Iterable, List, Mapping, Optional, Type, TypeVar
+
 from databases import Database
 
+from app.config.app_config import appConfig
+from app.db.cache import record_cache
+from app.db.query_log import InstrumentedDatabase
+from app.metrics import cascade_steps, query_latency
+from app.schemas.base import VersionedModel
+
+ModelType = TypeVar("ModelType", bound=VersionedModel)
+
+# Binds holding a regular expression the trigram indexes can only use once
+# the plan knows the pattern
+PATTERN_BINDS = ("name",)
+
+custom_plan_query = "SET LOCAL plan_cache_mode = force_custom_plan"
+
+
+def timed(name: str, method: Callable) -> Callable:
+    @functools.wraps(method)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            query_latency.observe(time.perf_counter() - start, name)
+
+    return wrapper
+
+
 class BaseRepository:
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """Time every public coroutine method a repository defines, as Class.method."""
+        super().__init_subclass__(**kwargs)
+        if not appConfig.METRICS_ENABLED:
+            return
+        for name, attribute in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.iscoroutinefunction(attribute):
+                setattr(cls, name, timed(f"{cls.__name__}.{name}", attribute))
+
     def __init__(self, db: Database) -> None:
-        self.db = db
\ No newline at end of file
+        # Repositories built from another repository's db get their own wrapper
+        if isinstance(db, InstrumentedDatabase):
+            db = db._db
+        self.db = InstrumentedDatabase(db, self)
+
+    @asynccontextmanager
+    async def custom_plans(self, values: Optional[dict]) -> AsyncIterator[None]:
+        """Plan the statements of the block for their values when those hold a name pattern.
+
+        A prepared statement switches to a generic plan after five runs, and a
+        generic plan walks the whole table for a bound pattern. The setting is
+        local to a transaction, so only searches pay for planning every run.
+        """
+        if not any(bind in (values or {}) for bind in PATTERN_BINDS):
+            yield
+            return
+        async with self.db.transaction():
+            await self.db.execute(query=custom_plan_query)
+            yield
+
+    async def fetch_search(self, query: str, values: dict) -> List[Any]:
+        async with self.custom_plans(values):
+            return await self.db.fetch_all(query=query, values=values)
+
+    async def iterate_search(self, query: str, values: dict) -> AsyncIterator[Any]:
+        async with self.custom_plans(values):
+            async for record in self.db.iterate(query=query, values=values):
+                yield record
+
+    async def estimate_count(self, query: str, values: dict = None) -> int:
+        """Return the planner's row estimate for the query instead of running COUNT(*)."""
+        async with self.custom_plans(values):
+            plan = await self.db.fetch_one(query="EXPLAIN (FORMAT JSON) " + query, values=values)
+        plan = plan[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    async def fetch_cached_by_id(self, entity: str, id: int, query: str, model: Type[ModelType]) -> Optional[ModelType]:
+        """Read through the record cache: return the cached model, or fetch, cache and return it."""
+        cached = record_cache.get((entity, id))
+        if cached is not None:
+            return cached
+
+        generation = record_cache.generation
+        record = await self.db.fetch_one(query=query, values={"id": id})
+        if not record:
+            return None
+        persisted = model(**record)
+        persisted._version = record["version"]
+        # A replica may still hold a row the primary already changed and invalidated
+        if not getattr(self.db, "is_replica", False):
+            record_cache.put((entity, id), persisted, generation)
+        return persisted
+
+    @staticmethod
+    def invalidate_cached(entity: str, ids: Iterable[int] = (), deactivated: Iterable[Mapping] = ()) -> None:
+        """Drop the changed rows from the record cache, plus every (entity, id) row the cascade deactivated.
+
+        Every write calls this once, so it also records the cascade's size.
+        """
+        deactivated = list(deactivated)
+        cascade_steps.observe(len(deactivated), entity)
+        record_cache.invalidate(*((entity, id) for id in ids), *((row["entity"], row["id"]) for row in deactivated))
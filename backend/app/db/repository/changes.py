@@ -0,0 +1,38 @@
+from typing import List, Optional, Tuple
+
+from app.db.pagination import decode_change_cursor, encode_change_cursor
+from app.db.repository.base import BaseRepository
+from app.db.repository.tree import event_fields, selection_fields, sport_fields
+
+# A row is in the feed once, at the (changed_xid, version) of its last write.
+# Only the writes of transactions older than every running one are read, so
+# a transaction that commits later always lands after the cursor. Each table
+# is read from the cursor on along its (changed_xid, version) index and stops
+# at the limit, so a page costs the same whatever the size of the tables.
+table_changes = "(SELECT changed_xid, version, " \
+    "json_build_object('entity', '{table}', 'row', json_build_object({fields}))::text AS change " \
+    "FROM {table} " \
+    "WHERE (changed_xid, version) > (CAST(:xid AS xid8), :version) " \
+    "AND changed_xid < pg_snapshot_xmin(pg_current_snapshot()) " \
+    "ORDER BY changed_xid, version LIMIT :limit)"
+
+changes_query = "SELECT changed_xid AS xid, version, change FROM (" + " UNION ALL ".join(
+    table_changes.format(table=table, fields=fields)
+    for table, fields in (("sport", sport_fields), ("event", event_fields), ("selection", selection_fields))
+) + ") AS changed ORDER BY changed_xid, version LIMIT :limit"
+
+
+class ChangeRepository(BaseRepository):
+    async def get_changes(self, *, since: Optional[str], limit: int) -> Tuple[List[str], str]:
+        """Return the JSON of up to limit changes after the cursor, oldest first, and the cursor after them.
+
+        Without a cursor the feed starts from the first row, so a new consumer
+        reads every row once and then only what changed.
+        """
+        xid, version = decode_change_cursor(since) if since else (0, 0)
+        changes = await self.db.fetch_all(
+            query=changes_query, values={"xid": xid, "version": version, "limit": limit}
+        )
+        if changes:
+            xid, version = changes[-1]["xid"], changes[-1]["version"]
+        return [change["change"] for change in changes], encode_change_cursor(xid, version)
@@ -1,8 +1,10 @@
-from typing import List
+from typing import AsyncIterator, List, Mapping, Optional, Tuple
 from datetime import datetime, timezone
 
+from app.db.pagination import page_query
 from app.db.repository.base import BaseRepository
 from app.db.repository.sports import SportRepository
+from app.db.repository.tree import tree_query
 from app.schemas.event import EventCreateModel, EventPersistModel, EventStatusModel, EventUpdateModel
 
 create_query = "INSERT INTO event (name, slug, active, type, sport_id, status, scheduled_start, actual_start) " \
@@ -13,25 +15,47 @@ get_query = "SELECT * FROM event"
 
 get_by_id_query = "SELECT * FROM event WHERE ID = :id"
 
-update_query = "UPDATE event " \
-    "SET name = :name, " \
-    "slug = :slug, " \
-    "active = :active, " \
-    "type = :type, " \
-    "sport_id = :sport_id, " \
-    "status = :status, " \
-    "scheduled_start = :scheduled_start, " \
-    "actual_start = :actual_start " \
-    "WHERE id = :id " \
-    "RETURNING *"
+# Only the supplied columns change; a None value keeps what is stored. The
+# locked CTE hands back the sport the event had before the update.
+update_query = "WITH previous AS (SELECT id, sport_id FROM event WHERE id = :id FOR UPDATE) " \
+    "UPDATE event " \
+    "SET name = COALESCE(:name, name), " \
+    "slug = COALESCE(:slug, slug), " \
+    "active = COALESCE(:active, active), " \
+    "type = COALESCE(:type, type), " \
+    "sport_id = COALESCE(:sport_id, event.sport_id), " \
+    "status = COALESCE(:status, status), " \
+    "scheduled_start = COALESCE(:scheduled_start, scheduled_start), " \
+    "actual_start = COALESCE(:actual_start, actual_start) " \
+    "FROM previous " \
+    "WHERE event.id = previous.id " \
+    "RETURNING event.*, previous.sport_id AS previous_sport_id"
 
 update_actual_start_query = "UPDATE event " \
     "SET actual_start = :actual_start " \
     "WHERE id = :id " \
     "RETURNING *"
 
-check_active_event_query = "SELECT EXISTS " \
-    "(SELECT 1 FROM event WHERE sport_id = :sport_id AND active = true)"
+# Both updates run in one statement and share its snapshot, where the sport
+# counters still include the events being deactivated: a sport goes inactive
+# when all of its active events are in that set.
+deactivate_events_query = "WITH deactivated_event AS (" \
+    "UPDATE event SET active = false " \
+    "WHERE id = ANY(:event_ids) AND active = true AND active_selection_count = 0 " \
+    "RETURNING id, sport_id), " \
+    "deactivated_sport AS (" \
+    "UPDATE sport SET active = false " \
+    "FROM (SELECT sport_id, count(*) AS count FROM deactivated_event GROUP BY sport_id) AS deactivated " \
+    "WHERE sport.id = deactivated.sport_id AND sport.active = true " \
+    "AND sport.active_event_count = deactivated.count " \
+    "RETURNING sport.id) " \
+    "SELECT 'event' AS entity, id FROM deactivated_event " \
+    "UNION ALL SELECT 'sport' AS entity, id FROM deactivated_sport"
+
+table_version_query = "SELECT CAST(COALESCE(sum(writes), 0) AS bigint) FROM table_write_count " \
+    "WHERE table_name = 'event'"
+
+order_by_columns = ("id", "scheduled_start")
 
 
 class EventRepository(BaseRepository):
@@ -41,70 +65,121 @@ class EventRepository(BaseRepository):
             new_event.actual_start = datetime.now(timezone.utc)
         
         query_values = new_event.dict()
-        event = await self.db.fetch_one(query=create_query, values=query_values)
-        
-        if not dict(event)["active"]:
-            active_event = await self.db.fetch_one(query=check_active_event_query,values={"sport_id": dict(event)["sport_id"]}) 
-            if not dict(active_event)["exists"]:
-                sports_repository = SportRepository(self.db)
-                await sports_repository.update_sport_inactive(id=dict(event)["sport_id"])
+        deactivated = []
+        async with self.db.transaction():
+            event = await self.db.fetch_one(query=create_query, values=query_values)
 
+            if not dict(event)["active"]:
+                sports_repository = SportRepository(self.db)
+                deactivated = await sports_repository.deactivate_sports_without_active_events(sport_ids=[dict(event)["sport_id"]])
 
+        self.invalidate_cached("event", deactivated=deactivated)
         return event
 
-    async def get_all_events(self, search_filters: dict) -> List[EventPersistModel]:
-        
-        search_query = get_query
+    def _search_conditions(self, search_filters: dict) -> Tuple[List[str], dict]:
         filter_conditions = []
-        
+        filter_values = {}
+
         for key, val in search_filters.items():
             if val is not None:
                 if key == "name":
-                    filter_conditions.append(key + " ~* " + "'" + val + "'")
+                    filter_conditions.append("name ~* :name")
+                    filter_values["name"] = val
                 elif key == "active_selections_count":
-                    filter_conditions.append("id IN (SELECT event_id FROM selection WHERE active = true GROUP BY event_id HAVING count(*) >= " + str(val) + ")")
-        
-        if filter_conditions:
-            search_query += " where " + " and ".join(filter_conditions)
-        
-        search_result = await self.db.fetch_all(query=search_query)
+                    # An event only matches with at least one active selection
+                    filter_conditions.append("active_selection_count >= :active_selections_count")
+                    filter_values["active_selections_count"] = max(val, 1)
+                elif key in ("sport_id", "status", "type"):
+                    filter_conditions.append(f"{key} = :{key}")
+                    filter_values[key] = val
+                elif key == "scheduled_start_from":
+                    filter_conditions.append("scheduled_start >= :scheduled_start_from")
+                    filter_values["scheduled_start_from"] = val
+                elif key == "scheduled_start_to":
+                    # The window is half open, so consecutive windows never share an event
+                    filter_conditions.append("scheduled_start < :scheduled_start_to")
+                    filter_values["scheduled_start_to"] = val
+        return filter_conditions, filter_values
+
+    async def get_all_events(self, search_filters: dict, *, limit: Optional[int] = None,
+        after: Optional[str] = None, order_by: str = "id") -> List[EventPersistModel]:
+
+        if order_by not in order_by_columns:
+            raise ValueError(f"Events can not be ordered by {order_by}.")
+
+        search_query, query_values = page_query(get_query, *self._search_conditions(search_filters),
+            order_by=order_by, after=after, limit=limit)
+        search_result = await self.fetch_search(search_query, query_values)
         return [event for event in search_result]
 
+    def iterate_events(self, search_filters: dict, *, limit: Optional[int] = None,
+        after: Optional[str] = None, order_by: str = "id") -> AsyncIterator[EventPersistModel]:
+        """Return an async iterator over a server-side cursor, so rows are never all held in memory."""
+        if order_by not in order_by_columns:
+            raise ValueError(f"Events can not be ordered by {order_by}.")
 
-    async def get_event_by_id(self, *, id: int) -> EventPersistModel:
-        event = await self.db.fetch_one(query=get_by_id_query, values={"id": id})       
-        if not event:
-            return None
-        return event
+        search_query, query_values = page_query(get_query, *self._search_conditions(search_filters),
+            order_by=order_by, after=after, limit=limit)
+        return self.iterate_search(search_query, query_values)
 
+    async def get_events_version(self) -> Optional[int]:
+        """Return the count of write statements committed to the table, which moves with every commit."""
+        return await self.db.fetch_val(query=table_version_query)
 
-    async def update_event(self, *, id: int, event_update: EventUpdateModel) -> EventPersistModel:
-        event = await self.get_event_by_id(id=id)
+    async def estimate_events_count(self, search_filters: dict) -> int:
+        search_query, query_values = page_query(get_query, *self._search_conditions(search_filters))
+        return await self.estimate_count(search_query, query_values)
 
-        if not event:
-            return None
+    async def get_event_by_id(self, *, id: int) -> EventPersistModel:
+        return await self.fetch_cached_by_id("event", id, get_by_id_query, EventPersistModel)
 
-        if event_update.status == EventStatusModel.started:
-            event_update.actual_start = datetime.now(timezone.utc)
+    async def get_event_tree(self, *, id: int, depth: int = 1, active_only: bool = False) -> Optional[bytes]:
+        """Return the event with its selections as JSON, built by one statement."""
+        tree = await self.db.fetch_val(query=tree_query("event", depth, active_only), values={"id": id})
+        return None if tree is None else tree.encode()
 
-        update_dict = dict(event).copy()
 
-        for key, val in event_update.dict().items():
-            if val is not None:
-                update_dict[key] = event_update.dict()[key]
+    async def update_event(self, *, id: int, event_update: EventUpdateModel) -> EventPersistModel:
+        if event_update.status == EventStatusModel.started:
+            event_update.actual_start = datetime.now(timezone.utc)
 
-        update_result = await self.db.fetch_one(query=update_query, values=update_dict)
-        
-        if not dict(update_result)["active"]:
-            active_event = await self.db.fetch_one(query=check_active_event_query,values={"sport_id": dict(event)["sport_id"]}) 
-            if not dict(active_event)["exists"]:
+        # Only a deactivation or a move can leave a sport without active
+        # events; any other change is one statement with no transaction.
+        if event_update.active is not False and event_update.sport_id is None:
+            update_result = await self.db.fetch_one(query=update_query, values={**event_update.dict(), "id": id})
+            self.invalidate_cached("event", [id])
+            return update_result
+
+        deactivated = []
+        async with self.db.transaction():
+            update_result = await self.db.fetch_one(query=update_query, values={**event_update.dict(), "id": id})
+
+            if not update_result:
+                return None
+
+            # The previous sport may have lost its last active event, either
+            # because this one went inactive or because it moved away
+            sport_ids = []
+            if not dict(update_result)["active"]:
+                sport_ids = [dict(update_result)["previous_sport_id"], dict(update_result)["sport_id"]]
+            elif dict(update_result)["sport_id"] != dict(update_result)["previous_sport_id"]:
+                sport_ids = [dict(update_result)["previous_sport_id"]]
+            if sport_ids:
                 sports_repository = SportRepository(self.db)
-                await sports_repository.update_sport_inactive(id=dict(event)["sport_id"])
-        
+                deactivated = await sports_repository.deactivate_sports_without_active_events(sport_ids=sport_ids)
+
+        self.invalidate_cached("event", [id], deactivated)
         return update_result     
 
 
-    async def update_event_inactive(self, id: int) -> None:
-        event_inactive = EventUpdateModel()
-        event_inactive.active = False
-        await self.update_event(id=id, event_update=event_inactive)  
\ No newline at end of file
+    async def deactivate_events_without_active_selections(self, *, event_ids: List[int]) -> List[Mapping]:
+        """Deactivate the active events that have no active selection left, then
+        their sports that have no active event left, in one statement.
+
+        Returns an (entity, id) row for every event and sport that was deactivated;
+        the caller invalidates them in the record cache once its transaction commits.
+        """
+        event_ids = [event_id for event_id in set(event_ids) if event_id is not None]
+        if not event_ids:
+            return []
+        return await self.db.fetch_all(query=deactivate_events_query, values={"event_ids": event_ids})
@@ -1,85 +1,272 @@
-from typing import List
+import math
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 
+from app.config.app_config import appConfig
+from app.db.coalescing import WriteCoalescer
+from app.db.pagination import page_query
 from app.db.repository.base import BaseRepository
 from app.db.repository.events import EventRepository
-from app.schemas.selection import SelectionCreateModel, SelectionPersistModel, SelectionUpdateModel
+from app.schemas.selection import SelectionCreateModel, SelectionPersistModel, SelectionPriceUpdateModel, SelectionUpdateModel
 
 create_query = "INSERT INTO selection (name, event_id, price, active, outcome) " \
     "VALUES (:name, :event_id, :price, :active, :outcome) " \
     "RETURNING *"
 
+bulk_create_query = "INSERT INTO selection (name, event_id, price, active, outcome) " \
+    "SELECT name, event_id, price, active, CAST(outcome AS selection_outcome) " \
+    "FROM unnest(CAST(:names AS varchar[]), CAST(:event_ids AS integer[]), CAST(:prices AS numeric[]), " \
+    "CAST(:actives AS boolean[]), CAST(:outcomes AS text[])) " \
+    "WITH ORDINALITY AS new_selection (name, event_id, price, active, outcome, position) " \
+    "ORDER BY position " \
+    "RETURNING *"
+
+existing_events_query = "SELECT id FROM event WHERE id = ANY(:event_ids) FOR KEY SHARE"
+
 get_query = "SELECT * FROM selection"
 
 get_by_id_query = "SELECT * FROM selection WHERE ID = :id"
 
-update_query = "UPDATE selection " \
-    "SET name = :name, " \
-    "active = :active, " \
-    "event_id = :event_id, " \
-    "price = :price, " \
-    "outcome = :outcome " \
-    "WHERE id = :id " \
-    "RETURNING *"
+# Only the supplied columns change; a None value keeps what is stored. The
+# locked CTE hands back the event the selection had before the update.
+update_query = "WITH previous AS (SELECT id, event_id FROM selection WHERE id = :id FOR UPDATE) " \
+    "UPDATE selection " \
+    "SET name = COALESCE(:name, name), " \
+    "active = COALESCE(:active, active), " \
+    "event_id = COALESCE(:event_id, selection.event_id), " \
+    "price = COALESCE(:price, price), " \
+    "outcome = COALESCE(:outcome, outcome) " \
+    "FROM previous " \
+    "WHERE selection.id = previous.id " \
+    "RETURNING selection.*, previous.event_id AS previous_event_id"
+
+update_prices_query = "UPDATE selection SET price = new_price.price " \
+    "FROM unnest(CAST(:ids AS integer[]), CAST(:prices AS numeric(10, 2)[])) AS new_price (id, price) " \
+    "WHERE selection.id = new_price.id AND selection.price IS DISTINCT FROM new_price.price " \
+    "RETURNING selection.*"
+
+# update_query for many selections, without the move: coalesced updates never
+# change the event
+bulk_update_query = "UPDATE selection " \
+    "SET name = COALESCE(new_selection.name, selection.name), " \
+    "active = COALESCE(new_selection.active, selection.active), " \
+    "price = COALESCE(new_selection.price, selection.price), " \
+    "outcome = COALESCE(CAST(new_selection.outcome AS selection_outcome), selection.outcome) " \
+    "FROM unnest(CAST(:ids AS integer[]), CAST(:names AS varchar[]), CAST(:actives AS boolean[]), " \
+    "CAST(:prices AS numeric(10, 2)[]), CAST(:outcomes AS text[])) " \
+    "AS new_selection (id, name, active, price, outcome) " \
+    "WHERE selection.id = new_selection.id " \
+    "RETURNING selection.*"
+
+table_version_query = "SELECT CAST(COALESCE(sum(writes), 0) AS bigint) FROM table_write_count " \
+    "WHERE table_name = 'selection'"
+
+# What the selection columns accept: the name_min_length and name_max_length
+# constraints, and numeric(10, 2), which holds 8 digits before the point
+NAME_MIN_LENGTH = 1
+NAME_MAX_LENGTH = 100
+MAX_PRICE = 10 ** 8
+
 
-check_active_selection_query = "SELECT EXISTS " \
-    "(SELECT 1 FROM selection WHERE event_id = :event_id AND active = true)"
+def selection_error(selection: SelectionCreateModel) -> Optional[str]:
+    """Return why the columns would refuse the selection, or None when they accept it."""
+    if not NAME_MIN_LENGTH <= len(selection.name) <= NAME_MAX_LENGTH:
+        return f"Name must be {NAME_MIN_LENGTH} to {NAME_MAX_LENGTH} characters long."
+    if "\x00" in selection.name:
+        return "Name must not contain NUL characters."
+    if not math.isfinite(selection.price) or abs(selection.price) >= MAX_PRICE:
+        return f"Price must be below {MAX_PRICE}."
+    return None
+
+order_by_columns = ("id", "price")
+
+
+def merge_selection_updates(earlier: SelectionUpdateModel, later: SelectionUpdateModel) -> SelectionUpdateModel:
+    """Apply later over earlier: the columns later leaves out keep the earlier value."""
+    return earlier.copy(update=later.dict(exclude_none=True))
+
+
+selection_update_coalescer = WriteCoalescer(
+    "selection",
+    window=appConfig.SELECTION_UPDATE_COALESCE_MS / 1000,
+    max_batch=appConfig.MAX_PRICE_UPDATE_BATCH_SIZE,
+    merge=merge_selection_updates,
+)
 
 class SelectionRepository(BaseRepository):
 
     async def create_selection(self, *, new_selection: SelectionCreateModel) -> SelectionPersistModel:
         query_values = new_selection.dict()
-        selection = await self.db.fetch_one(query=create_query, values=query_values)
-        if not dict(selection)["active"]:
-            active_selection = await self.db.fetch_one(query=check_active_selection_query,values={"event_id": dict(selection)["event_id"]})  
-            if not dict(active_selection)["exists"]:
+        deactivated = []
+        async with self.db.transaction():
+            selection = await self.db.fetch_one(query=create_query, values=query_values)
+            if not dict(selection)["active"]:
                 events_repository = EventRepository(self.db)
-                await events_repository.update_event_inactive(id=dict(selection)["event_id"])
+                deactivated = await events_repository.deactivate_events_without_active_selections(event_ids=[dict(selection)["event_id"]])
 
+        self.invalidate_cached("selection", deactivated=deactivated)
         return selection
 
-    async def get_all_selections(self, search_filters: dict) -> List[SelectionPersistModel]:
+    async def create_selections(
+        self, *, new_selections: List[SelectionCreateModel]
+    ) -> List[Union[SelectionPersistModel, str]]:
+        """Insert the selections with one statement, in input order.
+
+        Selections the columns would refuse or pointing to a missing event are
+        skipped, so that they can not abort the statement, and come back as
+        the reason. The deactivation cascade runs once, for every event that
+        got an inactive selection.
+        """
+        if not new_selections:
+            return []
+
+        errors = [selection_error(selection) for selection in new_selections]
+        deactivated = []
+        async with self.db.transaction():
+            existing_events = await self.db.fetch_all(
+                query=existing_events_query,
+                values={"event_ids": list({
+                    selection.event_id for selection, error in zip(new_selections, errors) if error is None
+                })},
+            )
+            existing_event_ids = {event["id"] for event in existing_events}
+            errors = [
+                error or (None if selection.event_id in existing_event_ids else "Event ID not found.")
+                for selection, error in zip(new_selections, errors)
+            ]
+            valid_selections = [selection for selection, error in zip(new_selections, errors) if error is None]
+
+            created = []
+            if valid_selections:
+                created = await self.db.fetch_all(query=bulk_create_query, values={
+                    "names": [selection.name for selection in valid_selections],
+                    "event_ids": [selection.event_id for selection in valid_selections],
+                    "prices": [selection.price for selection in valid_selections],
+                    "actives": [selection.active for selection in valid_selections],
+                    "outcomes": [selection.outcome.value for selection in valid_selections],
+                })
+                # Ids are drawn in insertion order, which follows the input order
+                created = sorted(created, key=lambda selection: selection["id"])
 
-        search_query = get_query
+            inactive_event_ids = [selection["event_id"] for selection in created if not selection["active"]]
+            if inactive_event_ids:
+                events_repository = EventRepository(self.db)
+                deactivated = await events_repository.deactivate_events_without_active_selections(event_ids=inactive_event_ids)
+
+        self.invalidate_cached("selection", deactivated=deactivated)
+        created_iter = iter(created)
+        return [error or next(created_iter) for error in errors]
+
+    def _search_conditions(self, search_filters: dict) -> Tuple[List[str], dict]:
         filter_conditions = []
-        
+        filter_values = {}
+
         for key, val in search_filters.items():
             if val:
                 if key == "name":
-                    filter_conditions.append(key + " ~* " + "'" + val + "'")
+                    filter_conditions.append("name ~* :name")
+                    filter_values["name"] = val
+        return filter_conditions, filter_values
 
-        if filter_conditions:
-            search_query += " where " + " and ".join(filter_conditions)
-        
-        search_result = await self.db.fetch_all(query=search_query)
+    async def get_all_selections(self, search_filters: dict, *, limit: Optional[int] = None,
+        after: Optional[str] = None, order_by: str = "id") -> List[SelectionPersistModel]:
+
+        if order_by not in order_by_columns:
+            raise ValueError(f"Selections can not be ordered by {order_by}.")
+
+        search_query, query_values = page_query(get_query, *self._search_conditions(search_filters),
+            order_by=order_by, after=after, limit=limit)
+        search_result = await self.fetch_search(search_query, query_values)
         return [selection for selection in search_result]
 
+    def iterate_selections(self, search_filters: dict, *, limit: Optional[int] = None,
+        after: Optional[str] = None, order_by: str = "id") -> AsyncIterator[SelectionPersistModel]:
+        """Return an async iterator over a server-side cursor, so rows are never all held in memory."""
+        if order_by not in order_by_columns:
+            raise ValueError(f"Selections can not be ordered by {order_by}.")
+
+        search_query, query_values = page_query(get_query, *self._search_conditions(search_filters),
+            order_by=order_by, after=after, limit=limit)
+        return self.iterate_search(search_query, query_values)
+
+    async def get_selections_version(self) -> Optional[int]:
+        """Return the count of write statements committed to the table, which moves with every commit."""
+        return await self.db.fetch_val(query=table_version_query)
+
+    async def estimate_selections_count(self, search_filters: dict) -> int:
+        search_query, query_values = page_query(get_query, *self._search_conditions(search_filters))
+        return await self.estimate_count(search_query, query_values)
 
     async def get_selection_by_id(self, *, id: int) -> SelectionPersistModel:
-        selection = await self.db.fetch_one(query=get_by_id_query, values={"id": id})
-        if not selection:
-            return None
-        return selection
+        return await self.fetch_cached_by_id("selection", id, get_by_id_query, SelectionPersistModel)
 
-    async def update_selection(self, *, id: int, selection_update: SelectionUpdateModel) -> SelectionPersistModel:
-        selection = await self.get_selection_by_id(id=id)
+    async def update_prices(self, *, price_updates: List[SelectionPriceUpdateModel]) -> List[SelectionPersistModel]:
+        """Apply a batch of price changes with one statement and return the rows that changed.
+
+        When an id shows up more than once, the last price in the batch wins.
+        """
+        prices = {price_update.id: price_update.price for price_update in price_updates}
+        if not prices:
+            return []
 
-        if not selection:
-            return None
+        updated = await self.db.fetch_all(
+            query=update_prices_query, values={"ids": list(prices.keys()), "prices": list(prices.values())}
+        )
+        self.invalidate_cached("selection", [selection["id"] for selection in updated])
+        return [selection for selection in updated]
 
-        update_dict = dict(selection).copy()
+    async def update_selections(
+        self, *, selection_updates: Dict[int, SelectionUpdateModel]
+    ) -> Dict[int, SelectionPersistModel]:
+        """Apply updates that neither deactivate nor move a selection with one statement.
 
-        for key, val in selection_update.dict().items():
-            if val is not None:
-                update_dict[key] = selection_update.dict()[key]
+        Returns the updated rows by id; ids that do not exist are left out.
+        """
+        if not selection_updates:
+            return {}
 
-        update_result = await self.db.fetch_one(query=update_query, values=update_dict)
-        
-        if not dict(update_result)["active"]:
+        updates = list(selection_updates.values())
+        updated = await self.db.fetch_all(query=bulk_update_query, values={
+            "ids": list(selection_updates.keys()),
+            "names": [update.name for update in updates],
+            "actives": [update.active for update in updates],
+            "prices": [update.price for update in updates],
+            "outcomes": [update.outcome.value if update.outcome else None for update in updates],
+        })
+        self.invalidate_cached("selection", [selection["id"] for selection in updated])
+        return {selection["id"]: selection for selection in updated}
 
-            active_selection = await self.db.fetch_one(query=check_active_selection_query,values={"event_id": dict(selection)["event_id"]})  
-            if not dict(active_selection)["exists"]:
+    async def update_selection(self, *, id: int, selection_update: SelectionUpdateModel) -> SelectionPersistModel:
+        # Only a deactivation or a move can leave an event without active
+        # selections; any other change is one statement with no transaction,
+        # which bursts of updates can share.
+        if selection_update.active is not False and selection_update.event_id is None:
+            if selection_update_coalescer.enabled:
+                return await selection_update_coalescer.submit(
+                    id, selection_update, lambda updates: self.update_selections(selection_updates=updates)
+                )
+            update_result = await self.db.fetch_one(query=update_query, values={**selection_update.dict(), "id": id})
+            self.invalidate_cached("selection", [id])
+            return update_result
+
+        # Updates of the selection still buffered go first
+        await selection_update_coalescer.wait_for(id)
+        deactivated = []
+        async with self.db.transaction():
+            update_result = await self.db.fetch_one(query=update_query, values={**selection_update.dict(), "id": id})
 
+            if not update_result:
+                return None
+
+            # The previous event may have lost its last active selection, either
+            # because this one went inactive or because it moved away
+            event_ids = []
+            if not dict(update_result)["active"]:
+                event_ids = [dict(update_result)["previous_event_id"], dict(update_result)["event_id"]]
+            elif dict(update_result)["event_id"] != dict(update_result)["previous_event_id"]:
+                event_ids = [dict(update_result)["previous_event_id"]]
+            if event_ids:
                 events_repository = EventRepository(self.db)
-                await events_repository.update_event_inactive(id=dict(selection)["event_id"])
-        
-        return update_result 
\ No newline at end of file
+                deactivated = await events_repository.deactivate_events_without_active_selections(event_ids=event_ids)
+
+        self.invalidate_cached("selection", [id], deactivated)
+        return update_result 
@@ -1,6 +1,9 @@
-from typing import List
+from typing import AsyncIterator, List, Mapping, Optional, Tuple
 
+from app.config.app_config import appConfig
+from app.db.pagination import page_query
 from app.db.repository.base import BaseRepository
+from app.db.repository.tree import TreeTooLargeError, tree_query
 from app.schemas.sport import SportCreateModel, SportPersistModel, SportUpdateModel
 
 create_query = "INSERT INTO sport (name, slug, active) " \
@@ -11,11 +14,28 @@ get_by_id_query = "SELECT * FROM sport WHERE ID = :id"
 
 get_query = "SELECT * FROM sport"
 
+# Only the supplied columns change; a None value keeps what is stored.
 update_query = "UPDATE sport " \
-    "SET name = :name, slug = :slug, active = :active " \
+    "SET name = COALESCE(:name, name), slug = COALESCE(:slug, slug), active = COALESCE(:active, active) " \
     "WHERE id = :id "\
     "RETURNING *"
 
+deactivate_sports_query = "UPDATE sport SET active = false " \
+    "WHERE id = ANY(:sport_ids) AND active = true AND active_event_count = 0 " \
+    "RETURNING 'sport' AS entity, id"
+
+table_version_query = "SELECT CAST(COALESCE(sum(writes), 0) AS bigint) FROM table_write_count " \
+    "WHERE table_name = 'sport'"
+
+# The sport tree holds one keyset page of the sport's events
+tree_events_query = "SELECT id FROM event"
+
+# Stops counting past the cap, which is all the size check needs to know
+tree_selections_query = "SELECT count(*) FROM (SELECT 1 FROM selection " \
+    "WHERE event_id = ANY(:event_ids) AND (active OR NOT :active_only) LIMIT :cap) capped"
+
+order_by_columns = ("id",)
+
 class SportRepository(BaseRepository):
 
     async def create_sport(self, *, new_sport: SportCreateModel) -> SportPersistModel:
@@ -25,45 +45,92 @@ class SportRepository(BaseRepository):
 
 
     async def get_sport_by_id(self, *, id: int) -> SportPersistModel:
-        sport = await self.db.fetch_one(query=get_by_id_query, values={"id": id})
-        if not sport:
-            return None
-        return sport
-
-    async def get_all_sports(self, search_filters: dict) -> List[SportPersistModel]:
-        
-        search_query = get_query
+        return await self.fetch_cached_by_id("sport", id, get_by_id_query, SportPersistModel)
+
+    async def get_sport_tree(self, *, id: int, depth: int = 1, active_only: bool = False,
+        limit: int = appConfig.DEFAULT_PAGE_SIZE, after: Optional[str] = None) -> Tuple[Optional[bytes], List[int]]:
+        """Return the sport with a page of its events, and at depth 2 their selections, as JSON.
+
+        Also returns the ids of the events in the page, in order. A page whose
+        events hold more than MAX_TREE_SELECTIONS selections raises
+        TreeTooLargeError instead of being built.
+        """
+        event_ids: List[int] = []
+        if depth > 0:
+            filter_conditions = ["sport_id = :sport_id"] + (["active = true"] if active_only else [])
+            events_query, query_values = page_query(tree_events_query, filter_conditions, {"sport_id": id},
+                after=after, limit=limit)
+            event_ids = [event["id"] for event in await self.db.fetch_all(query=events_query, values=query_values)]
+        if depth > 1 and event_ids:
+            cap = appConfig.MAX_TREE_SELECTIONS
+            selections = await self.db.fetch_val(query=tree_selections_query, values={
+                "event_ids": event_ids, "active_only": active_only, "cap": cap + 1,
+            })
+            if selections > cap:
+                raise TreeTooLargeError(f"The events of the page hold more than {cap} selections.")
+
+        query_values = {"id": id, "child_ids": event_ids} if depth > 0 else {"id": id}
+        tree = await self.db.fetch_val(query=tree_query("sport", depth, active_only, paged=True), values=query_values)
+        return None if tree is None else tree.encode(), event_ids
+
+    def _search_conditions(self, search_filters: dict) -> Tuple[List[str], dict]:
         filter_conditions = []
+        filter_values = {}
         for key, val in search_filters.items():
             if val is not None:
                 if key == "name":
-                    filter_conditions.append(key + " ~* " + "'" + val + "'")
+                    filter_conditions.append("name ~* :name")
+                    filter_values["name"] = val
                 elif key == "active_events_count":
-                    filter_conditions.append("id IN (SELECT sport_id FROM event WHERE active = true GROUP BY sport_id HAVING count(*) >= " + str(val) + ")")
-        
-        if filter_conditions:
-            search_query += " where " + " and ".join(filter_conditions)
-        print(search_query)
-        search_result = await self.db.fetch_all(query=search_query)
+                    # A sport only matches with at least one active event
+                    filter_conditions.append("active_event_count >= :active_events_count")
+                    filter_values["active_events_count"] = max(val, 1)
+        return filter_conditions, filter_values
+
+    async def get_all_sports(self, search_filters: dict, *, limit: Optional[int] = None,
+        after: Optional[str] = None, order_by: str = "id") -> List[SportPersistModel]:
+
+        if order_by not in order_by_columns:
+            raise ValueError(f"Sports can not be ordered by {order_by}.")
+
+        search_query, query_values = page_query(get_query, *self._search_conditions(search_filters),
+            order_by=order_by, after=after, limit=limit)
+        search_result = await self.fetch_search(search_query, query_values)
         return [sport for sport in search_result]
 
+    def iterate_sports(self, search_filters: dict, *, limit: Optional[int] = None,
+        after: Optional[str] = None, order_by: str = "id") -> AsyncIterator[SportPersistModel]:
+        """Return an async iterator over a server-side cursor, so rows are never all held in memory."""
+        if order_by not in order_by_columns:
+            raise ValueError(f"Sports can not be ordered by {order_by}.")
 
-    async def update_sport(self, *, id: int, sport_update: SportUpdateModel) -> SportPersistModel:
-        sport = await self.get_sport_by_id(id=id)
+        search_query, query_values = page_query(get_query, *self._search_conditions(search_filters),
+            order_by=order_by, after=after, limit=limit)
+        return self.iterate_search(search_query, query_values)
 
-        if not sport:
-            return None
+    async def get_sports_version(self) -> Optional[int]:
+        """Return the count of write statements committed to the table, which moves with every commit."""
+        return await self.db.fetch_val(query=table_version_query)
 
-        update_dict = dict(sport).copy()
+    async def estimate_sports_count(self, search_filters: dict) -> int:
+        search_query, query_values = page_query(get_query, *self._search_conditions(search_filters))
+        return await self.estimate_count(search_query, query_values)
 
-        for key, val in sport_update.dict().items():
-            if val is not None:
-                update_dict[key] = sport_update.dict()[key]
 
-        update_result = await self.db.fetch_one(query=update_query, values=update_dict)
+    async def update_sport(self, *, id: int, sport_update: SportUpdateModel) -> SportPersistModel:
+        update_result = await self.db.fetch_one(query=update_query, values={**sport_update.dict(), "id": id})
+        self.invalidate_cached("sport", [id])
+        if not update_result:
+            return None
         return update_result
 
-    async def update_sport_inactive(self, id: int) -> None:
-        sport_inactive = SportUpdateModel()
-        sport_inactive.active = False
-        await self.update_sport(id=id, sport_update=sport_inactive)
\ No newline at end of file
+    async def deactivate_sports_without_active_events(self, *, sport_ids: List[int]) -> List[Mapping]:
+        """Deactivate the active sports that have no active event left, in one statement.
+
+        Returns an (entity, id) row for every sport that was deactivated; the
+        caller invalidates them in the record cache once its transaction commits.
+        """
+        sport_ids = [sport_id for sport_id in set(sport_ids) if sport_id is not None]
+        if not sport_ids:
+            return []
+        return await self.db.fetch_all(query=deactivate_sports_query, values={"sport_ids": sport_ids})
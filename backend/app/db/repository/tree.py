@@ -0,0 +1,57 @@
+# Each object has its persisted model's fields in their order, so a node of
+# the tree carries what the get by id route returns for its row.
+sport_fields = "'name', sport.name, 'active', sport.active, 'slug', sport.slug, 'id', sport.id"
+
+event_fields = "'name', event.name, 'active', event.active, 'slug', event.slug, 'type', event.type, " \
+    "'sport_id', event.sport_id, 'status', event.status, 'scheduled_start', event.scheduled_start, " \
+    "'actual_start', event.actual_start, 'id', event.id"
+
+selection_fields = "'name', selection.name, 'active', selection.active, 'event_id', selection.event_id, " \
+    "'price', selection.price::float8, 'outcome', selection.outcome, 'id', selection.id"
+
+# (table, JSON fields, column referencing the level above, key of the list in the level above)
+tree_levels = (
+    ("sport", sport_fields, None, None),
+    ("event", event_fields, "sport_id", "events"),
+    ("selection", selection_fields, "event_id", "selections"),
+)
+
+# One correlated subquery per level, served by the index on the parent id column
+children_query = "(SELECT COALESCE(json_agg({node} ORDER BY {table}.id), '[]') FROM {table} " \
+    "WHERE {table}.{parent_id} = {parent}.id{condition})"
+
+root_query = "SELECT {node}::text FROM {table} WHERE {table}.id = :id"
+
+
+class TreeTooLargeError(ValueError):
+    pass
+
+
+def tree_node(level: int, depth: int, active_only: bool, paged: bool = False) -> str:
+    """Return the json_build_object expression of one row of the level, with depth levels below it."""
+    table, fields, _, _ = tree_levels[level]
+    if depth > 0 and level + 1 < len(tree_levels):
+        child_table, _, parent_id, key = tree_levels[level + 1]
+        condition = f" AND {child_table}.active = true" if active_only else ""
+        if paged:
+            condition += f" AND {child_table}.id = ANY(:child_ids)"
+        children = children_query.format(
+            node=tree_node(level + 1, depth - 1, active_only),
+            table=child_table,
+            parent_id=parent_id,
+            parent=table,
+            condition=condition,
+        )
+        fields += f", '{key}', {children}"
+    return f"json_build_object({fields})"
+
+
+def tree_query(root: str, depth: int, active_only: bool, paged: bool = False) -> str:
+    """Return the statement building the JSON tree of the root row with the given id.
+
+    depth counts the levels of children included; active_only drops the
+    inactive children, never the root itself. paged keeps only the children
+    of the root whose ids are bound to :child_ids.
+    """
+    level = next(index for index, (table, *_) in enumerate(tree_levels) if table == root)
+    return root_query.format(node=tree_node(level, depth, active_only, paged), table=root)
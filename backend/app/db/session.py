@@ -1,21 +1,61 @@
 import os
 import logging
 
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Union
+
+import asyncpg
 from databases import Database
 from fastapi import FastAPI
 from app.config.app_config import appConfig
+from app.db.asyncpg_database import AsyncpgDatabase
+from app.db.changes import ChangeHub
+from app.db.replica import ReplicaMonitor
 
 logger = logging.getLogger(__name__)
 
-async def connect_to_db(app: FastAPI) -> None:
-    DATABASE_URI: str = f"postgresql://{appConfig.POSTGRES_USER}:{appConfig.POSTGRES_PASSWORD}@{appConfig.POSTGRES_SERVER}:{appConfig.POSTGRES_PORT}/{appConfig.POSTGRES_DB}"
-    DATABASE_URI = f"{DATABASE_URI}_test" if os.environ.get("TESTING") else DATABASE_URI
+def get_database_uri(server: str = None, port: str = None, db: str = None) -> str:
+    server = server or appConfig.POSTGRES_SERVER
+    port = port or appConfig.POSTGRES_PORT
+    db = db or appConfig.POSTGRES_DB
+    DATABASE_URI: str = f"postgresql://{appConfig.POSTGRES_USER}:{appConfig.POSTGRES_PASSWORD}@{server}:{port}/{db}"
+    return f"{DATABASE_URI}_test" if os.environ.get("TESTING") else DATABASE_URI
 
-    database = Database(
-        DATABASE_URI,
+
+def get_replica_database_uri() -> str:
+    return get_database_uri(
+        appConfig.POSTGRES_REPLICA_SERVER, appConfig.POSTGRES_REPLICA_PORT, appConfig.POSTGRES_REPLICA_DB
+    )
+
+
+def create_database(uri: str = None) -> Union[Database, AsyncpgDatabase]:
+    # Both backends hand these options to asyncpg.create_pool
+    pool_options = dict(
         min_size=appConfig.DB_MIN_CONNECTION_POOL,
         max_size=appConfig.DB_MAX_CONNECTION_POOL,
+        statement_cache_size=appConfig.DB_STATEMENT_CACHE_SIZE,
+        max_queries=appConfig.DB_CONNECTION_MAX_QUERIES,
+        max_inactive_connection_lifetime=appConfig.DB_CONNECTION_MAX_IDLE_SECONDS,
     )
+    uri = uri or get_database_uri()
+    if appConfig.DB_BACKEND == "asyncpg":
+        return AsyncpgDatabase(uri, **pool_options)
+    return Database(uri, **pool_options)
+
+
+@asynccontextmanager
+async def raw_connection(database: Union[Database, AsyncpgDatabase]) -> AsyncIterator[asyncpg.Connection]:
+    """Hold a pooled connection of either backend and yield its asyncpg connection, e.g. for COPY."""
+    async with database.connection() as connection:
+        # databases wraps the asyncpg connection; AsyncpgDatabase hands it out as is
+        yield getattr(connection, "raw_connection", connection)
+
+
+async def connect_to_db(app: FastAPI) -> None:
+    database = create_database()
+    app.state._replica_db = None
+    app.state._replica_monitor = None
+    app.state._change_hub = None
 
     try:
         logger.warning("==== CONNECTING TO DB! ====")
@@ -26,8 +66,65 @@ async def connect_to_db(app: FastAPI) -> None:
         logger.warning("==== CONNECTION ERROR ====")
         logger.warning(ex)
 
+    if appConfig.POSTGRES_REPLICA_SERVER:
+        await connect_to_replica(app)
+
+    if appConfig.CHANGE_STREAM_ENABLED:
+        await start_change_hub(app)
+
+
+async def connect_to_replica(app: FastAPI) -> None:
+    # Reads fall back to the primary whenever the replica is unusable, so a
+    # replica that is down at startup is only logged.
+    replica = create_database(get_replica_database_uri())
+    # Rows read from a lagging replica must not end up in the record cache
+    replica.is_replica = True
+    try:
+        logger.warning("==== CONNECTING TO REPLICA DB! ====")
+        await replica.connect()
+        monitor = ReplicaMonitor(
+            replica,
+            max_lag=appConfig.REPLICA_MAX_LAG_SECONDS,
+            interval=appConfig.REPLICA_CHECK_INTERVAL_SECONDS,
+        )
+        await monitor.start()
+        app.state._replica_db = replica
+        app.state._replica_monitor = monitor
+        logger.warning("==== CONNECTED TO REPLICA DB! ====")
+    except Exception as ex:
+        logger.warning("==== REPLICA CONNECTION ERROR ====")
+        logger.warning(ex)
+
+
+async def start_change_hub(app: FastAPI) -> None:
+    # Change notifications are only sent by the primary, and a LISTEN holds
+    # its connection for good, so the hub opens its own instead of taking
+    # one from the pool.
+    hub = ChangeHub(
+        get_database_uri(),
+        max_pending=appConfig.CHANGE_STREAM_MAX_PENDING,
+        retry_interval=appConfig.CHANGE_STREAM_RETRY_SECONDS,
+    )
+    try:
+        await hub.start()
+        app.state._change_hub = hub
+    except Exception as ex:
+        logger.warning("==== CHANGE LISTENER CONNECTION ERROR ====")
+        logger.warning(ex)
+
 
 async def close_db_connection(app: FastAPI) -> None:
+    if getattr(app.state, "_change_hub", None) is not None:
+        await app.state._change_hub.stop()
+
+    if getattr(app.state, "_replica_monitor", None) is not None:
+        try:
+            await app.state._replica_monitor.stop()
+            await app.state._replica_db.disconnect()
+        except Exception as ex:
+            logger.warning("==== REPLICA DB DISCONNECT ERROR ====")
+            logger.warning(ex)
+
     try:
         logger.warning("==== DISCONNECTING FROM DB! ====")
         await app.state._db.disconnect()
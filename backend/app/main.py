@@ -2,6 +2,10 @@ from fastapi import FastAPI
 from app.config.app_config import appConfig
 from app.db.session import close_db_connection, connect_to_db
 from app.api_routes.api import api_router
+from app.api_routes.profiling import ProfilingMiddleware
+from app.api_routes.read_your_writes import PrimaryLSNMiddleware
+from app.api_routes.routes import metrics
+from app.api_routes.timing import RequestTimingMiddleware
 
 def application():
     app = FastAPI()
@@ -14,7 +18,13 @@ def application():
     async def shutdown():
         await close_db_connection(app)
 
+    app.add_middleware(PrimaryLSNMiddleware)
+    if appConfig.PROFILING_TOKEN:
+        app.add_middleware(ProfilingMiddleware)
+    if appConfig.METRICS_ENABLED:
+        app.add_middleware(RequestTimingMiddleware)
     app.include_router(api_router, prefix=appConfig.API_STR)
+    app.include_router(metrics.router)
     return app
 
 app = application()
\ No newline at end of file
@@ -0,0 +1,139 @@
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    """Prometheus histogram kept as per-bucket counts, made cumulative on render.
+
+    Observing is a bisect and two additions, so it stays cheap enough to
+    run on every request and every repository call.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...], buckets: Tuple[float, ...]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labelvalues: str) -> int:
+        series = self._series.get(labelvalues)
+        return 0 if series is None else int(sum(series[:-1]))
+
+    def clear(self) -> None:
+        self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, observed in zip(self.buckets + (float("inf"),), series):
+                cumulative += observed
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                labels = _labels(self.labelnames, labelvalues, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render_gauge(name: str, documentation: str, labelname: str, samples: Mapping[str, float]) -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    for labelvalue, value in samples.items():
+        lines.append(f"{name}{_labels((labelname,), (labelvalue,))} {_number(value)}")
+    return lines
+
+
+request_latency = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve a request, by route template.",
+    ("method", "route", "status"),
+    LATENCY_BUCKETS,
+)
+
+query_latency = Histogram(
+    "repository_call_duration_seconds",
+    "Time spent in a repository method, by Class.method.",
+    ("method",),
+    LATENCY_BUCKETS,
+)
+
+cascade_steps = Histogram(
+    "write_cascade_steps",
+    "Parent rows the deactivation cascade changed, per write.",
+    ("entity",),
+    (0, 1, 2, 5, 10, 50, 100, 1000),
+)
+
+coalesced_writes = Histogram(
+    "coalesced_write_batch_size",
+    "Updates a coalesced write applied with one statement, per batch.",
+    ("entity",),
+    (1, 2, 5, 10, 50, 100, 1000),
+)
+
+HISTOGRAMS = (request_latency, query_latency, cascade_steps, coalesced_writes)
+
+
+def pool_stats(db: Any) -> Optional[Dict[str, int]]:
+    """Return the size, in use and waiting counts of the asyncpg pool behind either backend."""
+    pool = getattr(db, "_pool", None) or getattr(getattr(db, "_backend", None), "_pool", None)
+    if pool is None:
+        return None
+    size = pool.get_size()
+    # asyncpg has no public waiter count; acquire() waits on this queue
+    getters = getattr(getattr(pool, "_queue", None), "_getters", ())
+    return {
+        "size": size,
+        "max_size": pool.get_max_size(),
+        "in_use": size - pool.get_idle_size(),
+        "waiting": sum(1 for getter in getters if not getter.done()),
+    }
+
+
+def render(pools: Mapping[str, Any]) -> str:
+    """Render every metric in the Prometheus text format, reading the pools now."""
+    lines: List[str] = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+
+    stats = {name: pool_stats(db) for name, db in pools.items() if db is not None}
+    for key, documentation in (
+        ("size", "Open connections in the pool."),
+        ("max_size", "Maximum connections in the pool."),
+        ("in_use", "Connections checked out of the pool."),
+        ("waiting", "Callers waiting for a pool connection."),
+    ):
+        lines.extend(render_gauge(
+            f"db_pool_{key}",
+            documentation,
+            "pool",
+            {name: values[key] for name, values in stats.items() if values is not None},
+        ))
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,11 @@
-from pydantic import BaseModel
+from typing import Optional
+
+from pydantic import BaseModel, PrivateAttr
 
 class CommonBaseModel(BaseModel):
     name: str
-    active: bool
\ No newline at end of file
+    active: bool
+
+class VersionedModel(BaseModel):
+    """A stored row; its version feeds the ETag and stays out of the response body."""
+    _version: Optional[int] = PrivateAttr(default=None)
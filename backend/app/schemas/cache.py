@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+
+class CacheStatsModel(BaseModel):
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
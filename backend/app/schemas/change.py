@@ -0,0 +1,26 @@
+from enum import Enum
+from typing import List, Union
+
+from pydantic import BaseModel
+
+from app.schemas.event import EventPersistModel
+from app.schemas.selection import SelectionPersistModel
+from app.schemas.sport import SportPersistModel
+
+
+class ChangeEntityModel(str, Enum):
+    sport = "sport"
+    event = "event"
+    selection = "selection"
+
+
+class ChangeModel(BaseModel):
+    entity: ChangeEntityModel
+    row: Union[SelectionPersistModel, EventPersistModel, SportPersistModel]
+
+
+class ChangeFeedModel(BaseModel):
+    changes: List[ChangeModel]
+    # Pass it back as since to get the changes after these
+    cursor: str
+    has_more: bool
@@ -1,7 +1,8 @@
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
-from app.schemas.base import CommonBaseModel
+from app.schemas.base import CommonBaseModel, VersionedModel
+from app.schemas.selection import SelectionPersistModel
 
 class EventTypeModel(str, Enum):
     preplay = "preplay"
@@ -15,6 +16,11 @@ class EventStatusModel(str, Enum):
     cancelled = "Cancelled"
 
 
+class EventOrderByModel(str, Enum):
+    id = "id"
+    scheduled_start = "scheduled_start"
+
+
 class EventBaseModel(CommonBaseModel):
     slug: str
     type: EventTypeModel
@@ -39,5 +45,9 @@ class EventUpdateModel(EventBaseModel):
     actual_start: Optional[datetime]
 
 
-class EventPersistModel(EventBaseModel):
-    id: int
\ No newline at end of file
+class EventPersistModel(EventBaseModel, VersionedModel):
+    id: int
+
+
+class EventTreeModel(EventPersistModel):
+    selections: Optional[List[SelectionPersistModel]]
@@ -1,7 +1,7 @@
 from enum import Enum
 from typing import Optional
-from pydantic import validator
-from app.schemas.base import CommonBaseModel
+from pydantic import BaseModel, validator
+from app.schemas.base import CommonBaseModel, VersionedModel
 
 class SelectionOutcomeModel(str, Enum):
     unsettled = "Unsettled"
@@ -9,6 +9,10 @@ class SelectionOutcomeModel(str, Enum):
     lose = "Lose"
     win = "Win"
 
+class SelectionOrderByModel(str, Enum):
+    id = "id"
+    price = "price"
+
 class SelectionBaseModel(CommonBaseModel):
     event_id: int
     price: float
@@ -29,5 +33,17 @@ class SelectionUpdateModel(SelectionBaseModel):
     price: Optional[float]
     outcome: Optional[SelectionOutcomeModel]
 
-class SelectionPersistModel(SelectionBaseModel):
-    id: int
\ No newline at end of file
+class SelectionPersistModel(SelectionBaseModel, VersionedModel):
+    id: int
+
+class SelectionPriceUpdateModel(BaseModel):
+    id: int
+    price: float
+
+    @validator('price')
+    def truncate_float(cls, value: float) -> float: #pylint: disable=no-self-argument
+        return float(round(value,2))
+
+class SelectionBulkResultModel(BaseModel):
+    selection: Optional[SelectionPersistModel]
+    error: Optional[str]
\ No newline at end of file
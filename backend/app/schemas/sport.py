@@ -1,5 +1,11 @@
-from typing import Optional
-from app.schemas.base import CommonBaseModel
+from enum import Enum
+from typing import List, Optional
+from app.schemas.base import CommonBaseModel, VersionedModel
+from app.schemas.event import EventTreeModel
+
+
+class SportOrderByModel(str, Enum):
+    id = "id"
 
 
 class SportBaseModel(CommonBaseModel):
@@ -13,5 +19,9 @@ class SportUpdateModel(SportBaseModel):
     slug: Optional[str]
     active: Optional[bool]
     
-class SportPersistModel(SportBaseModel):
-    id: int
\ No newline at end of file
+class SportPersistModel(SportBaseModel, VersionedModel):
+    id: int
+
+
+class SportTreeModel(SportPersistModel):
+    events: Optional[List[EventTreeModel]]
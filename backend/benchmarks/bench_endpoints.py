@@ -0,0 +1,275 @@
+"""Measure the latency and throughput of every route against a seeded dataset.
+
+Run from the backend folder:
+
+    python -m benchmarks.bench_endpoints --sports 100 --events 100000 --selections 2000000 --output before.json
+    python -m benchmarks.bench_endpoints --sports 100 --events 100000 --selections 2000000 --compare before.json
+
+The tables of the test database are emptied, then filled at the given scale
+by benchmarks.generate_data.
+Each scenario sends --requests requests from --concurrency clients through
+httpx's ASGI transport, the way the test suite does, after a short warm up.
+Writes only ever create active rows, so the dataset keeps its shape.
+
+--output saves the results as JSON. --compare reads such a file and exits
+with status 1 when an endpoint's p95 latency grew by more than --tolerance.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from httpx import AsyncClient
+
+from app.db.session import raw_connection
+from benchmarks.common import Timer, benchmark_client
+from benchmarks.generate_data import TEAM_NAMES, Dataset, load
+
+# method, url and httpx keyword arguments of one request
+Request = Tuple[str, str, Dict[str, Any]]
+RequestFactory = Callable[[int], Request]
+
+
+def build_scenarios(app: FastAPI, dataset: Dataset, rng: random.Random) -> Dict[str, Tuple[str, RequestFactory]]:
+    """Return label -> (route name, function building the i-th request)."""
+    url = app.url_path_for
+
+    def sport() -> int:
+        return rng.choice(dataset.sport_ids)
+
+    def event() -> int:
+        return rng.choice(dataset.event_ids)
+
+    def selection() -> int:
+        return rng.choice(dataset.selection_ids)
+
+    def price() -> float:
+        return round(rng.uniform(1.01, 50), 2)
+
+    def new_event(i: int) -> dict:
+        return {
+            "name": f"bench new event {i}", "slug": f"new-event-{i}", "active": True, "type": "preplay",
+            "sport_id": sport(), "status": "Pending", "scheduled_start": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def new_selection(i: int) -> dict:
+        return {"name": f"bench new selection {i}", "active": True, "event_id": event(), "price": price(),
+                "outcome": "Unsettled"}
+
+    run = rng.randrange(1 << 30)
+    return {
+        "Get Sport by id": ("Get Sport by id", lambda i: ("GET", url("Get Sport by id", id=sport()), {})),
+        "Get all Sports": ("Get all Sports", lambda i: ("GET", url("Get all Sports"), {})),
+        "Get Sport tree (events)": (
+            "Get Sport tree", lambda i: ("GET", url("Get Sport tree", id=sport()), {"params": {"depth": 1}})
+        ),
+        "Get all Sports (name search)": (
+            "Get all Sports", lambda i: ("GET", url("Get all Sports"), {"params": {"name": f"sport {i % 100}$"}})
+        ),
+        "Create Sport": ("Create Sport", lambda i: ("POST", url("Create Sport"), {
+            "json": {"name": f"bench new sport {run} {i}", "slug": f"new-sport-{i}", "active": True}
+        })),
+        "Update Sport": ("Update Sport", lambda i: ("PUT", url("Update Sport", id=sport()), {
+            "json": {"slug": f"sport-{i}"}
+        })),
+        "Get Event by id": ("Get Event by id", lambda i: ("GET", url("Get Event by id", id=event()), {})),
+        "Get Event tree": ("Get Event tree", lambda i: ("GET", url("Get Event tree", id=event()), {})),
+        "Get all Events": ("Get all Events", lambda i: ("GET", url("Get all Events"), {})),
+        "Get all Events (name search)": (
+            "Get all Events", lambda i: ("GET", url("Get all Events"), {"params": {"name": TEAM_NAMES[i % len(TEAM_NAMES)]}})
+        ),
+        "Get all Events (in-play, 1h)": ("Get all Events", lambda i: ("GET", url("Get all Events"), {
+            "params": {"sport_id": sport(), "type": "inplay", "scheduled_start_from": datetime.now(timezone.utc).isoformat(),
+                       "scheduled_start_to": (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()}
+        })),
+        "Get all Events (stream 1000)": (
+            "Get all Events", lambda i: ("GET", url("Get all Events"), {"params": {"stream": True, "limit": 1000}})
+        ),
+        "Create Event": ("Create Event", lambda i: ("POST", url("Create Event"), {"json": new_event(i)})),
+        "Update Event": ("Update Event", lambda i: ("PUT", url("Update Event", id=event()), {
+            "json": {"slug": f"event-{i}"}
+        })),
+        "Get Selection by id": (
+            "Get Selection by id", lambda i: ("GET", url("Get Selection by id", id=selection()), {})
+        ),
+        "Get all Selections": ("Get all Selections", lambda i: ("GET", url("Get all Selections"), {})),
+        "Get all Selections (by price)": (
+            "Get all Selections", lambda i: ("GET", url("Get all Selections"), {"params": {"order_by": "price"}})
+        ),
+        "Create Selection": ("Create Selection", lambda i: ("POST", url("Create Selection"), {
+            "json": new_selection(i)
+        })),
+        "Create Selections in bulk (10)": ("Create Selections in bulk", lambda i: (
+            "POST", url("Create Selections in bulk"), {"json": [new_selection(i) for _ in range(10)]}
+        )),
+        "Update Selection prices (100)": ("Update Selection prices", lambda i: (
+            "PATCH", url("Update Selection prices"), {"json": [{"id": selection(), "price": price()} for _ in range(100)]}
+        )),
+        "Update Selection": ("Update Selection", lambda i: ("PUT", url("Update Selection", id=selection()), {
+            "json": {"price": price()}
+        })),
+        "Get changes": ("Get changes", lambda i: ("GET", url("Get changes"), {"params": {"limit": 100}})),
+        "Get cache stats": ("Get cache stats", lambda i: ("GET", url("Get cache stats"), {})),
+        "Get metrics": ("Get metrics", lambda i: ("GET", url("Get metrics"), {})),
+    }
+
+
+# Routes whose response never ends, so they have no latency to measure
+unmeasured_routes = ("Stream changes",)
+
+
+def uncovered_routes(app: FastAPI, scenarios: Dict[str, Tuple[str, RequestFactory]]) -> List[str]:
+    covered = {name for name, _ in scenarios.values()}.union(unmeasured_routes)
+    return [route.name for route in app.routes if isinstance(route, APIRoute) and route.name not in covered]
+
+
+# The databases package ties a connection to the context of the first task
+# that queries, and tasks inherit their parent's context: requests sent from
+# the benchmark's own task would all queue on one connection. A server starts
+# each request in a fresh task instead, which is what this does.
+empty_context = contextvars.Context()
+
+
+async def send_request(client: AsyncClient, request: Request) -> Any:
+    method, url, kwargs = request
+    return await empty_context.run(asyncio.ensure_future, client.request(method, url, **kwargs))
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest rank percentile of an ascending list."""
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+async def measure(client: AsyncClient, factory: RequestFactory, requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    indices = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in indices:
+            request = factory(i)
+            start = time.perf_counter()
+            response = await send_request(client, request)
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code >= 400
+
+    for i in range(min(10, requests)):
+        await send_request(client, factory(-1 - i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "throughput_rps": requests / elapsed,
+    }
+
+
+async def run_suite(
+    app: FastAPI, client: AsyncClient, dataset: Dataset, requests: int, concurrency: int, seed: int,
+    only: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Run every scenario, or those whose label contains one of only, and return their statistics by label."""
+    scenarios = build_scenarios(app, dataset, random.Random(seed))
+    missing = uncovered_routes(app, scenarios)
+    if missing:
+        raise RuntimeError(f"No benchmark scenario for the routes {missing}")
+    return {
+        label: await measure(client, factory, requests, concurrency)
+        for label, (_, factory) in scenarios.items()
+        if not only or any(part in label for part in only)
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    """Print the p95 change of every endpoint and return the labels that regressed."""
+    regressions = []
+    print(f"\n{'endpoint':<34} {'base p95':>9} {'p95':>9} {'change':>8}")
+    for label, result in results.items():
+        if label not in baseline:
+            continue
+        before, after = baseline[label]["p95_ms"], result["p95_ms"]
+        change = after / before - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(label)
+            flag = "  REGRESSION"
+        print(f"{label:<34} {before:>9.2f} {after:>9.2f} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with benchmark_client() as (app, client):
+        db = app.state._db
+        with Timer() as timer:
+            async with raw_connection(db) as connection:
+                dataset = await load(connection, args.sports, args.events, args.selections, args.seed)
+        print(f"loaded {args.sports} sports, {args.events} events, {args.selections} selections "
+              f"in {timer.elapsed:.1f}s")
+
+        results = await run_suite(app, client, dataset, args.requests, args.concurrency, args.seed, args.only)
+
+    print(f"\n{'endpoint':<34} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'errors':>7}")
+    for label, result in results.items():
+        print(f"{label:<34} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['throughput_rps']:>8.0f} {result['errors']:>7}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({
+                "commit": git_commit(),
+                "date": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "dataset": {"sports": args.sports, "events": args.events, "selections": args.selections},
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "seed": args.seed,
+                "results": results,
+            }, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline)["results"], args.tolerance)
+        if regressions:
+            sys.exit(f"p95 regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sports", type=int, default=100)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--selections", type=int, default=2000000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", help="only run the scenarios whose label contains one of these")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    asyncio.run(main(parser.parse_args()))
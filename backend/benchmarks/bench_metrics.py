@@ -0,0 +1,102 @@
+"""Measure what the metrics and query timing instrumentation adds to each request.
+
+Run from the backend folder:
+
+    python -m benchmarks.bench_metrics --requests 2000
+
+The timing middleware, the repository method wrapper and the per-query
+database wrapper are timed around no-op callables, then charged to a one
+row list page, one of the cheapest requests the API serves. The script
+fails when the cost exceeds --budget of that request's median latency.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from app.api_routes.timing import RequestTimingMiddleware
+from app.db import query_log
+from app.db.query_log import InstrumentedDatabase
+from app.db.repository.base import timed
+from app.metrics import query_latency, request_latency
+from benchmarks.common import Timer, benchmark_client, seed_event
+
+SCOPE = {"type": "http", "method": "GET", "path": "/"}
+
+
+async def noop_app(scope, receive, send) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+
+
+async def noop_send(message) -> None:
+    pass
+
+
+async def noop_call() -> None:
+    pass
+
+
+class NoopDatabase:
+    async def fetch_val(self, query, values=None, column=0) -> None:
+        pass
+
+
+async def per_call(function, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await function()
+    return (time.perf_counter() - start) / iterations
+
+
+async def main(requests: int, budget: float) -> None:
+    iterations = 100000
+    middleware = RequestTimingMiddleware(noop_app)
+    wrapped = timed("bench.noop", noop_call)
+    middleware_cost = (
+        await per_call(lambda: middleware(dict(SCOPE), None, noop_send), iterations)
+        - await per_call(lambda: noop_app(SCOPE, None, noop_send), iterations)
+    )
+    wrapper_cost = await per_call(wrapped, iterations) - await per_call(noop_call, iterations)
+    noop_db = NoopDatabase()
+    instrumented_db = InstrumentedDatabase(noop_db, None)
+    query_cost = (
+        await per_call(lambda: instrumented_db.fetch_val(query="SELECT 1"), iterations)
+        - await per_call(lambda: noop_db.fetch_val(query="SELECT 1"), iterations)
+    )
+
+    async with benchmark_client() as (app, client):
+        await seed_event(app, client)
+        url = app.url_path_for("Get all Events")
+        await client.get(url, params={"limit": 1})
+
+        calls = sum(query_latency.count(name) for (name,) in list(query_latency._series))
+        queries = []
+        query_log.query_hooks.append(lambda *query: queries.append(query))
+        timings = []
+        for _ in range(requests):
+            with Timer() as timer:
+                response = await client.get(url, params={"limit": 1})
+                response.raise_for_status()
+            timings.append(timer.elapsed)
+        calls = (sum(query_latency.count(name) for (name,) in list(query_latency._series)) - calls) / requests
+        queries = len(queries) / requests
+        assert request_latency.count("GET", "/api/events/", "200") >= requests
+
+    median = statistics.median(timings)
+    overhead = middleware_cost + calls * wrapper_cost + queries * query_cost
+    print(f"middleware        {middleware_cost * 1e6:8.2f} us")
+    print(f"repository call   {wrapper_cost * 1e6:8.2f} us x {calls:.1f} per request")
+    print(f"query             {query_cost * 1e6:8.2f} us x {queries:.1f} per request")
+    print(f"request median    {median * 1e6:8.2f} us")
+    print(f"overhead          {overhead / median:8.2%} (budget {budget:.0%})")
+    if overhead > budget * median:
+        sys.exit("metrics overhead is over budget")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--budget", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.budget))
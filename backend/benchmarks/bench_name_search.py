@@ -0,0 +1,47 @@
+"""Measure the latency of the selection name search against the table size.
+
+Run from the backend folder:
+
+    python -m benchmarks.bench_name_search --table-sizes 1000 10000 100000
+"""
+import argparse
+import asyncio
+import statistics
+from typing import List
+
+from benchmarks.common import Timer, benchmark_client, seed_event, seed_selections
+
+# Patterns the trigram index can serve: literal runs of at least three
+# characters, anchored or not, mixed with regular expression syntax.
+search_patterns = ("selection 4217", "^bench selection 99", "selection 1.*7$")
+
+
+async def main(table_sizes: List[int], repeat: int) -> None:
+    async with benchmark_client() as (app, client):
+        event_id = await seed_event(app, client)
+        url = app.url_path_for("Get all Selections")
+        seeded = 0
+
+        print(f"{'rows':>8} {'pattern':>22} {'median ms':>10} {'max ms':>10}")
+        for table_size in sorted(table_sizes):
+            # Top the table up to the next size, continuing the numbering
+            await seed_selections(app, client, event_id, table_size - seeded, start=seeded)
+            seeded = table_size
+            await app.state._db.execute("ANALYZE selection")
+
+            for pattern in search_patterns:
+                timings = []
+                for _ in range(repeat):
+                    with Timer() as timer:
+                        response = await client.get(url, params={"name": pattern})
+                        response.raise_for_status()
+                    timings.append(timer.elapsed * 1000)
+                print(f"{table_size:>8} {pattern:>22} {statistics.median(timings):>10.2f} {max(timings):>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--table-sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.table_sizes, args.repeat))
@@ -0,0 +1,49 @@
+"""Compare PATCH /selections/prices against one PUT /selections/{id}/ per change.
+
+Run from the backend folder:
+
+    python -m benchmarks.bench_price_updates --batch-sizes 1 100 10000
+"""
+import argparse
+import asyncio
+import random
+from typing import List
+
+from benchmarks.common import Timer, benchmark_client, seed_event, seed_selections
+
+
+async def main(batch_sizes: List[int]) -> None:
+    async with benchmark_client() as (app, client):
+        event_id = await seed_event(app, client)
+        selection_ids = await seed_selections(app, client, event_id, max(batch_sizes))
+
+        print(f"{'batch':>8} {'path':>6} {'seconds':>10} {'updates/s':>12}")
+        for batch_size in batch_sizes:
+            batch = [
+                {"id": selection_id, "price": round(random.uniform(1.01, 50), 2)}
+                for selection_id in selection_ids[:batch_size]
+            ]
+
+            with Timer() as put_timer:
+                for price_update in batch:
+                    response = await client.put(
+                        app.url_path_for("Update Selection", id=price_update["id"]),
+                        json={"price": price_update["price"]},
+                    )
+                    response.raise_for_status()
+
+            for price_update in batch:
+                price_update["price"] = round(price_update["price"] + 0.5, 2)
+            with Timer() as patch_timer:
+                response = await client.patch(app.url_path_for("Update Selection prices"), json=batch)
+                response.raise_for_status()
+
+            for path, timer in (("PUT", put_timer), ("PATCH", patch_timer)):
+                print(f"{batch_size:>8} {path:>6} {timer.elapsed:>10.4f} {batch_size / timer.elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 10000])
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_sizes))
@@ -0,0 +1,49 @@
+"""Compare list responses built through response_model against the fast JSON path.
+
+Run from the backend folder:
+
+    python -m benchmarks.bench_serialization --page-sizes 100 1000 --stream-size 20000
+
+The stream request returns every selection, at least --stream-size of them.
+"""
+import argparse
+import asyncio
+import statistics
+from typing import List
+
+from app.config.app_config import appConfig
+from benchmarks.common import Timer, benchmark_client, seed_event, seed_selections
+
+
+async def main(page_sizes: List[int], stream_size: int, repeat: int) -> None:
+    async with benchmark_client() as (app, client):
+        event_id = await seed_event(app, client)
+        await seed_selections(app, client, event_id, max(max(page_sizes), stream_size))
+        url = app.url_path_for("Get all Selections")
+
+        requests = [(f"page {size}", {"limit": size}) for size in page_sizes]
+        requests.append(("stream all", {"stream": True}))
+
+        print(f"{'request':>14} {'path':>14} {'median ms':>10} {'rows/s':>10}")
+        for label, params in requests:
+            for fast in (False, True):
+                appConfig.FAST_JSON_RESPONSES = fast
+                timings = []
+                for _ in range(repeat):
+                    with Timer() as timer:
+                        response = await client.get(url, params=params)
+                        response.raise_for_status()
+                    timings.append(timer.elapsed)
+                median = statistics.median(timings)
+                path = "fast" if fast else "response_model"
+                rows = len(response.json())
+                print(f"{label:>14} {path:>14} {median * 1000:>10.2f} {rows / median:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--stream-size", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.page_sizes, args.stream_size, args.repeat))
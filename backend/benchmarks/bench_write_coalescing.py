@@ -0,0 +1,108 @@
+"""Replay a burst of PUT /selections/{id}/ price updates with and without write coalescing.
+
+Run from the backend folder:
+
+    python -m benchmarks.bench_write_coalescing --windows-ms 0 2 5 10
+
+One trace of --requests price updates is drawn up front: arrivals at --rate
+requests per second over --selections hot selections, picked with a Zipf
+skew, the way a few in-play markets take most of the traffic. The trace is
+replayed once per coalescing window, 0 being the uncoalesced path. Each run
+reports the UPDATE statements the requests cost, the write reduction factor
+(requests per statement), the response latency, and whether every selection
+ended at the last price the trace sent it. The uncoalesced path runs the
+updates of one selection as concurrent statements that commit in any order.
+Past the rate the process can serve, requests also overtake each other
+before they reach the coalescer, which then keeps the last to arrive.
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Callable, Dict, List, Tuple
+
+from httpx import AsyncClient
+
+from app.db.repository.selections import selection_update_coalescer
+from benchmarks.bench_endpoints import empty_context, percentile
+from benchmarks.common import benchmark_client, seed_event, seed_selections
+
+# seconds after the start of the burst, selection id, price
+Arrival = Tuple[float, int, float]
+
+
+def burst_trace(selection_ids: List[int], requests: int, rate: float, skew: float, seed: int) -> List[Arrival]:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(selection_ids))]
+    trace = []
+    offset = 0.0
+    for selection_id in rng.choices(selection_ids, weights, k=requests):
+        offset += rng.expovariate(rate)
+        trace.append((offset, selection_id, round(rng.uniform(1.01, 50), 2)))
+    return trace
+
+
+async def replay(client: AsyncClient, url_for: Callable[[int], str], trace: List[Arrival]) -> List[float]:
+    """Send every update at its offset and return the latencies in seconds."""
+    latencies: List[float] = []
+
+    async def put(selection_id: int, price: float) -> None:
+        start = time.perf_counter()
+        response = await client.put(url_for(selection_id), json={"price": price})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    sent = []
+    for offset, selection_id, price in trace:
+        delay = started + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # Each request in a fresh context, as a server would start it
+        sent.append(empty_context.run(asyncio.ensure_future, put(selection_id, price)))
+    await asyncio.gather(*sent)
+    return sorted(latencies)
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with benchmark_client() as (app, client):
+        event_id = await seed_event(app, client)
+        selection_ids = await seed_selections(app, client, event_id, args.selections)
+        trace = burst_trace(selection_ids, args.requests, args.rate, args.skew, args.seed)
+        last_prices: Dict[int, float] = {selection_id: price for _, selection_id, price in trace}
+
+        def url_for(selection_id: int) -> str:
+            return app.url_path_for("Update Selection", id=selection_id)
+
+        print(f"{len(trace)} updates of {len(last_prices)} selections over {trace[-1][0]:.2f}s")
+        print(f"{'window ms':>10} {'statements':>11} {'rows':>6} {'reduction':>10} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'last price':>11}")
+        for window_ms in args.windows_ms:
+            selection_update_coalescer.window = window_ms / 1000
+            before = selection_update_coalescer.stats()
+            latencies = await replay(client, url_for, trace)
+            after = selection_update_coalescer.stats()
+
+            if window_ms > 0:
+                statements = after["batches"] - before["batches"]
+                rows = after["applied"] - before["applied"]
+            else:
+                statements = rows = len(trace)
+            stored = await app.state._db.fetch_all(
+                query="SELECT id, price FROM selection WHERE id = ANY(:ids)", values={"ids": list(last_prices)}
+            )
+            last_writer_won = all(float(row["price"]) == last_prices[row["id"]] for row in stored)
+            print(f"{window_ms:>10g} {statements:>11} {rows:>6} {len(trace) / statements:>10.1f} "
+                  f"{percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.95) * 1000:>8.2f} "
+                  f"{percentile(latencies, 0.99) * 1000:>8.2f} {'ok' if last_writer_won else 'LOST':>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--windows-ms", type=float, nargs="+", default=[0, 1, 2, 5, 10])
+    parser.add_argument("--requests", type=int, default=1500)
+    parser.add_argument("--rate", type=float, default=300, help="requests per second")
+    parser.add_argument("--selections", type=int, default=50)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of the selection popularity")
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,91 @@
+"""Helpers shared by the benchmark scripts.
+
+Benchmarks run the application in-process, the same way the test suite does,
+against a freshly migrated ``<POSTGRES_DB>_test`` database, emptied on start so
+that every run seeds the same rows.
+"""
+import os
+import time
+import warnings
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Tuple
+
+import alembic
+from alembic.config import Config
+from asgi_lifespan import LifespanManager
+from fastapi import FastAPI
+from httpx import AsyncClient, Response
+
+
+@asynccontextmanager
+async def benchmark_client() -> AsyncIterator[Tuple[FastAPI, AsyncClient]]:
+    """Migrate and empty the test DB, start the application and yield it with a client."""
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    os.environ["TESTING"] = "1"
+    alembic.command.upgrade(Config("alembic.ini"), "head")
+
+    from app.main import application
+    app = application()
+    async with LifespanManager(app):
+        await app.state._db.execute(query="TRUNCATE sport, event, selection RESTART IDENTITY")
+        async with AsyncClient(
+            app=app,
+            base_url="http://testserver",
+            headers={"Content-Type": "application/json"},
+        ) as client:
+            yield app, client
+
+
+class Timer:
+    """Context manager measuring wall clock time in seconds."""
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.elapsed = time.perf_counter() - self.start
+
+
+def created(response: Response) -> dict:
+    """Return the created row, failing the benchmark with the API's answer if the seed was refused."""
+    if response.status_code != 200:
+        raise RuntimeError(f"Seeding {response.request.url.path} failed with {response.status_code}: {response.text}")
+    return response.json()
+
+
+async def seed_event(app: FastAPI, client: AsyncClient) -> int:
+    """Create an active sport with one active event and return the event id."""
+    response = await client.post(
+        app.url_path_for("Create Sport"), json={"name": "bench sport", "slug": "bench-sport", "active": True}
+    )
+    sport_id = created(response)["id"]
+    response = await client.post(app.url_path_for("Create Event"), json={
+        "name": "bench event",
+        "slug": "bench-event",
+        "active": True,
+        "type": "inplay",
+        "sport_id": sport_id,
+        "status": "Started",
+        "scheduled_start": datetime.now(timezone.utc).isoformat(),
+    })
+    return created(response)["id"]
+
+
+async def seed_selections(app: FastAPI, client: AsyncClient, event_id: int, count: int, start: int = 0) -> List[int]:
+    """Create ``count`` active selections named "bench selection <n>", from n = start."""
+    selection_ids: List[int] = []
+    while len(selection_ids) < count:
+        first = start + len(selection_ids)
+        chunk = min(1000, count - len(selection_ids))
+        response = await client.post(app.url_path_for("Create Selections in bulk"), json=[
+            {"name": f"bench selection {i}", "active": True, "event_id": event_id, "price": 2.0, "outcome": "Unsettled"}
+            for i in range(first, first + chunk)
+        ])
+        results = created(response)
+        errors = [result["error"] for result in results if result["error"]]
+        if errors:
+            raise RuntimeError(f"Seeding selections failed: {errors[0]}")
+        selection_ids.extend(result["selection"]["id"] for result in results)
+    return selection_ids
@@ -0,0 +1,225 @@
+"""Fill the sport, event and selection tables with production-like rows.
+
+Run from the backend folder:
+
+    python -m benchmarks.generate_data --sports 100 --events 100000 --selections 2000000 --seed 1
+
+Rows are loaded with COPY, inside one transaction that locks the tables
+and only builds their secondary indexes and checks their foreign keys
+after the copy, the way pg_restore does. The copied rows are not announced
+on the change stream.
+The same seed gives the same rows, with times relative to the load:
+- events are spread over the sports by a Zipf distribution, so a few
+  sports hold most events;
+- selections are spread over the events by a Pareto distribution, so most
+  events have a handful and a few outright markets have hundreds;
+- events are Pending, Started, Ended or Cancelled, and their selections are
+  active and unsettled only while the event has not ended;
+- prices are decimal odds with a long tail.
+
+Active flags follow the cascade: an event without active selections and a
+sport without active events are inactive. The active child counters are
+left to the insert triggers.
+"""
+import argparse
+import asyncio
+import random
+import re
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List, NamedTuple, Sequence, Tuple
+
+import asyncpg
+
+from app.db.session import get_database_uri
+
+SPORT_NAMES = (
+    "Football", "Tennis", "Horse Racing", "Basketball", "Cricket", "Golf", "Ice Hockey", "Baseball",
+    "American Football", "Rugby Union", "Darts", "Snooker", "Boxing", "MMA", "Cycling", "Volleyball",
+)
+TEAM_NAMES = (
+    "Lions", "Tigers", "Eagles", "Wolves", "Sharks", "Bears", "Hawks", "Rovers", "United", "City",
+    "Rangers", "Athletic", "Wanderers", "Dynamo", "Olympic", "Royals", "Giants", "Falcons", "Comets", "Pirates",
+)
+# (status, share of events)
+EVENT_STATUSES = (("Pending", 0.55), ("Started", 0.10), ("Ended", 0.30), ("Cancelled", 0.05))
+
+SPORT_COLUMNS = ("id", "name", "slug", "active")
+EVENT_COLUMNS = ("id", "name", "slug", "active", "type", "sport_id", "status", "scheduled_start", "actual_start")
+SELECTION_COLUMNS = ("id", "name", "event_id", "price", "active", "outcome")
+
+max_id_query = "SELECT COALESCE(max(id), 0) FROM {table}"
+# Foreign keys and the indexes that back no constraint, which are cheaper
+# to check and build once after the copy than row by row during it
+foreign_keys_query = """
+    SELECT conname AS name, pg_get_constraintdef(oid) AS definition
+    FROM pg_constraint
+    WHERE conrelid = $1::regclass AND contype = 'f'
+"""
+plain_indexes_query = """
+    SELECT i.indexname AS name, i.indexdef AS definition
+    FROM pg_indexes i
+    WHERE i.schemaname = current_schema() AND i.tablename = $1
+      AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname)
+"""
+# A bulk load is not a change anyone subscribed to, and would queue one
+# notification per few dozen rows
+notify_triggers_query = """
+    SELECT tgname AS name FROM pg_trigger
+    WHERE tgrelid = $1::regclass AND NOT tgisinternal AND tgname LIKE '%\\_notify'
+"""
+set_sequence_query = "SELECT setval(pg_get_serial_sequence('{table}', 'id'), $1)"
+
+
+class Dataset(NamedTuple):
+    sport_ids: range
+    event_ids: range
+    selection_ids: range
+
+
+def slugify(name: str, id: int) -> str:
+    return f"{re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')}-{id}"
+
+
+def selection_names(count: int) -> List[str]:
+    if count == 2:
+        return ["Home", "Away"]
+    if count == 3:
+        return ["Home", "Draw", "Away"]
+    return [f"Runner {n}" for n in range(1, count + 1)]
+
+
+def odds(rng: random.Random) -> Decimal:
+    # Decimal, as asyncpg encodes it for a numeric column faster than a float
+    return Decimal(f"{min(1000.0, 1.01 + rng.lognormvariate(0.4, 0.9)):.2f}")
+
+
+def spread(rng: random.Random, total: int, weights: Sequence[float]) -> List[int]:
+    """Split total into len(weights) counts drawn in proportion to the weights."""
+    counts = [0] * len(weights)
+    for index in rng.choices(range(len(weights)), weights=weights, k=total):
+        counts[index] += 1
+    return counts
+
+
+def generate(
+    sports: int, events: int, selections: int, seed: int, first_ids: Sequence[int], now: datetime
+) -> Tuple[List[tuple], List[tuple], List[tuple]]:
+    """Return the sport, event and selection rows, ids starting at first_ids."""
+    rng = random.Random(seed)
+    first_sport, first_event, first_selection = first_ids
+
+    events_per_sport = spread(rng, events, [1 / rank for rank in range(1, sports + 1)])
+    selections_per_event = spread(rng, selections, [rng.paretovariate(1.2) for _ in range(events)])
+    statuses, status_weights = zip(*EVENT_STATUSES)
+
+    sport_rows, event_rows, selection_rows = [], [], []
+    event_id, selection_id = first_event, first_selection
+    for sport_index, event_count in enumerate(events_per_sport):
+        sport_id = first_sport + sport_index
+        sport_name = SPORT_NAMES[sport_id - 1] if sport_id <= len(SPORT_NAMES) else f"Sport {sport_id}"
+        sport_active = False
+        for _ in range(event_count):
+            status = rng.choices(statuses, status_weights)[0]
+            if status == "Pending":
+                start, actual_start = now + timedelta(minutes=rng.randint(60, 30 * 24 * 60)), None
+            elif status == "Started":
+                start = now - timedelta(minutes=rng.randint(0, 120))
+                actual_start = start + timedelta(seconds=rng.randint(0, 300))
+            elif status == "Ended":
+                start = now - timedelta(minutes=rng.randint(180, 60 * 24 * 60))
+                actual_start = start + timedelta(seconds=rng.randint(0, 300))
+            else:
+                start, actual_start = now + timedelta(minutes=rng.randint(-60 * 24 * 60, 30 * 24 * 60)), None
+            event_type = "inplay" if status == "Started" or (status == "Ended" and rng.random() < 0.5) else "preplay"
+
+            count = selections_per_event[event_id - first_event]
+            winner = rng.randrange(count) if count else -1
+            event_active = False
+            for index, name in enumerate(selection_names(count)):
+                if status == "Ended":
+                    active, outcome = False, "Win" if index == winner else "Lose"
+                elif status == "Cancelled":
+                    active, outcome = False, "Void"
+                else:
+                    active, outcome = rng.random() < 0.97, "Unsettled"
+                event_active = event_active or active
+                selection_rows.append((selection_id, name, event_id, odds(rng), active, outcome))
+                selection_id += 1
+
+            home, away = rng.sample(TEAM_NAMES, 2)
+            name = f"{home} v {away}"
+            event_rows.append((
+                event_id, name, slugify(name, event_id), event_active, event_type, sport_id, status, start, actual_start,
+            ))
+            sport_active = sport_active or event_active
+            event_id += 1
+        sport_rows.append((sport_id, sport_name, slugify(sport_name, sport_id), sport_active))
+    return sport_rows, event_rows, selection_rows
+
+
+async def load(connection: asyncpg.Connection, sports: int, events: int, selections: int, seed: int) -> Dataset:
+    """Generate the rows after the ones already stored and COPY them in one transaction."""
+    async with connection.transaction():
+        await connection.execute("LOCK TABLE sport, event, selection IN EXCLUSIVE MODE")
+        first_ids = []
+        for table in ("sport", "event", "selection"):
+            first_ids.append(await connection.fetchval(max_id_query.format(table=table)) + 1)
+        sport_rows, event_rows, selection_rows = generate(
+            sports, events, selections, seed, first_ids, datetime.now(timezone.utc)
+        )
+        for table, columns, rows in (
+            ("sport", SPORT_COLUMNS, sport_rows),
+            ("event", EVENT_COLUMNS, event_rows),
+            ("selection", SELECTION_COLUMNS, selection_rows),
+        ):
+            if not rows:
+                continue
+            foreign_keys = await connection.fetch(foreign_keys_query, table)
+            indexes = await connection.fetch(plain_indexes_query, table)
+            notify_triggers = await connection.fetch(notify_triggers_query, table)
+            for foreign_key in foreign_keys:
+                await connection.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{foreign_key["name"]}"')
+            for trigger in notify_triggers:
+                await connection.execute(f'ALTER TABLE {table} DISABLE TRIGGER "{trigger["name"]}"')
+            for index in indexes:
+                await connection.execute(f'DROP INDEX "{index["name"]}"')
+            await connection.copy_records_to_table(table, records=rows, columns=columns)
+            for trigger in notify_triggers:
+                await connection.execute(f'ALTER TABLE {table} ENABLE TRIGGER "{trigger["name"]}"')
+            for index in indexes:
+                await connection.execute(index["definition"])
+            for foreign_key in foreign_keys:
+                await connection.execute(
+                    f'ALTER TABLE {table} ADD CONSTRAINT "{foreign_key["name"]}" {foreign_key["definition"]}'
+                )
+            await connection.fetchval(set_sequence_query.format(table=table), rows[-1][0])
+    for table in ("sport", "event", "selection"):
+        await connection.execute(f"ANALYZE {table}")
+    return Dataset(*(
+        range(first, first + count) for first, count in zip(first_ids, (sports, events, selections))
+    ))
+
+
+async def main(args: argparse.Namespace) -> None:
+    connection = await asyncpg.connect(get_database_uri())
+    try:
+        if args.truncate:
+            await connection.execute("TRUNCATE sport, event, selection RESTART IDENTITY")
+        start = asyncio.get_running_loop().time()
+        await load(connection, args.sports, args.events, args.selections, args.seed)
+        elapsed = asyncio.get_running_loop().time() - start
+    finally:
+        await connection.close()
+    rows = args.sports + args.events + args.selections
+    print(f"loaded {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sports", type=int, default=100)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--selections", type=int, default=2000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--truncate", action="store_true", help="empty the three tables first")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,279 @@
+"""Snapshot the plan of every repository statement and flag plan regressions.
+
+Run from the backend folder:
+
+    python -m benchmarks.query_plans --update
+    python -m benchmarks.query_plans
+
+The tables of the test database are emptied and filled by
+benchmarks.generate_data, at the given scale with --update and at the
+snapshot's scale otherwise. Each statement then runs under
+EXPLAIN (ANALYZE, BUFFERS) in a transaction that is rolled back, so the
+writes leave the dataset as it was.
+
+A snapshot keeps each plan as its tree of node types, relations and indexes,
+plus the shared buffers it touched. --update writes the snapshot file;
+without it the plans are checked against that file, and the script exits
+with status 1 when a statement:
+- reads a table with a sequential scan it did not use before,
+- has a node whose row estimate is off by more than --estimate-factor
+  where it was not before,
+- touches more than --buffer-tolerance more shared buffers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+
+from app.db.pagination import page_query
+from app.db.repository import changes, events, selections, sports
+from app.db.session import raw_connection
+from app.db.repository.tree import tree_query
+from benchmarks.common import Timer, benchmark_client
+from benchmarks.generate_data import Dataset, load
+
+SNAPSHOT_FILE = os.path.join(os.path.dirname(__file__), "query_plans.json")
+
+# Keys of a plan node that describe its shape rather than its cost
+SHAPE_KEYS = ("Relation Name", "Index Name", "Join Type", "Strategy", "Scan Direction", "Operation")
+
+
+def repository_statements(dataset: Dataset) -> Dict[str, Tuple[str, dict]]:
+    """Return every statement the repositories run, by name, with values from the dataset."""
+    # The first sports hold a large share of the events, enough for a
+    # sequential scan to be the right plan; a sport from the middle is typical.
+    sport_id = dataset.sport_ids[len(dataset.sport_ids) // 2]
+    event_id, selection_id = dataset.event_ids[0], dataset.selection_ids[0]
+    event_ids, selection_ids = list(dataset.event_ids[:3]), list(dataset.selection_ids[:3])
+    now = datetime.now(timezone.utc)
+    new_event = {
+        "name": "plan event", "slug": "plan-event", "active": True, "type": "preplay", "sport_id": sport_id,
+        "status": "Pending", "scheduled_start": datetime(2030, 1, 1, tzinfo=timezone.utc), "actual_start": None,
+    }
+    return {
+        "sports create": (sports.create_query, {"name": "plan sport", "slug": "plan-sport", "active": True}),
+        "sports get_by_id": (sports.get_by_id_query, {"id": sport_id}),
+        "sports page": page_query(sports.get_query, [], limit=20),
+        "sports page by name": page_query(sports.get_query, ["name ~* :name"], {"name": "foot"}, limit=20),
+        "sports page with active events": page_query(
+            sports.get_query, ["active_event_count >= :active_events_count"], {"active_events_count": 1}, limit=20,
+        ),
+        "sports update": (sports.update_query, {"id": sport_id, "name": None, "slug": "sport", "active": None}),
+        "sports deactivate": (sports.deactivate_sports_query, {"sport_ids": [sport_id]}),
+        "sports version": (sports.table_version_query, {}),
+        "sports tree events page": page_query(sports.tree_events_query, ["sport_id = :sport_id"], {"sport_id": sport_id},
+            limit=100),
+        "sports tree selections": (sports.tree_selections_query, {
+            "event_ids": event_ids, "active_only": False, "cap": 10001,
+        }),
+        "sports tree": (tree_query("sport", 2, False, paged=True), {"id": sport_id, "child_ids": event_ids}),
+        "sports tree of active events": (
+            tree_query("sport", 1, True, paged=True), {"id": sport_id, "child_ids": event_ids}
+        ),
+        "events create": (events.create_query, new_event),
+        "events get_by_id": (events.get_by_id_query, {"id": event_id}),
+        "events page": page_query(events.get_query, [], limit=20),
+        "events page by scheduled_start": page_query(events.get_query, [], order_by="scheduled_start", limit=20),
+        "events page by name": page_query(events.get_query, ["name ~* :name"], {"name": "lions v tigers"}, limit=20),
+        "events page with active selections": page_query(
+            events.get_query, ["active_selection_count >= :active_selections_count"],
+            {"active_selections_count": 1}, limit=20,
+        ),
+        "events page of in-play events of a sport starting within an hour": page_query(
+            events.get_query,
+            ["sport_id = :sport_id", "type = :type", "scheduled_start >= :scheduled_start_from",
+             "scheduled_start < :scheduled_start_to"],
+            {"sport_id": sport_id, "type": "inplay", "scheduled_start_from": now,
+             "scheduled_start_to": now + timedelta(hours=1)},
+            limit=20,
+        ),
+        "events page by status and start window": page_query(
+            events.get_query, ["status = :status", "scheduled_start >= :scheduled_start_from"],
+            {"status": "Started", "scheduled_start_from": now - timedelta(hours=1)}, order_by="scheduled_start", limit=20,
+        ),
+        "events update": (events.update_query, {
+            "id": event_id, "name": None, "slug": "event", "active": None, "type": None, "sport_id": None,
+            "status": None, "scheduled_start": None, "actual_start": None,
+        }),
+        "events update actual_start": (events.update_actual_start_query, {"id": event_id, "actual_start": None}),
+        "events deactivate": (events.deactivate_events_query, {"event_ids": event_ids}),
+        "events version": (events.table_version_query, {}),
+        "events tree": (tree_query("event", 1, False), {"id": event_id}),
+        "selections create": (selections.create_query, {
+            "name": "plan selection", "event_id": event_id, "price": 2.5, "active": True, "outcome": "Unsettled",
+        }),
+        "selections bulk create": (selections.bulk_create_query, {
+            "names": ["plan selection 1", "plan selection 2"], "event_ids": event_ids[:2], "prices": [2.5, 3.5],
+            "actives": [True, True], "outcomes": ["Unsettled", "Unsettled"],
+        }),
+        "selections existing events": (selections.existing_events_query, {"event_ids": event_ids}),
+        "selections get_by_id": (selections.get_by_id_query, {"id": selection_id}),
+        "selections page": page_query(selections.get_query, [], limit=20),
+        "selections page by price": page_query(selections.get_query, [], order_by="price", limit=20),
+        "selections page by name": page_query(selections.get_query, ["name ~* :name"], {"name": "runner 17$"}, limit=20),
+        "selections update": (selections.update_query, {
+            "id": selection_id, "name": None, "active": None, "event_id": None, "price": 2.5, "outcome": None,
+        }),
+        "selections update prices": (selections.update_prices_query, {"ids": selection_ids, "prices": [2.0, 3.0, 4.0]}),
+        "selections bulk update": (selections.bulk_update_query, {
+            "ids": selection_ids, "names": [None] * 3, "actives": [None] * 3, "prices": [2.0, 3.0, 4.0],
+            "outcomes": [None] * 3,
+        }),
+        "selections version": (selections.table_version_query, {}),
+        "changes page": (changes.changes_query, {"xid": 0, "version": 0, "limit": 100}),
+        # The lookups behind ON DELETE SET NULL when a parent is deleted
+        "events of a sport": ("SELECT id FROM event WHERE sport_id = :id", {"id": sport_id}),
+        "selections of an event": ("SELECT id FROM selection WHERE event_id = :id", {"id": event_id}),
+    }
+
+
+def uncovered_statements(dataset: Dataset) -> List[str]:
+    """Return the module level *_query strings of the repositories that no statement starts with."""
+    covered = [query for query, _ in repository_statements(dataset).values()]
+    return [
+        f"{module.__name__}.{name}"
+        for module in (sports, events, selections, changes)
+        for name, query in vars(module).items()
+        if name.endswith("_query") and isinstance(query, str)
+        and not any(statement == query or statement.startswith(query + " ") for statement in covered)
+    ]
+
+
+def plan_nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def normalize_plan(plan: Dict[str, Any], depth: int = 0) -> List[str]:
+    """Return the plan as indented lines of node type and shape, without costs, timings or row counts."""
+    details = " ".join(f"{key}={plan[key]}" for key in SHAPE_KEYS if key in plan)
+    lines = [f"{'  ' * depth}{plan['Node Type']}" + (f" {details}" if details else "")]
+    for child in plan.get("Plans", ()):
+        lines.extend(normalize_plan(child, depth + 1))
+    return lines
+
+
+def sequential_scans(plan: Dict[str, Any]) -> List[str]:
+    return sorted({node["Relation Name"] for node in plan_nodes(plan) if node["Node Type"] == "Seq Scan"})
+
+
+def misestimated_nodes(plan: Dict[str, Any], factor: float) -> List[str]:
+    """Return the nodes whose estimated and actual rows per loop differ by more than factor.
+
+    Nodes below a Limit are skipped: they are stopped early on purpose, so
+    their actual rows say nothing about the estimate.
+    """
+    if plan["Node Type"] == "Limit":
+        return []
+    nodes = []
+    if plan.get("Actual Loops"):
+        estimated, actual = plan["Plan Rows"], plan["Actual Rows"]
+        if max(estimated, actual) > factor * max(min(estimated, actual), 1):
+            nodes.append(f"{plan['Node Type']} {plan.get('Relation Name', '')}".strip())
+    for child in plan.get("Plans", ()):
+        nodes.extend(misestimated_nodes(child, factor))
+    return nodes
+
+
+def snapshot(explained: Dict[str, Any], factor: float) -> Dict[str, Any]:
+    """Reduce EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) output to what is compared between runs."""
+    plan = explained["Plan"]
+    return {
+        "plan": normalize_plan(plan),
+        "seq_scans": sequential_scans(plan),
+        "misestimated": misestimated_nodes(plan, factor),
+        "buffers": plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+    }
+
+
+def regressions(current: Dict[str, Any], baseline: Dict[str, Any], buffer_tolerance: float) -> List[str]:
+    """Return why the statement's current snapshot is worse than its baseline, if it is."""
+    found = []
+    new_scans = sorted(set(current["seq_scans"]) - set(baseline["seq_scans"]))
+    if new_scans:
+        found.append(f"new sequential scan of {', '.join(new_scans)}")
+    new_misestimates = sorted(set(current["misestimated"]) - set(baseline["misestimated"]))
+    if new_misestimates:
+        found.append(f"row estimate off in {', '.join(new_misestimates)}")
+    if current["buffers"] > baseline["buffers"] * (1 + buffer_tolerance) + 1:
+        found.append(f"buffers {baseline['buffers']} -> {current['buffers']}")
+    return found
+
+
+async def explain(db: Any, query: str, values: dict) -> Dict[str, Any]:
+    async with db.connection() as connection:
+        async with connection.transaction(force_rollback=True):
+            result = await connection.fetch_val(query="EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, values=values)
+    return json.loads(result)[0]
+
+
+async def main(args: argparse.Namespace) -> None:
+    baseline = {}
+    if not args.update:
+        with open(args.snapshot_file) as baseline_file:
+            stored = json.load(baseline_file)
+        # Plans are only comparable on the dataset they were taken on
+        for key, value in stored["dataset"].items():
+            setattr(args, key, value)
+        baseline = stored["statements"]
+
+    async with benchmark_client() as (app, client):
+        db = app.state._db
+        with Timer() as timer:
+            async with raw_connection(db) as connection:
+                dataset = await load(connection, args.sports, args.events, args.selections, args.seed)
+        print(f"loaded {args.sports} sports, {args.events} events, {args.selections} selections "
+              f"in {timer.elapsed:.1f}s")
+
+        missing = uncovered_statements(dataset)
+        if missing:
+            raise RuntimeError(f"No plan snapshot statement for {missing}")
+
+        snapshots = {}
+        for name, (query, values) in repository_statements(dataset).items():
+            # The first run warms the cache, so buffer counts are all hits
+            await explain(db, query, values)
+            snapshots[name] = snapshot(await explain(db, query, values), args.estimate_factor)
+
+    if args.update:
+        with open(args.snapshot_file, "w") as output:
+            json.dump({
+                "dataset": {"sports": args.sports, "events": args.events, "selections": args.selections,
+                            "seed": args.seed},
+                "statements": snapshots,
+            }, output, indent=2)
+            output.write("\n")
+        print(f"wrote {len(snapshots)} plan snapshots to {args.snapshot_file}")
+        return
+
+    failed = []
+    for name, current in snapshots.items():
+        if name not in baseline:
+            print(f"{name}: no snapshot")
+            continue
+        found = regressions(current, baseline[name], args.buffer_tolerance)
+        changed = " (plan changed)" if current["plan"] != baseline[name]["plan"] else ""
+        print(f"{name}: {'; '.join(found) or 'ok'}{changed}")
+        if changed:
+            print("\n".join("    " + line for line in current["plan"]))
+        if found:
+            failed.append(name)
+    if failed:
+        sys.exit(f"plan regressions in: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sports", type=int, default=100)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--selections", type=int, default=2000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--snapshot-file", default=SNAPSHOT_FILE)
+    parser.add_argument("--update", action="store_true", help="write the snapshots instead of checking them")
+    parser.add_argument("--estimate-factor", type=float, default=10.0)
+    parser.add_argument("--buffer-tolerance", type=float, default=0.25)
+    asyncio.run(main(parser.parse_args()))
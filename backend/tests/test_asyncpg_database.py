@@ -0,0 +1,88 @@
+import pytest
+import pytest_asyncio
+
+from app.db.asyncpg_database import AsyncpgDatabase, compile_query
+from app.db.repository.sports import SportRepository
+from app.db.session import get_database_uri
+from app.schemas.sport import SportCreateModel
+
+from tests.utils import generate_random_string
+
+pytestmark = pytest.mark.asyncio
+
+count_sports_query = "SELECT count(*) FROM sport WHERE slug = :slug"
+
+
+@pytest_asyncio.fixture
+async def asyncpg_db(apply_migrations: None) -> AsyncpgDatabase:
+    database = AsyncpgDatabase(get_database_uri(), min_size=1, max_size=2)
+    await database.connect()
+    yield database
+    await database.disconnect()
+
+
+def new_sport() -> SportCreateModel:
+    return SportCreateModel(name=generate_random_string(20), slug=generate_random_string(20), active=True)
+
+
+class TestCompileQuery:
+    """Test the :name to $n conversion."""
+
+    @pytest.mark.parametrize(
+        "query, compiled, names",
+        (
+            ("SELECT * FROM sport WHERE id = :id", "SELECT * FROM sport WHERE id = $1", ("id",)),
+            (
+                "SELECT * FROM event WHERE (scheduled_start, id) > (:after_value, :after_id) LIMIT :limit",
+                "SELECT * FROM event WHERE (scheduled_start, id) > ($1, $2) LIMIT $3",
+                ("after_value", "after_id", "limit"),
+            ),
+            ("SELECT CAST(:ids AS integer[]), :ids", "SELECT CAST($1 AS integer[]), $1", ("ids",)),
+            ("SELECT now()::date, '10\\:30'", "SELECT now()::date, '10:30'", ()),
+        ),
+    )
+    async def test_compile_query(self, query: str, compiled: str, names: tuple) -> None:
+        assert compile_query(query) == (compiled, names)
+
+
+class TestAsyncpgDatabase:
+    """Test the asyncpg backend against the calls the repositories make."""
+
+    async def test_repository_round_trip(self, asyncpg_db: AsyncpgDatabase) -> None:
+        """Test that the records read like the databases ones."""
+        sports_repo = SportRepository(asyncpg_db)
+        sport_model = new_sport()
+        sport = await sports_repo.create_sport(new_sport=sport_model)
+        assert sport.name == sport_model.name
+        assert sport["slug"] == sport_model.slug
+        assert dict(sport).items() <= dict(await sports_repo.get_sport_by_id(id=sport.id)).items()
+
+        sports = await sports_repo.get_all_sports({"name": sport_model.name}, limit=10)
+        assert [row.id for row in sports] == [sport.id]
+
+        streamed = [row.id async for row in sports_repo.iterate_sports({"name": sport_model.name})]
+        assert streamed == [sport.id]
+
+    async def test_missing_bind_value(self, asyncpg_db: AsyncpgDatabase) -> None:
+        with pytest.raises(KeyError):
+            await asyncpg_db.fetch_val(query=count_sports_query, values={})
+
+    async def test_transaction_rolls_back(self, asyncpg_db: AsyncpgDatabase) -> None:
+        """Test that a failing block leaves nothing behind, and a failing nested block only undoes itself."""
+        sports_repo = SportRepository(asyncpg_db)
+        kept, nested, outer = new_sport(), new_sport(), new_sport()
+
+        with pytest.raises(RuntimeError):
+            async with asyncpg_db.transaction():
+                await sports_repo.create_sport(new_sport=kept)
+                with pytest.raises(RuntimeError):
+                    async with asyncpg_db.transaction():
+                        await sports_repo.create_sport(new_sport=nested)
+                        raise RuntimeError
+                assert await asyncpg_db.fetch_val(query=count_sports_query, values={"slug": kept.slug}) == 1
+                assert await asyncpg_db.fetch_val(query=count_sports_query, values={"slug": nested.slug}) == 0
+                await sports_repo.create_sport(new_sport=outer)
+                raise RuntimeError
+
+        for sport in (kept, nested, outer):
+            assert await asyncpg_db.fetch_val(query=count_sports_query, values={"slug": sport.slug}) == 0
@@ -0,0 +1,29 @@
+import pytest
+
+from databases import Database
+from fastapi import FastAPI
+from httpx import AsyncClient
+from app.db.session import raw_connection
+from benchmarks.bench_endpoints import percentile, run_suite
+from benchmarks.generate_data import load
+
+
+class TestPercentile:
+    @pytest.mark.parametrize("fraction, expected", ((0.5, 50), (0.95, 95), (0.99, 99), (1.0, 100), (0.0, 1)))
+    def test_nearest_rank(self, fraction: float, expected: int) -> None:
+        assert percentile(list(range(1, 101)), fraction) == expected
+
+
+@pytest.mark.asyncio
+class TestEndpointSuite:
+    """Run the benchmark suite at a tiny scale, so a broken scenario shows up here."""
+
+    async def test_every_scenario_succeeds(self, app: FastAPI, client: AsyncClient, db: Database) -> None:
+        async with raw_connection(db) as connection:
+            dataset = await load(connection, 2, 4, 20, seed=0)
+        assert len(dataset.selection_ids) == 20
+
+        results = await run_suite(app, client, dataset, requests=3, concurrency=2, seed=0)
+
+        assert {label: result["errors"] for label, result in results.items()} == {label: 0 for label in results}
+        assert all(result["p50_ms"] <= result["p99_ms"] for result in results.values())
@@ -0,0 +1,118 @@
+import pytest
+
+from databases import Database
+from fastapi import FastAPI
+from httpx import AsyncClient
+from app.db.cache import RecordCache, record_cache
+from app.schemas.event import EventPersistModel
+from app.schemas.selection import SelectionCreateModel, SelectionOutcomeModel
+from app.schemas.sport import SportPersistModel
+
+from tests.utils import generate_random_string
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestRecordCache:
+    """Test the LRU and TTL bookkeeping of the cache."""
+
+    def test_least_recently_used_entry_is_evicted(self) -> None:
+        cache = RecordCache(max_size=2, ttl=60)
+        cache.put("a", 1, cache.generation)
+        cache.put("b", 2, cache.generation)
+        assert cache.get("a") == 1
+        cache.put("c", 3, cache.generation)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats() == {"size": 2, "max_size": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+    def test_entries_expire(self) -> None:
+        clock = FakeClock()
+        cache = RecordCache(max_size=2, ttl=5, clock=clock)
+        cache.put("a", 1, cache.generation)
+        clock.now = 4.9
+        assert cache.get("a") == 1
+        clock.now = 5
+        assert cache.get("a") is None
+        assert cache.stats()["size"] == 0
+
+    def test_read_from_before_an_invalidation_is_not_stored(self) -> None:
+        cache = RecordCache(max_size=2, ttl=60)
+        generation = cache.generation
+        cache.invalidate("a")
+        cache.put("a", "stale", generation)
+        assert cache.get("a") is None
+
+    def test_zero_size_disables_the_cache(self) -> None:
+        cache = RecordCache(max_size=0, ttl=60)
+        cache.put("a", 1, cache.generation)
+        assert cache.get("a") is None
+
+
+class TestRecordCacheInvalidation:
+    """Test that the get by id routes never serve a row the API changed."""
+
+    async def test_get_by_id_is_served_from_the_cache(
+        self, app: FastAPI, client: AsyncClient, new_sport_db_record: SportPersistModel
+    ) -> None:
+        url = app.url_path_for("Get Sport by id", id=new_sport_db_record.id)
+        await client.get(url)
+        hits = record_cache.hits
+
+        response = await client.get(url)
+        assert response.status_code == 200
+        assert response.json()["name"] == new_sport_db_record.name
+        assert record_cache.hits == hits + 1
+
+        response = await client.get(app.url_path_for("Get cache stats"))
+        assert response.status_code == 200
+        assert response.json()["hits"] == record_cache.hits
+
+    async def test_update_invalidates(
+        self, app: FastAPI, client: AsyncClient, new_sport_db_record: SportPersistModel
+    ) -> None:
+        url = app.url_path_for("Get Sport by id", id=new_sport_db_record.id)
+        await client.get(url)
+
+        new_name = generate_random_string(20)
+        response = await client.put(
+            app.url_path_for("Update Sport", id=new_sport_db_record.id), json={"name": new_name}
+        )
+        assert response.status_code == 200
+
+        response = await client.get(url)
+        assert response.json()["name"] == new_name
+
+    async def test_cascade_invalidates(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that the event and sport the cascade deactivated are read again."""
+        event_url = app.url_path_for("Get Event by id", id=new_event_db_record.id)
+        sport_url = app.url_path_for("Get Sport by id", id=new_event_db_record.sport_id)
+        assert (await client.get(event_url)).json()["active"] is True
+        assert (await client.get(sport_url)).json()["active"] is True
+
+        response = await client.post(
+            app.url_path_for("Create Selection"),
+            json=SelectionCreateModel(
+                name=generate_random_string(20),
+                active=False,
+                event_id=new_event_db_record.id,
+                price=1.5,
+                outcome=SelectionOutcomeModel.unsettled,
+            ).dict(),
+        )
+        assert response.status_code == 200
+
+        assert (await client.get(event_url)).json()["active"] is False
+        assert (await client.get(sport_url)).json()["active"] is False
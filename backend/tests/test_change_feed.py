@@ -0,0 +1,108 @@
+from typing import List, Optional, Tuple
+
+import asyncpg
+import pytest
+
+from databases import Database
+from fastapi import FastAPI
+from httpx import AsyncClient
+from app.db.pagination import encode_change_cursor
+from app.db.session import get_database_uri
+from app.schemas.event import EventPersistModel
+from app.schemas.selection import SelectionPersistModel
+from app.schemas.sport import SportPersistModel
+
+from tests.utils import generate_random_string
+
+last_change_query = "SELECT changed_xid, version FROM (" \
+    "SELECT changed_xid, version FROM sport UNION ALL " \
+    "SELECT changed_xid, version FROM event UNION ALL " \
+    "SELECT changed_xid, version FROM selection" \
+    ") AS changed ORDER BY changed_xid DESC, version DESC LIMIT 1"
+
+
+async def head_cursor(db: Database) -> str:
+    """Return a cursor after every change made so far."""
+    last = await db.fetch_one(query=last_change_query)
+    return encode_change_cursor(last["changed_xid"], last["version"])
+
+
+async def read_feed(app: FastAPI, client: AsyncClient, since: Optional[str], limit: int = 100) -> Tuple[List[dict], str]:
+    """Follow the feed from the cursor until it has nothing more."""
+    changes = []
+    while True:
+        response = await client.get(app.url_path_for("Get changes"), params={"since": since, "limit": limit})
+        assert response.status_code == 200
+        page = response.json()
+        changes.extend(page["changes"])
+        since = page["cursor"]
+        if not page["has_more"]:
+            return changes, since
+
+
+def entities(changes: List[dict]) -> List[Tuple[str, int]]:
+    return [(change["entity"], change["row"]["id"]) for change in changes]
+
+
+@pytest.mark.asyncio
+class TestChangeFeed:
+    async def test_writes_come_in_order_with_their_latest_state(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_sport_db_record: SportPersistModel
+    ) -> None:
+        since = await head_cursor(db)
+        event = await client.post(app.url_path_for("Create Event"), json={
+            "name": generate_random_string(10), "slug": generate_random_string(10), "active": True,
+            "type": "preplay", "sport_id": new_sport_db_record.id, "status": "Pending",
+            "scheduled_start": "2030-01-01T00:00:00+00:00",
+        })
+        await client.put(app.url_path_for("Update Sport", id=new_sport_db_record.id), json={"slug": "renamed"})
+
+        changes, cursor = await read_feed(app, client, since)
+
+        # Counting the new event rewrote the sport, which the update moved again
+        assert entities(changes) == [("event", event.json()["id"]), ("sport", new_sport_db_record.id)]
+        sport = await client.get(app.url_path_for("Get Sport by id", id=new_sport_db_record.id))
+        assert changes[1]["row"] == sport.json()
+        assert await read_feed(app, client, cursor) == ([], cursor)
+
+    async def test_pages_follow_the_cursor(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_event_db_record: EventPersistModel
+    ) -> None:
+        since = await head_cursor(db)
+        response = await client.post(app.url_path_for("Create Selections in bulk"), json=[
+            {"name": generate_random_string(10), "active": True, "event_id": new_event_db_record.id,
+             "price": 2.5, "outcome": "Unsettled"}
+            for _ in range(5)
+        ])
+        created = [("selection", result["selection"]["id"]) for result in response.json()]
+
+        changes, _ = await read_feed(app, client, since, limit=2)
+
+        assert entities(changes) == created + [("event", new_event_db_record.id)]
+
+    async def test_a_running_transaction_holds_back_later_changes(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_selection_db_record: SelectionPersistModel,
+    ) -> None:
+        since = await head_cursor(db)
+        connection = await asyncpg.connect(get_database_uri())
+        try:
+            transaction = connection.transaction()
+            await transaction.start()
+            await connection.execute("UPDATE selection SET price = 7.5 WHERE id = $1", new_selection_db_record.id)
+            event = await client.put(
+                app.url_path_for("Update Event", id=new_selection_db_record.event_id), json={"slug": "held-back"}
+            )
+
+            assert await read_feed(app, client, since) == ([], since)
+
+            await transaction.commit()
+        finally:
+            await connection.close()
+
+        changes, _ = await read_feed(app, client, since)
+        assert entities(changes) == [("selection", new_selection_db_record.id), ("event", event.json()["id"])]
+        assert changes[0]["row"]["price"] == 7.5
+
+    async def test_invalid_cursor(self, app: FastAPI, client: AsyncClient) -> None:
+        response = await client.get(app.url_path_for("Get changes"), params={"since": "not a cursor"})
+        assert response.status_code == 400
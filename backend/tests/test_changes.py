@@ -0,0 +1,199 @@
+import asyncio
+import json
+from typing import List, Set, Tuple
+
+import pytest
+
+from databases import Database
+from fastapi import FastAPI
+from httpx import AsyncClient
+from app.api_routes.streaming import _server_sent_events
+from app.db.changes import Change, ChangeHub, Subscription
+from app.schemas.event import EventPersistModel
+from app.schemas.selection import SelectionPersistModel
+
+from tests.utils import generate_random_string
+
+
+def change(entity: str, id: int, version: int = 1, sport_id: int = 1, event_id: int = 10) -> Change:
+    return Change(entity, id, sport_id, event_id, version, json.dumps({"id": id, "version": version}))
+
+
+def payload(*changes: Change) -> str:
+    return json.dumps([
+        {"entity": c.entity, "sport_id": c.sport_id, "event_id": c.event_id, "row": json.loads(c.data)}
+        for c in changes
+    ])
+
+
+async def read_changes(subscription: Subscription, until: Set[Tuple[str, int]]) -> List[Change]:
+    """Read batches until every (entity, id) in until showed up."""
+    received: List[Change] = []
+    while not until <= {(c.entity, c.id) for c in received}:
+        _, changes = await asyncio.wait_for(subscription.next_batch(), 5)
+        received.extend(changes)
+    return received
+
+
+@pytest.mark.asyncio
+class TestSubscription:
+    """Test the bounded, coalescing queue of one subscriber."""
+
+    async def test_changes_of_one_row_are_coalesced(self) -> None:
+        subscription = Subscription(max_pending=10)
+        subscription.offer(change("selection", 1, version=1))
+        subscription.offer(change("selection", 2, version=2))
+        subscription.offer(change("selection", 1, version=3))
+
+        missed, changes = await subscription.next_batch()
+
+        assert not missed
+        assert [(c.id, c.version) for c in changes] == [(2, 2), (1, 3)]
+        assert subscription.coalesced == 1
+
+    async def test_overflow_drops_the_pending_changes(self) -> None:
+        subscription = Subscription(max_pending=2)
+        for id in range(3):
+            subscription.offer(change("selection", id))
+        subscription.offer(change("selection", 3))
+
+        missed, changes = await subscription.next_batch()
+
+        assert missed
+        assert [c.id for c in changes] == [3]
+        assert subscription.dropped == 3
+
+
+class TestChangeHub:
+    """Test that a notification reaches the subscriptions filtering on its rows."""
+
+    def test_publish_fans_out_by_filter(self) -> None:
+        hub = ChangeHub("", max_pending=10, retry_interval=1)
+        everything = hub.subscribe()
+        by_sport = hub.subscribe(sport_ids=[1])
+        by_event = hub.subscribe(event_ids=[10])
+        by_selection = hub.subscribe(selection_ids=[100])
+        other_sport = hub.subscribe(sport_ids=[2])
+
+        hub.publish(payload(change("event", 10), change("selection", 100), change("selection", 101)))
+
+        def pending(subscription: Subscription) -> List[Tuple[str, int]]:
+            return list(subscription._pending)
+
+        assert pending(everything) == [("event", 10), ("selection", 100), ("selection", 101)]
+        assert pending(by_sport) == [("event", 10), ("selection", 100), ("selection", 101)]
+        assert pending(by_event) == [("event", 10), ("selection", 100), ("selection", 101)]
+        assert pending(by_selection) == [("selection", 100)]
+        assert pending(other_sport) == []
+
+    def test_unsubscribe(self) -> None:
+        hub = ChangeHub("", max_pending=10, retry_interval=1)
+        subscription = hub.subscribe(sport_ids=[1], event_ids=[10])
+        hub.unsubscribe(subscription)
+
+        hub.publish(payload(change("event", 10)))
+
+        assert subscription._pending == {}
+        assert hub.subscriptions() == set()
+
+
+@pytest.mark.asyncio
+class TestChangeStream:
+    """Test that writes reach subscribers through LISTEN/NOTIFY."""
+
+    async def test_api_writes_are_pushed(
+        self, app: FastAPI, client: AsyncClient, new_event_db_record: EventPersistModel
+    ) -> None:
+        hub = app.state._change_hub
+        subscription = hub.subscribe(event_ids=[new_event_db_record.id])
+        try:
+            created = await client.post(app.url_path_for("Create Selection"), json={
+                "name": generate_random_string(10), "active": True, "event_id": new_event_db_record.id,
+                "price": 2.5, "outcome": "Unsettled",
+            })
+            id = created.json()["id"]
+            await client.put(app.url_path_for("Update Selection", id=id), json={"price": 3.25})
+            await client.put(app.url_path_for("Update Event", id=new_event_db_record.id), json={"status": "Ended"})
+
+            received = await read_changes(subscription, {("event", new_event_db_record.id)})
+        finally:
+            hub.unsubscribe(subscription)
+
+        # The counter update the new selection made to its event is not a change
+        assert [(c.entity, c.id) for c in received] == [("selection", id), ("event", new_event_db_record.id)]
+        assert json.loads(received[0].data)["price"] == 3.25
+        assert json.loads(received[1].data)["status"] == "Ended"
+        assert "active_selection_count" not in json.loads(received[1].data)
+
+    async def test_bulk_writes_are_split_across_notifications(
+        self, app: FastAPI, client: AsyncClient, new_event_db_record: EventPersistModel
+    ) -> None:
+        hub = app.state._change_hub
+        subscription = hub.subscribe(event_ids=[new_event_db_record.id])
+        try:
+            response = await client.post(app.url_path_for("Create Selections in bulk"), json=[
+                {"name": f"bulk selection {i}".ljust(100, "-"), "active": True, "event_id": new_event_db_record.id,
+                 "price": 2.5, "outcome": "Unsettled"}
+                for i in range(200)
+            ])
+            ids = {("selection", result["selection"]["id"]) for result in response.json()}
+
+            received = await read_changes(subscription, ids)
+        finally:
+            hub.unsubscribe(subscription)
+
+        assert len(received) == 200
+
+    async def test_subscribers_are_told_about_a_lost_connection(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_selection_db_record: SelectionPersistModel
+    ) -> None:
+        hub = app.state._change_hub
+        subscription = hub.subscribe()
+        try:
+            await db.execute(query="SELECT pg_terminate_backend(:pid)", values={"pid": hub.connection.get_server_pid()})
+            missed, _ = await asyncio.wait_for(subscription.next_batch(), 5)
+            assert missed
+
+            await client.put(
+                app.url_path_for("Update Selection", id=new_selection_db_record.id), json={"price": 4.5}
+            )
+            received = await read_changes(subscription, {("selection", new_selection_db_record.id)})
+        finally:
+            hub.unsubscribe(subscription)
+
+        assert json.loads(received[-1].data)["price"] == 4.5
+
+    async def test_server_sent_events(self, app: FastAPI, client: AsyncClient) -> None:
+        hub = app.state._change_hub
+        events = _server_sent_events(hub, {"selection_ids": [7]}, keepalive=0.05)
+
+        assert await events.__anext__() == b": connected\n\n"
+        [subscription] = [s for s in hub.subscriptions() if s.selection_ids == {7}]
+        assert await events.__anext__() == b": keepalive\n\n"
+        subscription.offer(change("selection", 7, version=42))
+        subscription.mark_missed()
+        assert await events.__anext__() == (
+            b"event: reset\ndata: {}\n\n"
+            b'id: 42\nevent: selection\ndata: {"id": 7, "version": 42}\n\n'
+        )
+
+        await events.aclose()
+        assert subscription not in hub.subscriptions()
+
+    async def test_a_stream_closed_before_its_body_leaves_no_subscription(
+        self, app: FastAPI, client: AsyncClient
+    ) -> None:
+        hub = app.state._change_hub
+        subscriptions = hub.subscriptions()
+
+        await _server_sent_events(hub, {"event_ids": [7]}, keepalive=0.05).aclose()
+
+        assert hub.subscriptions() == subscriptions
+
+    async def test_stream_without_listener(self, app: FastAPI, client: AsyncClient) -> None:
+        await app.state._change_hub.stop()
+        app.state._change_hub = None
+
+        response = await client.get(app.url_path_for("Stream changes"))
+
+        assert response.status_code == 503
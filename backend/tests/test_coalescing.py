@@ -0,0 +1,251 @@
+import asyncio
+from typing import Dict, Iterator, List
+
+import pytest
+
+from databases import Database
+from fastapi import FastAPI
+from httpx import AsyncClient
+from app.db.coalescing import WriteCoalescer
+from app.db.repository.events import EventRepository
+from app.db.repository.selections import SelectionRepository, selection_update_coalescer
+from app.schemas.selection import SelectionCreateModel, SelectionPersistModel, SelectionUpdateModel
+
+pytestmark = pytest.mark.asyncio
+
+
+class RecordingApply:
+    """Apply function keeping the batches it was given, answering each key with its update."""
+
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.batches: List[Dict[int, int]] = []
+
+    async def __call__(self, updates: Dict[int, int]) -> Dict[int, int]:
+        await asyncio.sleep(self.delay)
+        self.batches.append(dict(updates))
+        return dict(updates)
+
+
+def coalescer(window: float = 0.01, max_batch: int = 100) -> WriteCoalescer:
+    return WriteCoalescer("test", window=window, max_batch=max_batch, merge=lambda earlier, later: later)
+
+
+@pytest.fixture
+def coalescing() -> Iterator[WriteCoalescer]:
+    window = selection_update_coalescer.window
+    selection_update_coalescer.window = 0.02
+    yield selection_update_coalescer
+    selection_update_coalescer.window = window
+
+
+class TestWriteCoalescer:
+    """Test the batching, ordering and results of coalesced writes."""
+
+    async def test_a_window_is_applied_once_with_the_last_update_per_key(self) -> None:
+        writes = coalescer()
+        apply = RecordingApply()
+
+        results = await asyncio.gather(
+            writes.submit(1, 10, apply), writes.submit(2, 20, apply), writes.submit(1, 11, apply),
+        )
+
+        assert apply.batches == [{1: 11, 2: 20}]
+        assert results == [11, 20, 11]
+        assert writes.stats() == {"submitted": 3, "applied": 2, "batches": 1}
+
+    async def test_batches_are_applied_in_window_order(self) -> None:
+        writes = coalescer(window=0.001)
+        slow, fast = RecordingApply(delay=0.05), RecordingApply()
+        first = asyncio.ensure_future(writes.submit(1, 10, slow))
+        await asyncio.sleep(0.01)
+
+        # The second window closes while the first batch is still being written
+        assert await writes.submit(1, 11, fast) == 11
+        assert first.done()
+        assert slow.batches == [{1: 10}]
+
+    async def test_a_full_batch_is_applied_before_the_window_ends(self) -> None:
+        writes = coalescer(window=10, max_batch=2)
+        apply = RecordingApply()
+
+        results = await asyncio.wait_for(asyncio.gather(writes.submit(1, 10, apply), writes.submit(2, 20, apply)), 1)
+
+        assert results == [10, 20]
+
+    async def test_errors_reach_every_caller(self) -> None:
+        writes = coalescer()
+
+        async def fail(updates: Dict[int, int]) -> Dict[int, int]:
+            raise ValueError("write failed")
+
+        results = await asyncio.gather(writes.submit(1, 10, fail), writes.submit(2, 20, fail), return_exceptions=True)
+
+        assert [str(result) for result in results] == ["write failed", "write failed"]
+
+    async def test_a_failing_update_only_fails_its_callers(self) -> None:
+        writes = coalescer()
+        apply = RecordingApply()
+
+        async def fail_on_2(updates: Dict[int, int]) -> Dict[int, int]:
+            if 2 in updates:
+                raise ValueError("bad update")
+            return await apply(updates)
+
+        results = await asyncio.gather(
+            writes.submit(1, 10, fail_on_2), writes.submit(2, 20, fail_on_2), writes.submit(3, 30, fail_on_2),
+            writes.submit(2, 21, fail_on_2), return_exceptions=True,
+        )
+
+        assert [str(result) for result in results] == ["10", "bad update", "30", "bad update"]
+        assert apply.batches == [{1: 10}, {3: 30}]
+
+    async def test_a_failing_update_merged_with_a_good_one_only_fails_its_caller(self) -> None:
+        writes = WriteCoalescer("test", window=0.01, max_batch=100, merge=lambda earlier, later: earlier + later)
+        apply = RecordingApply()
+
+        async def fail_when_negative(updates: Dict[int, int]) -> Dict[int, int]:
+            if any(update < 0 for update in updates.values()):
+                raise ValueError("bad update")
+            return await apply(updates)
+
+        results = await asyncio.gather(
+            writes.submit(1, 10, fail_when_negative), writes.submit(1, -20, fail_when_negative),
+            writes.submit(1, 5, fail_when_negative), return_exceptions=True,
+        )
+
+        # Each caller's update is applied alone once the merged one failed
+        assert apply.batches == [{1: 10}, {1: 5}]
+        assert [str(result) for result in results] == ["5", "bad update", "5"]
+
+    async def test_wait_for_a_buffered_key(self) -> None:
+        writes = coalescer()
+        apply = RecordingApply()
+        submitted = asyncio.ensure_future(writes.submit(1, 10, apply))
+        await asyncio.sleep(0)
+
+        await writes.wait_for(1)
+
+        assert apply.batches == [{1: 10}]
+        await submitted
+
+
+class TestCoalescedSelectionUpdates:
+    """Test PUT /selections/{id}/ with coalescing turned on."""
+
+    async def test_concurrent_updates_share_one_statement(
+        self, app: FastAPI, client: AsyncClient, coalescing: WriteCoalescer,
+        new_selection_db_record: SelectionPersistModel,
+    ) -> None:
+        batches = coalescing.batches
+        url = app.url_path_for("Update Selection", id=new_selection_db_record.id)
+
+        responses = await asyncio.gather(
+            client.put(url, json={"price": 3.5}),
+            client.put(url, json={"name": "renamed"}),
+            client.put(app.url_path_for("Update Selection", id=0), json={"price": 6.5}),
+        )
+
+        assert coalescing.batches == batches + 1
+        assert [response.status_code for response in responses] == [200, 200, 404]
+        # Every caller gets the row the batch wrote
+        assert responses[0].json() == responses[1].json()
+        selection = await client.get(app.url_path_for("Get Selection by id", id=new_selection_db_record.id))
+        assert selection.json() == responses[0].json()
+        assert (selection.json()["name"], selection.json()["price"]) == ("renamed", 3.5)
+
+    async def test_the_last_update_wins(
+        self, client: AsyncClient, db: Database, coalescing: WriteCoalescer,
+        new_selection_db_record: SelectionPersistModel,
+    ) -> None:
+        repository = SelectionRepository(db)
+
+        updated = await asyncio.gather(*(
+            repository.update_selection(id=new_selection_db_record.id, selection_update=selection_update)
+            for selection_update in (
+                SelectionUpdateModel(price=3.5),
+                SelectionUpdateModel(name="renamed", price=4.5),
+                SelectionUpdateModel(price=5.5),
+            )
+        ))
+
+        assert [(selection["name"], float(selection["price"])) for selection in updated] == [("renamed", 5.5)] * 3
+
+    async def test_an_invalid_update_leaves_the_rest_of_the_batch_alone(
+        self, client: AsyncClient, db: Database, coalescing: WriteCoalescer,
+        new_selection_db_record: SelectionPersistModel,
+    ) -> None:
+        repository = SelectionRepository(db)
+        [other] = await repository.create_selections(new_selections=[SelectionCreateModel(**new_selection_db_record)])
+
+        # The name is longer than the column allows
+        updated, failed = await asyncio.gather(
+            repository.update_selection(
+                id=new_selection_db_record.id, selection_update=SelectionUpdateModel(price=3.5)
+            ),
+            repository.update_selection(id=other["id"], selection_update=SelectionUpdateModel(name="x" * 101)),
+            return_exceptions=True,
+        )
+
+        assert float(updated["price"]) == 3.5
+        assert isinstance(failed, Exception)
+        assert (await repository.get_selection_by_id(id=other["id"])).name == new_selection_db_record.name
+
+    async def test_an_invalid_update_merged_with_a_valid_one_only_fails_its_caller(
+        self, client: AsyncClient, db: Database, coalescing: WriteCoalescer,
+        new_selection_db_record: SelectionPersistModel,
+    ) -> None:
+        repository = SelectionRepository(db)
+
+        updated, failed = await asyncio.gather(
+            repository.update_selection(
+                id=new_selection_db_record.id, selection_update=SelectionUpdateModel(price=3.5)
+            ),
+            repository.update_selection(
+                id=new_selection_db_record.id, selection_update=SelectionUpdateModel(name="x" * 101)
+            ),
+            return_exceptions=True,
+        )
+
+        assert (updated["name"], float(updated["price"])) == (new_selection_db_record.name, 3.5)
+        assert isinstance(failed, Exception)
+
+    async def test_a_deactivation_lands_after_the_buffered_updates(
+        self, client: AsyncClient, db: Database, coalescing: WriteCoalescer,
+        new_selection_db_record: SelectionPersistModel,
+    ) -> None:
+        repository = SelectionRepository(db)
+
+        # Had the deactivation gone first, the buffered update would turn the
+        # selection back on and leave its event inactive
+        _, deactivated = await asyncio.gather(
+            repository.update_selection(
+                id=new_selection_db_record.id, selection_update=SelectionUpdateModel(active=True, price=3.5)
+            ),
+            repository.update_selection(
+                id=new_selection_db_record.id, selection_update=SelectionUpdateModel(active=False)
+            ),
+        )
+
+        assert deactivated["active"] is False
+        assert float(deactivated["price"]) == 3.5
+        event = await EventRepository(db).get_event_by_id(id=new_selection_db_record.event_id)
+        assert event.active is False
+
+    async def test_updates_of_many_selections(
+        self, client: AsyncClient, db: Database, coalescing: WriteCoalescer, new_selection_db_record: SelectionPersistModel,
+    ) -> None:
+        repository = SelectionRepository(db)
+        created = await repository.create_selections(
+            new_selections=[SelectionCreateModel(**new_selection_db_record)] * 3
+        )
+        ids = [selection["id"] for selection in created]
+
+        updated = await asyncio.gather(*(
+            repository.update_selection(id=id, selection_update=SelectionUpdateModel(price=2.0 + i))
+            for i, id in enumerate(ids)
+        ))
+
+        assert [(selection["id"], float(selection["price"])) for selection in updated] == [
+            (id, 2.0 + i) for i, id in enumerate(ids)
+        ]
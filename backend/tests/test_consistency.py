@@ -0,0 +1,80 @@
+import pytest
+
+from databases import Database
+from httpx import AsyncClient
+from app.db.consistency import check_active_counters
+from app.db.repository.events import EventRepository
+from app.db.repository.selections import SelectionRepository
+from app.schemas.event import EventCreateModel, EventPersistModel
+from app.schemas.selection import (
+    SelectionCreateModel, SelectionOutcomeModel, SelectionPriceUpdateModel, SelectionUpdateModel
+)
+
+from tests.utils import generate_random_string
+
+pytestmark = pytest.mark.asyncio
+
+active_selection_count_query = "SELECT active_selection_count FROM event WHERE id = :id"
+
+
+class TestActiveCounters:
+    """Test the active child counters kept by the triggers."""
+
+    async def test_counters_follow_inserts_updates_and_moves(
+        self, client: AsyncClient, db: Database, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that the event counter tracks its active selections."""
+        other_event = await EventRepository(db).create_event(
+            new_event=EventCreateModel(**{**dict(new_event_db_record), "name": generate_random_string(20)})
+        )
+        selection_repository = SelectionRepository(db)
+        selections = await selection_repository.create_selections(new_selections=[
+            SelectionCreateModel(
+                name=generate_random_string(20),
+                active=active,
+                event_id=new_event_db_record.id,
+                price=1.5,
+                outcome=SelectionOutcomeModel.unsettled,
+            )
+            for active in (True, True, True, False)
+        ])
+
+        async def active_selection_count(event_id: int) -> int:
+            return await db.fetch_val(query=active_selection_count_query, values={"id": event_id})
+
+        assert await active_selection_count(new_event_db_record.id) == 3
+
+        await selection_repository.update_selection(
+            id=selections[0].id, selection_update=SelectionUpdateModel(active=False)
+        )
+        await selection_repository.update_selection(
+            id=selections[1].id, selection_update=SelectionUpdateModel(event_id=other_event.id)
+        )
+        await selection_repository.update_selection(
+            id=selections[3].id, selection_update=SelectionUpdateModel(active=True, event_id=other_event.id)
+        )
+        await selection_repository.update_prices(
+            price_updates=[SelectionPriceUpdateModel(id=selections[2].id, price=3.0)]
+        )
+
+        assert await active_selection_count(new_event_db_record.id) == 1
+        assert await active_selection_count(other_event.id) == 2
+        assert await check_active_counters(db) == []
+
+    async def test_check_finds_and_repairs_a_drifted_counter(
+        self, client: AsyncClient, db: Database, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that a counter written behind the triggers' back is reported and repaired."""
+        await db.execute(
+            query="UPDATE event SET active_selection_count = 7 WHERE id = :id",
+            values={"id": new_event_db_record.id},
+        )
+
+        mismatches = await check_active_counters(db, fix=True)
+        assert [(mismatch["entity"], mismatch["id"], mismatch["stored"]) for mismatch in mismatches] == [
+            ("event", new_event_db_record.id, 7)
+        ]
+        assert await check_active_counters(db) == []
+        assert await db.fetch_val(
+            query=active_selection_count_query, values={"id": new_event_db_record.id}
+        ) == 0
@@ -1,4 +1,5 @@
 import json
+import asyncpg
 import pytest
 from fastapi import FastAPI
 
@@ -7,9 +8,10 @@ from httpx import AsyncClient
 from databases import Database
 from datetime import datetime, timedelta, timezone
 
-from tests.utils import generate_random_string
+from tests.utils import generate_random_string, parse_times
 
 from app.db.repository.sports import SportRepository
+from app.db.session import get_database_uri
 from app.db.repository.events import EventRepository
 from app.db.repository.selections import SelectionRepository
 
@@ -395,6 +397,201 @@ class TestGetEvent:
         assert len(response.json()) == 1
     
 
+    async def test_get_all_events_by_sport_status_type_and_start_window(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        new_sport_db_record: SportPersistModel,
+        db: Database,
+    ) -> None:
+        """Test that the structured filters combine, with a half open scheduled_start window."""
+        now = datetime.now(timezone.utc)
+        events_repository = EventRepository(db)
+        created = [
+            await events_repository.create_event(new_event=EventCreateModel(
+                name=generate_random_string(20),
+                active=True,
+                slug=generate_random_string(20),
+                type=event_type,
+                sport_id=new_sport_db_record.id,
+                status=status,
+                scheduled_start=now + timedelta(minutes=minutes),
+            ))
+            for event_type, status, minutes in (
+                (EventTypeModel.inplay, EventStatusModel.pending, 10),
+                (EventTypeModel.inplay, EventStatusModel.pending, 60),
+                (EventTypeModel.preplay, EventStatusModel.pending, 20),
+                (EventTypeModel.inplay, EventStatusModel.started, -5),
+            )
+        ]
+
+        async def listed(**params: Any) -> List[int]:
+            response = await client.get(
+                app.url_path_for("Get all Events"), params={"sport_id": new_sport_db_record.id, **params}
+            )
+            assert response.status_code == 200
+            return [event["id"] for event in response.json()]
+
+        assert await listed() == [event.id for event in created]
+        assert await listed(
+            type="inplay", scheduled_start_from=now.isoformat(), scheduled_start_to=(now + timedelta(hours=1)).isoformat()
+        ) == [created[0].id]
+        assert await listed(status="Started") == [created[3].id]
+        assert await listed(type="preplay", status="Started") == []
+        assert await listed(sport_id=-1) == []
+
+        response = await client.get(app.url_path_for("Get all Events"), params={"status": "Unknown"})
+        assert response.status_code == 422
+
+    @pytest.mark.parametrize("order_by", ("id", "scheduled_start"))
+    async def test_get_all_events_paginates_with_cursor(
+        self,
+        order_by: str,
+        app: FastAPI,
+        client: AsyncClient,
+        new_sport_db_record: SportPersistModel,
+        db: Database,
+    ) -> None:
+        """Test walking the events list page by page with the next cursor."""
+        prefix = generate_random_string(12)
+        events_repo = EventRepository(db)
+        now = datetime.utcnow().replace(tzinfo=timezone.utc)
+        created_events = []
+        # Scheduled in reverse creation order, so both orderings differ
+        for i in range(5):
+            created_events.append(await events_repo.create_event(
+                new_event=EventCreateModel(
+                    name=f"{prefix} {i}",
+                    active=True,
+                    slug=generate_random_string(20),
+                    type=EventTypeModel.preplay,
+                    sport_id=new_sport_db_record.id,
+                    status=EventStatusModel.pending,
+                    scheduled_start=now - timedelta(hours=i),
+                )
+            ))
+        expected_ids = [event.id for event in sorted(created_events, key=lambda event: (getattr(event, order_by), event.id))]
+
+        received_ids = []
+        params = {"name": prefix, "limit": 2, "order_by": order_by}
+        while True:
+            response = await client.get(app.url_path_for("Get all Events"), params=params)
+            assert response.status_code == 200
+            received_ids.extend(event["id"] for event in response.json())
+            if "X-Next-Cursor" not in response.headers:
+                break
+            params["after"] = response.headers["X-Next-Cursor"]
+
+        assert received_ids == expected_ids
+
+    async def test_get_all_events_rejects_cursor_from_other_ordering(
+        self, app: FastAPI, client: AsyncClient, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that a cursor can only be used with the ordering it was created for."""
+        response = await client.get(app.url_path_for("Get all Events"), params={"limit": 1})
+        assert response.status_code == 200
+        cursor = response.headers["X-Next-Cursor"]
+
+        response = await client.get(
+            app.url_path_for("Get all Events"),
+            params={"limit": 1, "after": cursor, "order_by": "scheduled_start"},
+        )
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize(
+        "params, status_code",
+        (
+            ({"limit": 0}, 422),
+            ({"limit": 100000}, 422),
+            ({"order_by": "name"}, 422),
+        ),
+    )
+    async def test_get_all_events_with_invalid_page_params(
+        self, app: FastAPI, client: AsyncClient, params: dict, status_code: int
+    ) -> None:
+        """Test that invalid page sizes and orderings are rejected."""
+        response = await client.get(app.url_path_for("Get all Events"), params=params)
+        assert response.status_code == status_code
+
+    async def test_stream_all_events_with_invalid_cursor(
+        self, app: FastAPI, client: AsyncClient
+    ) -> None:
+        """Test that a malformed cursor is rejected before streaming starts."""
+        response = await client.get(
+            app.url_path_for("Get all Events"), params={"stream": True, "after": "nope"}
+        )
+        assert response.status_code == 400
+
+    async def test_get_event_by_id_is_conditional(
+        self, app: FastAPI, client: AsyncClient, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that an unchanged event returns 304 and a changed one a new ETag."""
+        url = app.url_path_for("Get Event by id", id=new_event_db_record.id)
+        etag = (await client.get(url)).headers["ETag"]
+
+        response = await client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+        await client.put(
+            app.url_path_for("Update Event", id=new_event_db_record.id), json={"name": generate_random_string(20)}
+        )
+        response = await client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    async def test_get_all_events_is_conditional(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that a list ETag changes with its parameters and with any event write."""
+        url = app.url_path_for("Get all Events")
+        etag = (await client.get(url, params={"limit": 5})).headers["ETag"]
+
+        response = await client.get(url, params={"limit": 5}, headers={"If-None-Match": f'W/{etag}, "other"'})
+        assert response.status_code == 304
+        response = await client.get(url, params={"limit": 6}, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+
+        # A new active selection moves the event counter, hence the event version
+        await SelectionRepository(db).create_selection(new_selection=SelectionCreateModel(
+            name=generate_random_string(20),
+            active=True,
+            event_id=new_event_db_record.id,
+            price=1.5,
+            outcome=SelectionOutcomeModel.unsettled,
+        ))
+        response = await client.get(url, params={"limit": 5}, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    async def test_list_etag_changes_when_an_older_write_commits_last(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that a write committing after a newer one still changes the list ETag."""
+        other_event = await EventRepository(db).create_event(
+            new_event=EventCreateModel(**{**dict(new_event_db_record), "name": generate_random_string(20)})
+        )
+        url = app.url_path_for("Get all Events")
+        connection = await asyncpg.connect(get_database_uri())
+        try:
+            transaction = connection.transaction()
+            await transaction.start()
+            # Draws its row version before the update below draws a newer one
+            await connection.execute("UPDATE event SET slug = 'committed-last' WHERE id = $1", new_event_db_record.id)
+            response = await client.put(app.url_path_for("Update Event", id=other_event.id), json={"slug": "first"})
+            assert response.status_code == 200
+            etag = (await client.get(url)).headers["ETag"]
+
+            await transaction.commit()
+        finally:
+            await connection.close()
+
+        response = await client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+
 class TestUpdateEvent:
     """Test updating an Event."""
 
@@ -612,4 +809,38 @@ class TestUpdateEvent:
         assert response.status_code == 200
         event = EventPersistModel(**response.json())
         assert event.actual_start
-        assert event.actual_start > old_actual_start
\ No newline at end of file
+        assert event.actual_start > old_actual_start
+
+
+class TestGetEventTree:
+    """Test getting an event with its selections."""
+
+    async def test_event_tree(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that the tree is the event with its selections, all as get by id returns them."""
+        selections = await SelectionRepository(db).create_selections(new_selections=[
+            SelectionCreateModel(
+                name=generate_random_string(20),
+                active=active,
+                event_id=new_event_db_record.id,
+                price=3.1,
+                outcome=SelectionOutcomeModel.unsettled,
+            )
+            for active in (False, True)
+        ])
+        url = app.url_path_for("Get Event tree", id=new_event_db_record.id)
+
+        response = await client.get(url)
+        assert response.status_code == 200
+        tree = parse_times(response.json())
+        event = await client.get(app.url_path_for("Get Event by id", id=new_event_db_record.id))
+        assert tree == {**parse_times(event.json()), "selections": [
+            (await client.get(app.url_path_for("Get Selection by id", id=selection.id))).json()
+            for selection in selections
+        ]}
+
+        tree = (await client.get(url, params={"active_only": True})).json()
+        assert [selection["id"] for selection in tree["selections"]] == [selections[1].id]
+        assert "selections" not in (await client.get(url, params={"depth": 0})).json()
+        assert (await client.get(app.url_path_for("Get Event tree", id=-1))).status_code == 404
@@ -0,0 +1,70 @@
+import asyncpg
+import pytest
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from databases import Database
+from httpx import AsyncClient
+from app.db.changes import CHANNEL
+from app.db.consistency import check_active_counters
+from app.db.session import get_database_uri, raw_connection
+from benchmarks.generate_data import generate, load
+
+now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class TestGenerate:
+    def test_same_seed_same_rows(self) -> None:
+        assert generate(3, 20, 200, 7, (1, 1, 1), now) == generate(3, 20, 200, 7, (1, 1, 1), now)
+        assert generate(3, 20, 200, 7, (1, 1, 1), now) != generate(3, 20, 200, 8, (1, 1, 1), now)
+
+    def test_ids_continue_from_first_ids(self) -> None:
+        sports, events, selections = generate(3, 20, 200, 0, (10, 100, 1000), now)
+
+        assert [row[0] for row in sports] == list(range(10, 13))
+        assert [row[0] for row in events] == list(range(100, 120))
+        assert [row[0] for row in selections] == list(range(1000, 1200))
+        assert {row[5] for row in events} <= {10, 11, 12}
+        assert {row[2] for row in selections} <= set(range(100, 120))
+
+    def test_active_flags_follow_the_cascade(self) -> None:
+        sports, events, selections = generate(5, 200, 3000, 0, (1, 1, 1), now)
+
+        active_selections = defaultdict(bool)
+        for _, _, event_id, _, active, outcome in selections:
+            active_selections[event_id] |= active
+        active_events = defaultdict(bool)
+        for event_id, _, _, active, _, sport_id, status, _, _ in events:
+            assert active == active_selections[event_id]
+            assert not (active and status in ("Ended", "Cancelled"))
+            active_events[sport_id] |= active
+        for sport_id, _, _, active in sports:
+            assert active == active_events[sport_id]
+        assert {row[5] for row in selections} == {"Unsettled", "Win", "Lose", "Void"}
+
+
+@pytest.mark.asyncio
+class TestLoad:
+    async def test_load_keeps_the_counters_consistent(self, client: AsyncClient, db: Database) -> None:
+        async with raw_connection(db) as connection:
+            dataset = await load(connection, 2, 10, 100, seed=0)
+
+        assert await db.fetch_val(
+            query="SELECT count(*) FROM selection WHERE id BETWEEN :first AND :last",
+            values={"first": dataset.selection_ids[0], "last": dataset.selection_ids[-1]},
+        ) == 100
+        assert await check_active_counters(db) == []
+
+    async def test_load_sends_no_change_notifications(self, client: AsyncClient, db: Database) -> None:
+        notifications = []
+        listener = await asyncpg.connect(get_database_uri())
+        try:
+            await listener.add_listener(CHANNEL, lambda *args: notifications.append(args))
+            async with raw_connection(db) as connection:
+                await load(connection, 2, 10, 100, seed=0)
+            # Notifications sent before this round trip have been read by then
+            await listener.execute("SELECT 1")
+        finally:
+            await listener.close()
+
+        assert notifications == []
@@ -0,0 +1,78 @@
+import pytest
+
+from databases import Database
+from fastapi import FastAPI
+from httpx import AsyncClient
+from app.metrics import Histogram, cascade_steps, pool_stats, query_latency, request_latency
+from app.schemas.selection import SelectionPersistModel
+
+
+class TestHistogram:
+    """Test the Prometheus text rendering."""
+
+    def test_render(self) -> None:
+        histogram = Histogram("latency_seconds", "Latency.", ("route",), (0.1, 1.0))
+        histogram.observe(0.05, "/a")
+        histogram.observe(0.1, "/a")
+        histogram.observe(3, "/a")
+        histogram.observe(0.5, 'say "hi"')
+
+        assert histogram.count("/a") == 3
+        assert histogram.render() == [
+            "# HELP latency_seconds Latency.",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{route="/a",le="0.1"} 2',
+            'latency_seconds_bucket{route="/a",le="1"} 2',
+            'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+            'latency_seconds_sum{route="/a"} 3.15',
+            'latency_seconds_count{route="/a"} 3',
+            'latency_seconds_bucket{route="say \\"hi\\"",le="0.1"} 0',
+            'latency_seconds_bucket{route="say \\"hi\\"",le="1"} 1',
+            'latency_seconds_bucket{route="say \\"hi\\"",le="+Inf"} 1',
+            'latency_seconds_sum{route="say \\"hi\\""} 0.5',
+            'latency_seconds_count{route="say \\"hi\\""} 1',
+        ]
+
+
+@pytest.mark.asyncio
+class TestMetricsEndpoint:
+    """Test what the app records and serves at /metrics."""
+
+    async def test_request_and_repository_calls_are_timed(
+        self, app: FastAPI, client: AsyncClient, new_selection_db_record: SelectionPersistModel
+    ) -> None:
+        route = ("GET", "/api/selections/{id}/", "200")
+        requests = request_latency.count(*route)
+        calls = query_latency.count("SelectionRepository.get_selection_by_id")
+
+        response = await client.get(app.url_path_for("Get Selection by id", id=new_selection_db_record.id))
+        assert response.status_code == 200
+
+        assert request_latency.count(*route) == requests + 1
+        assert query_latency.count("SelectionRepository.get_selection_by_id") == calls + 1
+
+    async def test_cascade_steps_are_recorded(
+        self, app: FastAPI, client: AsyncClient, new_selection_db_record: SelectionPersistModel
+    ) -> None:
+        series = cascade_steps._series.get(("selection",))
+        two_steps = 0 if series is None else series[2]
+
+        # The only selection of the event: the event and its sport go inactive
+        response = await client.put(
+            app.url_path_for("Update Selection", id=new_selection_db_record.id), json={"active": False}
+        )
+        assert response.status_code == 200
+        assert cascade_steps._series[("selection",)][2] == two_steps + 1
+
+    async def test_metrics_are_served(self, app: FastAPI, client: AsyncClient, db: Database) -> None:
+        await client.get(app.url_path_for("Get all Sports"))
+        response = await client.get(app.url_path_for("Get metrics"))
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'http_request_duration_seconds_count{method="GET",route="/api/sports/",status="200"}' in response.text
+        assert 'repository_call_duration_seconds_count{method="SportRepository.get_all_sports"}' in response.text
+        stats = pool_stats(db)
+        assert f'db_pool_max_size{{pool="primary"}} {stats["max_size"]}' in response.text
+        assert 'db_pool_waiting{pool="primary"} 0' in response.text
+        assert 'pool="replica"' not in response.text
@@ -0,0 +1,88 @@
+import asyncio
+import os
+from typing import AsyncIterator, Tuple
+
+import pytest
+import pytest_asyncio
+
+from asgi_lifespan import LifespanManager
+from fastapi import FastAPI
+from httpx import AsyncClient
+from app.config.app_config import appConfig
+from app.db.query_log import InstrumentedDatabase
+
+pytestmark = pytest.mark.asyncio
+
+TOKEN = "let-me-profile"
+
+
+@pytest_asyncio.fixture
+async def profiled(
+    apply_migrations: None, monkeypatch: pytest.MonkeyPatch
+) -> AsyncIterator[Tuple[FastAPI, AsyncClient]]:
+    """Start an application with profiling on, whose list queries wait long enough to be sampled."""
+    monkeypatch.setattr(appConfig, "PROFILING_TOKEN", TOKEN)
+    fetch_all = InstrumentedDatabase.fetch_all
+
+    async def slow_fetch_all(self, query: str, values: dict = None):
+        await asyncio.sleep(0.05)
+        return await fetch_all(self, query, values)
+
+    monkeypatch.setattr(InstrumentedDatabase, "fetch_all", slow_fetch_all)
+
+    from app.main import application
+    app = application()
+    async with LifespanManager(app):
+        async with AsyncClient(app=app, base_url="http://testserver") as client:
+            yield app, client
+
+
+class TestProfiling:
+    """Test the on-demand profile of a single request."""
+
+    async def test_profile_is_returned(self, profiled: Tuple[FastAPI, AsyncClient]) -> None:
+        app, client = profiled
+        response = await client.get(app.url_path_for("Get all Sports"), headers={"X-Profile": TOKEN})
+
+        assert response.status_code == 200
+        assert response.headers["X-Profile-Status"] == "200"
+        assert response.headers["content-type"].startswith("text/plain")
+        stacks = [line.rsplit(" ", 1) for line in response.text.splitlines()]
+        assert all(count.isdigit() for _, count in stacks)
+        waiting = [stack for stack, _ in stacks if stack.endswith(";<await>")]
+        assert any(
+            "app.api_routes.routes.sports:get_all_sports;" in stack and "app.db.repository.sports:" in stack
+            for stack in waiting
+        )
+
+    @pytest.mark.parametrize("params, headers", (
+        ({}, {}), ({}, {"X-Profile": "wrong"}), ({}, {"X-Profile": "wrông".encode()}),
+        # Tokens in the URL end up in access logs
+        ({"profile": TOKEN}, {}),
+    ))
+    async def test_unauthorized_requests_are_not_profiled(
+        self, profiled: Tuple[FastAPI, AsyncClient], params: dict, headers: dict
+    ) -> None:
+        app, client = profiled
+        response = await client.get(app.url_path_for("Get all Sports"), params=params, headers=headers)
+
+        assert response.status_code == 200
+        assert "X-Profile-Status" not in response.headers
+        assert isinstance(response.json(), list)
+
+    async def test_profile_is_written_to_the_directory(
+        self, profiled: Tuple[FastAPI, AsyncClient], monkeypatch: pytest.MonkeyPatch, tmp_path
+    ) -> None:
+        monkeypatch.setattr(appConfig, "PROFILING_DIR", str(tmp_path))
+        app, client = profiled
+        response = await client.get(app.url_path_for("Get all Sports"), headers={"X-Profile": TOKEN})
+
+        assert isinstance(response.json(), list)
+        filename = response.headers["X-Profile-File"]
+        assert os.path.dirname(filename) == str(tmp_path)
+        with open(filename) as profile:
+            assert "app.api_routes.routes.sports:get_all_sports;" in profile.read()
+
+    async def test_off_without_a_token(self, app: FastAPI, client: AsyncClient) -> None:
+        response = await client.get(app.url_path_for("Get all Sports"), headers={"X-Profile": ""})
+        assert isinstance(response.json(), list)
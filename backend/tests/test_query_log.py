@@ -0,0 +1,126 @@
+from typing import List, Optional, Tuple
+
+import pytest
+
+from databases import Database
+from fastapi import FastAPI
+from httpx import AsyncClient
+from app.config.app_config import appConfig
+from app.db import query_log
+from app.db.query_log import normalize_sql, param_shapes
+from app.db.repository.sports import SportRepository, table_version_query
+from app.schemas.selection import SelectionPersistModel
+from app.schemas.sport import SportPersistModel
+
+Call = Tuple[str, str, Optional[dict], float]
+
+
+@pytest.fixture
+def query_log_records(monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> pytest.LogCaptureFixture:
+    # The migrations' logging.config.fileConfig disables the loggers that already exist
+    monkeypatch.setattr(query_log.logger, "disabled", False)
+    caplog.set_level("WARNING", logger=query_log.logger.name)
+    return caplog
+
+
+@pytest.fixture
+def slow_log(monkeypatch: pytest.MonkeyPatch, query_log_records: pytest.LogCaptureFixture) -> pytest.LogCaptureFixture:
+    """Log every query as slow."""
+    monkeypatch.setattr(appConfig, "SLOW_QUERY_THRESHOLD_MS", 0)
+    return query_log_records
+
+
+@pytest.fixture
+def hook_calls(monkeypatch: pytest.MonkeyPatch) -> List[Call]:
+    calls: List[Call] = []
+    monkeypatch.setattr(query_log, "query_hooks", [lambda *call: calls.append(call)])
+    return calls
+
+
+class TestNormalization:
+    """Test what the slow query log prints instead of the values."""
+
+    @pytest.mark.parametrize(
+        "query, normalized",
+        (
+            ("SELECT *\n  FROM sport   WHERE id = :id", "SELECT * FROM sport WHERE id = :id"),
+            ("SELECT * FROM event WHERE status = 'it''s' LIMIT 10", "SELECT * FROM event WHERE status = ? LIMIT ?"),
+            ("SELECT $1::int, col2 FROM t1", "SELECT $1::int, col2 FROM t1"),
+        ),
+    )
+    def test_normalize_sql(self, query: str, normalized: str) -> None:
+        assert normalize_sql(query) == normalized
+
+    def test_param_shapes(self) -> None:
+        values = {"id": 1, "name": "secret", "ids": [1, 2, 3], "empty": [], "start": None}
+        assert param_shapes(values) == {
+            "id": "int", "name": "str", "ids": "int[3]", "empty": "?[0]", "start": "NoneType"
+        }
+        assert param_shapes(None) == {}
+
+
+@pytest.mark.asyncio
+class TestQueryLog:
+    """Test the timing every repository query goes through."""
+
+    async def test_slow_query_names_the_repository_method(
+        self, client: AsyncClient, db: Database, new_sport_db_record: SportPersistModel,
+        slow_log: pytest.LogCaptureFixture,
+    ) -> None:
+        # A cache miss, so that the lookup runs a query
+        await SportRepository(db).get_sport_by_id(id=new_sport_db_record.id + 1000000)
+
+        [record] = slow_log.records
+        assert "in SportRepository.get_sport_by_id: SELECT * FROM sport WHERE ID = :id params={'id': 'int'}" in record.getMessage()
+        assert "QUERY PLAN" not in record.getMessage()
+
+    async def test_slow_query_plan(
+        self, client: AsyncClient, db: Database, slow_log: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(appConfig, "SLOW_QUERY_EXPLAIN", True)
+        await SportRepository(db).get_all_sports({}, limit=10)
+
+        assert "Limit" in slow_log.records[0].getMessage().split("\n", 1)[1]
+
+    async def test_a_failed_plan_leaves_the_transaction_usable(
+        self, client: AsyncClient, db: Database, new_sport_db_record: SportPersistModel,
+        slow_log: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(appConfig, "SLOW_QUERY_EXPLAIN", True)
+
+        # The name search sets plan_cache_mode in a transaction, and SET can not be explained
+        sports = await SportRepository(db).get_all_sports({"name": new_sport_db_record.name}, limit=10)
+
+        assert [sport["id"] for sport in sports] == [new_sport_db_record.id]
+        assert any("EXPLAIN failed" in record.getMessage() for record in slow_log.records)
+
+    async def test_nested_repository_call(
+        self, app: FastAPI, client: AsyncClient, new_selection_db_record: SelectionPersistModel,
+        slow_log: pytest.LogCaptureFixture,
+    ) -> None:
+        response = await client.put(
+            app.url_path_for("Update Selection", id=new_selection_db_record.id), json={"active": False}
+        )
+        assert response.status_code == 200
+
+        messages = [record.getMessage() for record in slow_log.records]
+        assert any(" in SelectionRepository.update_selection: " in message for message in messages)
+        assert any(" in EventRepository.deactivate_events_without_active_selections: " in message for message in messages)
+
+    async def test_fast_queries_are_not_logged(
+        self, client: AsyncClient, db: Database, query_log_records: pytest.LogCaptureFixture, hook_calls: List[Call]
+    ) -> None:
+        await SportRepository(db).get_sports_version()
+
+        assert not query_log_records.records
+        [(repository, query, values, seconds)] = hook_calls
+        assert repository == "SportRepository"
+        assert query == table_version_query
+        assert seconds > 0
+
+    async def test_sampling(
+        self, client: AsyncClient, db: Database, hook_calls: List[Call], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(appConfig, "QUERY_SAMPLE_RATE", 0)
+        await SportRepository(db).get_sports_version()
+        assert hook_calls == []
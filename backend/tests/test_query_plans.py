@@ -0,0 +1,90 @@
+import json
+import pytest
+
+from typing import Any, Dict, List
+from databases import Database
+from httpx import AsyncClient
+from app.db.session import raw_connection
+from benchmarks.generate_data import load
+from benchmarks.query_plans import (
+    misestimated_nodes, normalize_plan, plan_nodes, regressions, repository_statements, sequential_scans,
+    uncovered_statements,
+)
+
+# Tables big enough in production that a sequential scan on them is a bug.
+# sport stays at a few hundred rows, where one is the cheaper plan.
+large_tables = ("event", "selection")
+
+unindexed_foreign_keys_query = """
+    SELECT c.conrelid::regclass::text AS child, a.attname AS column_name
+    FROM pg_constraint c
+    JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+    WHERE c.contype = 'f' AND NOT EXISTS (
+        SELECT 1 FROM pg_index i WHERE i.indrelid = c.conrelid AND i.indkey[0] = c.conkey[1] AND i.indpred IS NULL
+    )
+"""
+
+
+async def planned(db: Database, query: str, values: dict) -> Dict[str, Any]:
+    """Return the plan of the query, without running it."""
+    return json.loads(await db.fetch_val(query="EXPLAIN (FORMAT JSON) " + query, values=values))[0]["Plan"]
+
+
+@pytest.mark.asyncio
+class TestQueryPlans:
+    """Test the plans of the repository statements on a dataset large enough for the planner to care."""
+
+    async def test_no_sequential_scan_of_large_tables(self, client: AsyncClient, db: Database) -> None:
+        async with raw_connection(db) as connection:
+            dataset = await load(connection, 20, 50000, 100000, seed=0)
+
+        statements = repository_statements(dataset)
+        scans = {}
+        for name, (query, values) in statements.items():
+            tables = [table for table in sequential_scans(await planned(db, query, values)) if table in large_tables]
+            if tables:
+                scans[name] = tables
+        assert scans == {}
+        assert uncovered_statements(dataset) == []
+
+        # Each event filter is one range of its composite index, and the change
+        # feed reads every large table along its (changed_xid, version) index
+        for name, index in (
+            ("events page of in-play events of a sport starting within an hour", "ix_event_sport_id_scheduled_start_id"),
+            ("events page by status and start window", "ix_event_status_scheduled_start_id"),
+            ("changes page", "ix_event_changed_xid_version"),
+            ("changes page", "ix_selection_changed_xid_version"),
+        ):
+            plan = await planned(db, *statements[name])
+            assert index in {node.get("Index Name") for node in plan_nodes(plan)}, name
+
+    async def test_every_foreign_key_is_indexed(self, client: AsyncClient, db: Database) -> None:
+        assert [dict(row) for row in await db.fetch_all(query=unindexed_foreign_keys_query)] == []
+
+
+def plan_node(node_type: str, plans: List[Dict[str, Any]] = (), **keys: Any) -> Dict[str, Any]:
+    return {"Node Type": node_type, "Plans": list(plans), **keys}
+
+
+class TestPlanSnapshots:
+    """Test how plan snapshots are reduced and compared."""
+
+    def test_normalize_keeps_the_shape_only(self) -> None:
+        plan = plan_node("Limit", [plan_node(
+            "Index Scan", **{"Relation Name": "event", "Index Name": "event_pkey", "Total Cost": 3.5, "Plan Rows": 20},
+        )], **{"Total Cost": 3.5})
+
+        assert normalize_plan(plan) == ["Limit", "  Index Scan Relation Name=event Index Name=event_pkey"]
+
+    def test_misestimates_below_a_limit_are_ignored(self) -> None:
+        scan = {"Relation Name": "event", "Plan Rows": 100000, "Actual Rows": 20, "Actual Loops": 1}
+        assert misestimated_nodes(plan_node("Seq Scan", **scan), 10) == ["Seq Scan event"]
+        assert misestimated_nodes(plan_node("Limit", [plan_node("Seq Scan", **scan)]), 10) == []
+
+    def test_regressions(self) -> None:
+        baseline = {"seq_scans": ["sport"], "misestimated": [], "buffers": 100}
+
+        assert regressions({"seq_scans": ["sport"], "misestimated": [], "buffers": 120}, baseline, 0.25) == []
+        assert regressions(
+            {"seq_scans": ["event", "sport"], "misestimated": ["Seq Scan event"], "buffers": 200}, baseline, 0.25
+        ) == ["new sequential scan of event", "row estimate off in Seq Scan event", "buffers 100 -> 200"]
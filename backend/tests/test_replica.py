@@ -0,0 +1,130 @@
+from typing import Optional
+
+import pytest
+
+from asgi_lifespan import LifespanManager
+from fastapi import FastAPI
+from httpx import AsyncClient
+from starlette.requests import Request
+from app.api_routes.deps import get_db
+from app.config.app_config import appConfig
+from app.db.cache import record_cache
+from app.db.replica import ReplicaMonitor, parse_lsn
+from app.schemas.sport import SportCreateModel
+
+from tests.utils import generate_random_string
+
+def make_monitor(healthy: bool = True, lsn: Optional[str] = "0/3000000") -> ReplicaMonitor:
+    monitor = ReplicaMonitor(None, max_lag=5, interval=1)
+    monitor.healthy = healthy
+    monitor.lsn = parse_lsn(lsn)
+    return monitor
+
+
+def make_request(app: FastAPI, method: str, primary_lsn: Optional[str] = None) -> Request:
+    headers = [] if primary_lsn is None else [(b"x-primary-lsn", primary_lsn.encode())]
+    return Request({"type": "http", "app": app, "method": method, "headers": headers})
+
+
+class TestReplicaMonitor:
+    """Test when the replica is allowed to serve a read."""
+
+    @pytest.mark.parametrize(
+        "lsn, expected",
+        (("0/0", 0), ("0/16B3748", 0x16B3748), ("1/0", 1 << 32), ("", None), ("zz/1", None), (None, None)),
+    )
+    def test_parse_lsn(self, lsn: Optional[str], expected: Optional[int]) -> None:
+        assert parse_lsn(lsn) == expected
+
+    @pytest.mark.parametrize(
+        "healthy, min_lsn, expected",
+        (
+            (True, None, True),
+            (True, "0/3000000", True),
+            (True, "0/2FFFFFF", True),
+            (True, "0/3000001", False),
+            (True, "not an lsn", False),
+            (False, None, False),
+        ),
+    )
+    def test_can_serve(self, healthy: bool, min_lsn: Optional[str], expected: bool) -> None:
+        assert make_monitor(healthy).can_serve(min_lsn) is expected
+
+
+class TestReadRouting:
+    """Test that get_db picks the replica for reads it can serve."""
+
+    @pytest.mark.parametrize(
+        "method, healthy, primary_lsn, use_replica",
+        (
+            ("GET", True, None, True),
+            ("HEAD", True, "0/1", True),
+            ("GET", True, "1/0", False),
+            ("GET", False, None, False),
+            ("POST", True, None, False),
+            ("PUT", True, None, False),
+        ),
+    )
+    def test_get_db(
+        self, method: str, healthy: bool, primary_lsn: Optional[str], use_replica: bool
+    ) -> None:
+        app = FastAPI()
+        app.state._db, app.state._replica_db = "primary", "replica"
+        app.state._replica_monitor = make_monitor(healthy)
+        request = make_request(app, method, primary_lsn)
+        assert get_db(request) == ("replica" if use_replica else "primary")
+
+    def test_get_db_without_replica(self) -> None:
+        app = FastAPI()
+        app.state._db = "primary"
+        assert get_db(make_request(app, "GET")) == "primary"
+
+
+@pytest.mark.asyncio
+class TestReplicaPool:
+    """Test the replica pool against a second pool on the local test database."""
+
+    async def test_reads_use_the_replica_and_writes_return_the_lsn(
+        self, app: FastAPI, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(appConfig, "POSTGRES_REPLICA_SERVER", appConfig.POSTGRES_SERVER)
+        monkeypatch.setattr(appConfig, "REPLICA_CHECK_INTERVAL_SECONDS", 0.05)
+        async with LifespanManager(app):
+            async with AsyncClient(app=app, base_url="http://testserver") as client:
+                monitor = app.state._replica_monitor
+                assert monitor is not None and monitor.healthy
+                assert app.state._replica_db.is_replica
+
+                response = await client.post(
+                    app.url_path_for("Create Sport"),
+                    json=SportCreateModel(name=generate_random_string(10), active=True, slug=generate_random_string(10)).dict(),
+                )
+                assert response.status_code == 200
+                lsn = response.headers["X-Primary-LSN"]
+                assert parse_lsn(lsn) is not None
+
+                sport_id = response.json()["id"]
+                await monitor.check()
+                response = await client.get(
+                    app.url_path_for("Get Sport by id", id=sport_id), headers={"X-Primary-LSN": lsn}
+                )
+                assert response.status_code == 200
+                assert "X-Primary-LSN" not in response.headers
+                # Served by the replica, so the row was not cached
+                assert record_cache.get(("sport", sport_id)) is None
+
+    async def test_unreachable_replica_falls_back_to_the_primary(
+        self, app: FastAPI, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(appConfig, "POSTGRES_REPLICA_SERVER", appConfig.POSTGRES_SERVER)
+        monkeypatch.setattr(appConfig, "POSTGRES_REPLICA_PORT", "1")
+        async with LifespanManager(app):
+            async with AsyncClient(app=app, base_url="http://testserver") as client:
+                assert app.state._replica_monitor is None
+                response = await client.get(app.url_path_for("Get all Sports"))
+                assert response.status_code == 200
+                response = await client.post(
+                    app.url_path_for("Create Sport"),
+                    json=SportCreateModel(name=generate_random_string(10), active=True, slug=generate_random_string(10)).dict(),
+                )
+                assert "X-Primary-LSN" not in response.headers
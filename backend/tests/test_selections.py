@@ -1,3 +1,4 @@
+import asyncio
 import json
 from typing import Any, List
 
@@ -6,10 +7,12 @@ import pytest
 from databases import Database
 from fastapi import FastAPI
 from httpx import AsyncClient
+from app.config.app_config import appConfig
 from app.db.repository.events import EventRepository
 from app.db.repository.selections import SelectionRepository
 from app.db.repository.sports import SportRepository
-from app.schemas.selection import SelectionCreateModel, SelectionPersistModel, SelectionOutcomeModel
+from app.schemas.event import EventCreateModel, EventPersistModel
+from app.schemas.selection import SelectionCreateModel, SelectionPersistModel, SelectionOutcomeModel, SelectionUpdateModel
 
 from tests.utils import generate_random_string
 
@@ -82,6 +85,117 @@ class TestCreateSelection:
         assert res.status_code == status_code
 
 
+    async def test_creates_selections_in_bulk(
+        self, app: FastAPI, client: AsyncClient, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that bulk created selections come back in input order."""
+        new_selections = [
+            SelectionCreateModel(
+                name=generate_random_string(20),
+                active=True,
+                event_id=new_event_db_record.id,
+                price=1 + i / 4,
+                outcome=SelectionOutcomeModel.unsettled,
+            )
+            for i in range(50)
+        ]
+        response = await client.post(
+            app.url_path_for("Create Selections in bulk"),
+            json=[selection.dict() for selection in new_selections],
+        )
+        assert response.status_code == 200
+        results = response.json()
+        assert len(results) == len(new_selections)
+        for result, new_selection in zip(results, new_selections):
+            assert result["error"] is None
+            assert SelectionCreateModel(**result["selection"]) == new_selection
+
+    async def test_creates_selections_in_bulk_with_per_item_errors(
+        self, app: FastAPI, client: AsyncClient, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that selections under a missing event fail alone."""
+        payload = [
+            SelectionCreateModel(
+                name=generate_random_string(20),
+                active=True,
+                event_id=event_id,
+                price=2.5,
+                outcome=SelectionOutcomeModel.unsettled,
+            ).dict()
+            for event_id in (new_event_db_record.id, -1, new_event_db_record.id)
+        ]
+        response = await client.post(app.url_path_for("Create Selections in bulk"), json=payload)
+        assert response.status_code == 200
+        first, missing, last = response.json()
+        assert first["selection"]["name"] == payload[0]["name"]
+        assert missing == {"selection": None, "error": "Event ID not found."}
+        assert last["selection"]["name"] == payload[2]["name"]
+        assert first["selection"]["id"] < last["selection"]["id"]
+
+    async def test_selections_the_columns_refuse_fail_alone_in_bulk(
+        self, app: FastAPI, client: AsyncClient, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that a name or price out of the column bounds is reported in place, without aborting the rest."""
+        valid = {"active": True, "event_id": new_event_db_record.id, "price": 2.5, "outcome": "Unsettled"}
+        payload = [
+            {**valid, "name": generate_random_string(20)},
+            {**valid, "name": "x" * 101},
+            {**valid, "name": ""},
+            {**valid, "name": generate_random_string(20), "price": 1e8},
+            {**valid, "name": generate_random_string(20)},
+        ]
+        response = await client.post(app.url_path_for("Create Selections in bulk"), json=payload)
+        assert response.status_code == 200
+        first, too_long, empty, too_expensive, last = response.json()
+
+        assert [first["selection"]["name"], last["selection"]["name"]] == [payload[0]["name"], payload[4]["name"]]
+        assert too_long == empty == {"selection": None, "error": "Name must be 1 to 100 characters long."}
+        assert too_expensive == {"selection": None, "error": "Price must be below 100000000."}
+        created = await client.get(app.url_path_for("Get Selection by id", id=last["selection"]["id"]))
+        assert created.status_code == 200
+
+    async def test_creating_inactive_selections_in_bulk_deactivates_the_event(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        db: Database,
+        new_event_db_record: EventPersistModel,
+    ) -> None:
+        """Test that the cascade runs for an event that only got inactive selections."""
+        payload = [
+            SelectionCreateModel(
+                name=generate_random_string(20),
+                active=False,
+                event_id=new_event_db_record.id,
+                price=2.5,
+                outcome=SelectionOutcomeModel.void,
+            ).dict()
+            for _ in range(3)
+        ]
+        response = await client.post(app.url_path_for("Create Selections in bulk"), json=payload)
+        assert response.status_code == 200
+
+        event = await EventRepository(db).get_event_by_id(id=new_event_db_record.id)
+        assert event.active is False
+
+    @pytest.mark.parametrize(
+        "payload_size, status_code",
+        (
+            (0, 200),
+            (appConfig.MAX_BULK_SIZE + 1, 422),
+        ),
+    )
+    async def test_creates_selections_in_bulk_size_limits(
+        self, app: FastAPI, client: AsyncClient, payload_size: int, status_code: int
+    ) -> None:
+        """Test the bounds of the bulk payload."""
+        payload = [
+            {"name": "a", "active": True, "event_id": 1, "price": 1.0, "outcome": "Unsettled"}
+        ] * payload_size
+        response = await client.post(app.url_path_for("Create Selections in bulk"), json=payload)
+        assert response.status_code == status_code
+
+
 class TestGetSelection:
     """Test getting selection."""
 
@@ -230,6 +344,91 @@ class TestGetSelection:
         assert second_selection in all_selections
 
 
+    async def test_get_all_selections_ordered_by_price(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test walking the selections list by price with the next cursor."""
+        prefix = generate_random_string(12)
+        selection_repository = SelectionRepository(db)
+        for price in (7.5, 1.25, 3.0, 1.25):
+            await selection_repository.create_selection(
+                new_selection=SelectionCreateModel(
+                    name=f"{prefix} {price}",
+                    active=True,
+                    event_id=new_event_db_record.id,
+                    price=price,
+                    outcome=SelectionOutcomeModel.unsettled,
+                )
+            )
+
+        received = []
+        params = {"name": prefix, "limit": 3, "order_by": "price"}
+        while True:
+            response = await client.get(app.url_path_for("Get all Selections"), params=params)
+            assert response.status_code == 200
+            received.extend(SelectionPersistModel(**selection) for selection in response.json())
+            if "X-Next-Cursor" not in response.headers:
+                break
+            params["after"] = response.headers["X-Next-Cursor"]
+
+        assert [selection.price for selection in received] == [1.25, 1.25, 3.0, 7.5]
+        assert len({selection.id for selection in received}) == 4
+
+    async def test_stream_all_selections_as_json_array(
+        self, app: FastAPI, client: AsyncClient, new_selection_db_record: SelectionPersistModel
+    ) -> None:
+        """Test that the streamed JSON array holds the same rows as the paged list."""
+        params = {"name": new_selection_db_record.name}
+        response = await client.get(app.url_path_for("Get all Selections"), params=params)
+        assert response.status_code == 200
+
+        streamed = await client.get(
+            app.url_path_for("Get all Selections"), params={**params, "stream": True}
+        )
+        assert streamed.status_code == 200
+        assert streamed.headers["content-type"] == "application/json"
+        assert streamed.json() == response.json()
+
+    async def test_stream_all_selections_as_ndjson(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that asking for NDJSON streams one selection per line, past the default page size."""
+        prefix = generate_random_string(12)
+        selection_repository = SelectionRepository(db)
+        for i in range(appConfig.DEFAULT_PAGE_SIZE + 5):
+            await selection_repository.create_selection(
+                new_selection=SelectionCreateModel(
+                    name=f"{prefix} {i}",
+                    active=True,
+                    event_id=new_event_db_record.id,
+                    price=1.5,
+                    outcome=SelectionOutcomeModel.unsettled,
+                )
+            )
+
+        response = await client.get(
+            app.url_path_for("Get all Selections"),
+            params={"name": prefix},
+            headers={"Accept": "application/x-ndjson"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = response.text.splitlines()
+        assert len(lines) == appConfig.DEFAULT_PAGE_SIZE + 5
+        selections = [SelectionPersistModel(**json.loads(line)) for line in lines]
+        assert [selection.id for selection in selections] == sorted(selection.id for selection in selections)
+
+    async def test_stream_all_selections_with_empty_result(
+        self, app: FastAPI, client: AsyncClient
+    ) -> None:
+        """Test that streaming an empty result gives an empty JSON array."""
+        response = await client.get(
+            app.url_path_for("Get all Selections"),
+            params={"name": generate_random_string(30), "stream": True},
+        )
+        assert response.status_code == 200
+        assert response.json() == []
+
 class TestUpdateSelections:
     """Test updating a selection."""
 
@@ -270,6 +469,98 @@ class TestUpdateSelections:
             assert attribute == values[i]
             assert attribute != getattr(new_selection_db_record, attr_to_update)
 
+    async def test_concurrent_updates_of_different_columns_are_both_kept(
+        self, client: AsyncClient, db: Database, new_selection_db_record: SelectionPersistModel
+    ) -> None:
+        """Test that an update only writes the columns it was given."""
+        selection_repository = SelectionRepository(db)
+        await asyncio.gather(
+            selection_repository.update_selection(
+                id=new_selection_db_record.id, selection_update=SelectionUpdateModel(name="renamed")
+            ),
+            selection_repository.update_selection(
+                id=new_selection_db_record.id, selection_update=SelectionUpdateModel(price=42.5)
+            ),
+        )
+        selection = await selection_repository.get_selection_by_id(id=new_selection_db_record.id)
+        assert selection.name == "renamed"
+        assert float(selection.price) == 42.5
+        assert selection.outcome == new_selection_db_record.outcome
+
+    async def test_updates_selection_prices_in_batch(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        db: Database,
+        new_event_db_record: EventPersistModel,
+    ) -> None:
+        """Test that a price batch only returns the selections whose price changed."""
+        selection_repository = SelectionRepository(db)
+        selections = await selection_repository.create_selections(new_selections=[
+            SelectionCreateModel(
+                name=generate_random_string(20),
+                active=True,
+                event_id=new_event_db_record.id,
+                price=2.0,
+                outcome=SelectionOutcomeModel.unsettled,
+            )
+            for _ in range(3)
+        ])
+        first, second, third = (selection.id for selection in selections)
+
+        response = await client.patch(
+            app.url_path_for("Update Selection prices"),
+            json=[
+                {"id": first, "price": 3.5},
+                {"id": second, "price": 2.0},
+                {"id": third, "price": 9.0},
+                {"id": third, "price": 4.256},
+                {"id": -1, "price": 1.0},
+            ],
+        )
+        assert response.status_code == 200
+        updated = {selection["id"]: selection["price"] for selection in response.json()}
+        assert updated == {first: 3.5, third: 4.26}
+
+        unchanged = await selection_repository.get_selection_by_id(id=second)
+        assert float(unchanged.price) == 2.0
+
+    async def test_price_batch_changes_the_etags(
+        self, app: FastAPI, client: AsyncClient, new_selection_db_record: SelectionPersistModel
+    ) -> None:
+        """Test that pollers see a price change through both ETags."""
+        entity_url = app.url_path_for("Get Selection by id", id=new_selection_db_record.id)
+        list_url = app.url_path_for("Get all Selections")
+        entity_etag = (await client.get(entity_url)).headers["ETag"]
+        list_etag = (await client.get(list_url)).headers["ETag"]
+
+        response = await client.patch(
+            app.url_path_for("Update Selection prices"), json=[{"id": new_selection_db_record.id, "price": 1.11}]
+        )
+        assert response.status_code == 200
+
+        response = await client.get(entity_url, headers={"If-None-Match": entity_etag})
+        assert response.status_code == 200
+        assert response.json()["price"] == 1.11
+        response = await client.get(list_url, headers={"If-None-Match": list_etag})
+        assert response.status_code == 200
+        assert (await client.get(list_url, headers={"If-None-Match": response.headers["ETag"]})).status_code == 304
+
+    @pytest.mark.parametrize(
+        "payload, status_code",
+        (
+            ([], 200),
+            ([{"id": 1}], 422),
+            ([{"id": 1, "price": "high"}], 422),
+        ),
+    )
+    async def test_updates_selection_prices_with_invalid_input(
+        self, app: FastAPI, client: AsyncClient, payload: list, status_code: int
+    ) -> None:
+        """Test the validation of the price batch."""
+        response = await client.patch(app.url_path_for("Update Selection prices"), json=payload)
+        assert response.status_code == status_code
+
     @pytest.mark.parametrize(
         "id, selection_update, status_code",
         (
@@ -344,4 +635,57 @@ class TestUpdateSelections:
         # And the Sport should be inactive as well
         sport_respository = SportRepository(db)
         sport = await sport_respository.get_sport_by_id(id=event.sport_id)
-        assert sport.active is False
\ No newline at end of file
+        assert sport.active is False
+
+    async def test_deactivation_cascade_does_not_rewrite_inactive_parents(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        db: Database,
+        new_selection_db_record: SelectionPersistModel,
+    ) -> None:
+        """Test that parents which are already inactive are left untouched by the cascade."""
+        event = await EventRepository(db).get_event_by_id(id=new_selection_db_record.event_id)
+        response = await client.put(
+            app.url_path_for("Update Selection", id=new_selection_db_record.id),
+            json={"active": False},
+        )
+        assert response.status_code == 200
+
+        row_versions_query = "SELECT (SELECT xmin::text FROM event WHERE id = :event_id) AS event_xmin, " \
+            "(SELECT xmin::text FROM sport WHERE id = :sport_id) AS sport_xmin"
+        row_values = {"event_id": event.id, "sport_id": event.sport_id}
+        before = await db.fetch_one(query=row_versions_query, values=row_values)
+
+        # Another inactive selection under the now inactive event
+        selection_repository = SelectionRepository(db)
+        selection_create = SelectionCreateModel(**new_selection_db_record)
+        selection_create.active = False
+        await selection_repository.create_selection(new_selection=selection_create)
+
+        after = await db.fetch_one(query=row_versions_query, values=row_values)
+        assert dict(after) == dict(before)
+
+    async def test_moving_the_only_active_selection_deactivates_the_previous_event(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        db: Database,
+        new_selection_db_record: SelectionPersistModel,
+        new_event_db_record: EventPersistModel,
+    ) -> None:
+        """Test that the event left without active selections by a move is deactivated."""
+        other_event = await EventRepository(db).create_event(
+            new_event=EventCreateModel(**{**dict(new_event_db_record), "name": generate_random_string(20)})
+        )
+        response = await client.put(
+            app.url_path_for("Update Selection", id=new_selection_db_record.id),
+            json={"event_id": other_event.id},
+        )
+        assert response.status_code == 200
+
+        event_repository = EventRepository(db)
+        previous_event = await event_repository.get_event_by_id(id=new_selection_db_record.event_id)
+        assert previous_event.active is False
+        assert (await event_repository.get_event_by_id(id=other_event.id)).active is True
+
@@ -0,0 +1,59 @@
+import pytest
+
+from fastapi import FastAPI
+from httpx import AsyncClient
+from app.api_routes import serialization
+from app.config.app_config import appConfig
+from app.schemas.selection import SelectionPersistModel
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestFastJSONResponses:
+    """Test that the fast path returns what the response_model path does."""
+
+    @pytest.mark.parametrize("route_name", ("Get all Sports", "Get all Events", "Get all Selections"))
+    @pytest.mark.parametrize("with_orjson", (True, False))
+    async def test_fast_path_matches_response_model(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        new_selection_db_record: SelectionPersistModel,
+        monkeypatch: pytest.MonkeyPatch,
+        route_name: str,
+        with_orjson: bool,
+    ) -> None:
+        params = {"limit": 3}
+        response = await client.get(app.url_path_for(route_name), params=params)
+        assert response.status_code == 200
+
+        monkeypatch.setattr(appConfig, "FAST_JSON_RESPONSES", True)
+        if not with_orjson:
+            monkeypatch.setattr(serialization, "orjson", None)
+        fast_response = await client.get(app.url_path_for(route_name), params=params)
+
+        assert fast_response.status_code == 200
+        assert fast_response.content == response.content
+        assert fast_response.headers["ETag"] == response.headers["ETag"]
+        assert fast_response.headers.get("X-Next-Cursor") == response.headers.get("X-Next-Cursor")
+
+    async def test_fast_stream_matches_response_model(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        new_selection_db_record: SelectionPersistModel,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        params = {"stream": True, "limit": 5}
+        response = await client.get(app.url_path_for("Get all Events"), params=params)
+
+        monkeypatch.setattr(appConfig, "FAST_JSON_RESPONSES", True)
+        fast_response = await client.get(app.url_path_for("Get all Events"), params=params)
+
+        assert fast_response.json() == response.json()
+
+    async def test_openapi_schema_is_unchanged(self, app: FastAPI, monkeypatch: pytest.MonkeyPatch) -> None:
+        schema = app.openapi()
+        monkeypatch.setattr(appConfig, "FAST_JSON_RESPONSES", True)
+        app.openapi_schema = None
+        assert app.openapi() == schema
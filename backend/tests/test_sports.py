@@ -3,17 +3,22 @@ from typing import Any, List
 from databases import Database
 
 import pytest
+from app.config.app_config import appConfig
 from app.db.repository.events import EventRepository
+from app.db.repository.sports import SportRepository
+from app.db.repository.selections import SelectionRepository
 from app.schemas.event import (
     EventCreateModel,
+    EventPersistModel,
     EventStatusModel,
     EventTypeModel,
 )
+from app.schemas.selection import SelectionCreateModel, SelectionOutcomeModel
 from app.schemas.sport import SportCreateModel, SportPersistModel
 from fastapi import FastAPI
 from httpx import AsyncClient
 from app.main import application
-from tests.utils import generate_random_string
+from tests.utils import generate_random_string, parse_times
 
 pytestmark = pytest.mark.asyncio
 
@@ -194,6 +199,48 @@ class TestGetSport:
         assert first_sport in all_sports
         assert second_sport in all_sports
 
+    async def test_get_all_sports_name_filter_is_a_bound_parameter(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+    ) -> None:
+        """Test that quotes in the name filter are matched, not executed."""
+        response = await client.post(
+            app.url_path_for("Create Sport"),
+            json=SportCreateModel(
+                name="Rock 'n' Roll darts", slug="rock-n-roll-darts", active=True
+            ).dict(),
+        )
+        assert response.status_code == 200
+        sport = SportPersistModel(**response.json())
+
+        response = await client.get(
+            app.url_path_for("Get all Sports"), params={"name": "rock 'n' roll"}
+        )
+        assert response.status_code == 200
+        assert [SportPersistModel(**sport) for sport in response.json()] == [sport]
+
+        response = await client.get(
+            app.url_path_for("Get all Sports"), params={"name": "' OR 'a' ~ 'a"}
+        )
+        assert response.status_code == 200
+        assert response.json() == []
+
+    async def test_only_name_searches_are_planned_for_their_values(
+        self,
+        client: AsyncClient,
+        db: Database,
+    ) -> None:
+        """Test that custom plans are forced for a name pattern only, and only for its transaction."""
+        sports_repo = SportRepository(db)
+        show_query = "SHOW plan_cache_mode"
+
+        async with sports_repo.custom_plans({"name": "darts"}):
+            assert await sports_repo.db.fetch_val(query=show_query) == "force_custom_plan"
+        async with sports_repo.custom_plans({"active_events_count": 1}):
+            assert await sports_repo.db.fetch_val(query=show_query) == "auto"
+        assert await db.fetch_val(query=show_query) == "auto"
+
     async def test_get_all_sports_by_minimum_active_events(
         self,
         app: FastAPI,
@@ -230,6 +277,56 @@ class TestGetSport:
         assert response.status_code == 200
         assert len(response.json()) == 0
 
+    async def test_get_all_sports_paginates_with_cursor(
+        self, app: FastAPI, client: AsyncClient, db: Database
+    ) -> None:
+        """Test walking the sports list page by page with the next cursor."""
+        prefix = generate_random_string(12)
+        sports_repo = SportRepository(db)
+        created_ids = []
+        for i in range(3):
+            sport = await sports_repo.create_sport(
+                new_sport=SportCreateModel(name=f"{prefix} {i}", slug=f"{prefix}-{i}", active=True)
+            )
+            created_ids.append(sport.id)
+
+        response = await client.get(
+            app.url_path_for("Get all Sports"), params={"name": prefix, "limit": 2}
+        )
+        assert response.status_code == 200
+        assert [sport["id"] for sport in response.json()] == created_ids[:2]
+        cursor = response.headers["X-Next-Cursor"]
+
+        response = await client.get(
+            app.url_path_for("Get all Sports"),
+            params={"name": prefix, "limit": 2, "after": cursor},
+        )
+        assert response.status_code == 200
+        assert [sport["id"] for sport in response.json()] == created_ids[2:]
+        assert "X-Next-Cursor" not in response.headers
+
+    async def test_get_all_sports_with_invalid_cursor(
+        self, app: FastAPI, client: AsyncClient
+    ) -> None:
+        """Test that a malformed cursor is rejected."""
+        response = await client.get(
+            app.url_path_for("Get all Sports"), params={"after": "not-a-cursor"}
+        )
+        assert response.status_code == 400
+
+    async def test_get_all_sports_with_total_estimate(
+        self, app: FastAPI, client: AsyncClient, new_sport_db_record: SportPersistModel
+    ) -> None:
+        """Test that the approximate total count is only returned when asked for."""
+        response = await client.get(app.url_path_for("Get all Sports"))
+        assert "X-Total-Count-Estimate" not in response.headers
+
+        response = await client.get(
+            app.url_path_for("Get all Sports"), params={"include_total": True}
+        )
+        assert response.status_code == 200
+        assert int(response.headers["X-Total-Count-Estimate"]) >= 0
+
 class TestUpdateSport:
     """Test updating a Sport."""
 
@@ -297,4 +394,114 @@ class TestUpdateSport:
             app.url_path_for("Update Sport", id=id),
             json=sport_update,
         )
-        assert response.status_code == status_code
\ No newline at end of file
+        assert response.status_code == status_code
+
+
+class TestGetSportTree:
+    """Test getting a sport with its events and selections."""
+
+    async def test_tree_nodes_match_get_by_id(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that each node of the tree is what getting its row by id returns."""
+        selections = await SelectionRepository(db).create_selections(new_selections=[
+            SelectionCreateModel(
+                name=generate_random_string(20),
+                active=active,
+                event_id=new_event_db_record.id,
+                price=price,
+                outcome=SelectionOutcomeModel.unsettled,
+            )
+            for active, price in ((True, 1.5), (False, 2.25))
+        ])
+
+        response = await client.get(
+            app.url_path_for("Get Sport tree", id=new_event_db_record.sport_id), params={"depth": 2}
+        )
+        assert response.status_code == 200
+        tree = parse_times(response.json())
+
+        sport = await client.get(app.url_path_for("Get Sport by id", id=new_event_db_record.sport_id))
+        assert {key: value for key, value in tree.items() if key != "events"} == sport.json()
+        [event_node] = tree["events"]
+        event = await client.get(app.url_path_for("Get Event by id", id=new_event_db_record.id))
+        assert {key: value for key, value in event_node.items() if key != "selections"} == parse_times(event.json())
+        assert [node["id"] for node in event_node["selections"]] == [selection.id for selection in selections]
+        for node in event_node["selections"]:
+            selection = await client.get(app.url_path_for("Get Selection by id", id=node["id"]))
+            assert node == selection.json()
+
+    async def test_tree_active_only_and_depth(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_event_db_record: EventPersistModel
+    ) -> None:
+        """Test that active_only drops the inactive children and depth cuts the levels below the sport, 1 by default."""
+        await SelectionRepository(db).create_selections(new_selections=[
+            SelectionCreateModel(
+                name=generate_random_string(20),
+                active=active,
+                event_id=new_event_db_record.id,
+                price=1.5,
+                outcome=SelectionOutcomeModel.unsettled,
+            )
+            for active in (True, False)
+        ])
+        inactive_event = await EventRepository(db).create_event(new_event=EventCreateModel(
+            **{**dict(new_event_db_record), "name": generate_random_string(20), "active": False}
+        ))
+        url = app.url_path_for("Get Sport tree", id=new_event_db_record.sport_id)
+
+        tree = (await client.get(url)).json()
+        assert [event["id"] for event in tree["events"]] == [new_event_db_record.id, inactive_event.id]
+        assert all("selections" not in event for event in tree["events"])
+
+        tree = (await client.get(url, params={"active_only": True, "depth": 2})).json()
+        [event] = tree["events"]
+        assert [selection["active"] for selection in event["selections"]] == [True]
+
+        tree = (await client.get(url, params={"depth": 0})).json()
+        assert "events" not in tree
+
+    async def test_tree_pages_the_events(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_event_db_record: EventPersistModel
+    ) -> None:
+        events = [new_event_db_record] + [
+            await EventRepository(db).create_event(new_event=EventCreateModel(
+                **{**dict(new_event_db_record), "name": generate_random_string(20)}
+            ))
+            for _ in range(2)
+        ]
+        url = app.url_path_for("Get Sport tree", id=new_event_db_record.sport_id)
+
+        first = await client.get(url, params={"limit": 2})
+        assert [event["id"] for event in first.json()["events"]] == [event.id for event in events[:2]]
+        second = await client.get(url, params={"limit": 2, "after": first.headers["X-Next-Cursor"]})
+        assert [event["id"] for event in second.json()["events"]] == [events[2].id]
+        assert "X-Next-Cursor" not in second.headers
+        assert (await client.get(url, params={"after": "not a cursor"})).status_code == 400
+
+    async def test_depth_2_is_refused_above_the_selection_cap(
+        self, app: FastAPI, client: AsyncClient, db: Database, new_event_db_record: EventPersistModel,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        await SelectionRepository(db).create_selections(new_selections=[
+            SelectionCreateModel(
+                name=generate_random_string(20),
+                active=True,
+                event_id=new_event_db_record.id,
+                price=1.5,
+                outcome=SelectionOutcomeModel.unsettled,
+            )
+            for _ in range(3)
+        ])
+        monkeypatch.setattr(appConfig, "MAX_TREE_SELECTIONS", 2)
+        url = app.url_path_for("Get Sport tree", id=new_event_db_record.sport_id)
+
+        assert (await client.get(url, params={"depth": 2})).status_code == 422
+        assert (await client.get(url, params={"depth": 1})).status_code == 200
+
+    @pytest.mark.parametrize("params, status_code", (({}, 404), ({"depth": 3}, 422)))
+    async def test_tree_of_nonexistent_sport_or_too_deep(
+        self, app: FastAPI, client: AsyncClient, params: dict, status_code: int
+    ) -> None:
+        response = await client.get(app.url_path_for("Get Sport tree", id=-1), params=params)
+        assert response.status_code == status_code
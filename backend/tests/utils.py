@@ -1,8 +1,23 @@
 import random
 import string
+from typing import Any
+
+from pydantic.datetime_parse import parse_datetime
 
 
 def generate_random_string(length: int):
     """Return a random string with given length"""
     letters = string.ascii_lowercase
-    return "".join(random.choice(letters) for _ in range(length))
\ No newline at end of file
+    return "".join(random.choice(letters) for _ in range(length))
+
+
+def parse_times(node: Any) -> Any:
+    """Parse the timestamps of a JSON tree, which Postgres and pydantic format differently."""
+    if isinstance(node, list):
+        return [parse_times(child) for child in node]
+    if isinstance(node, dict):
+        return {
+            key: parse_datetime(value) if key.endswith("_start") and value else parse_times(value)
+            for key, value in node.items()
+        }
+    return node